@@ -2,9 +2,27 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Runtime files and directories that default to living under DATA_DIR unless set explicitly.
+_DATA_FILES: Dict[str, str] = {
+    "IDEMPOTENCY_SQLITE_PATH": "idempotency.sqlite3",
+    "JOBS_SQLITE_PATH": "jobs.sqlite3",
+    "EVENTS_SQLITE_PATH": "events.sqlite3",
+    "JOB_LOGS_DIR": "job-logs",
+    "WEBHOOKS_SQLITE_PATH": "webhooks.sqlite3",
+    "RESOURCES_SQLITE_PATH": "resources.sqlite3",
+    "METRICS_SQLITE_PATH": "metrics.sqlite3",
+    "RATE_LIMIT_SQLITE_PATH": "ratelimit.sqlite3",
+    "RENDER_CACHE_SQLITE_PATH": "render-cache.sqlite3",
+    "ASSETS_DIR": "assets",
+    "STARTUP_CACHE_FILE": "startup-cache.marshal",
+    "PROFILING_DIR": "profiles",
+}
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
@@ -15,6 +33,195 @@ class Settings(BaseSettings):
     SLIDESHOW_EXAMPLES_PATH: Path = REPO_ROOT / "slideshow" / "examples"
     STORY_OPENAPI_FILE: Path = REPO_ROOT / "story" / "openapi-video-story.patch.yaml"
     STORY_EXAMPLES_PATH: Path = REPO_ROOT / "story" / "examples"
+    # How often the provider catalog checks its source files for changes; negative disables reloads.
+    PROVIDERS_RELOAD_INTERVAL_SEC: float = 2.0
+    # Response class for routes that return plain data: "orjson" (falls back to "std" if orjson is missing) or "std".
+    JSON_RESPONSE_CLASS: str = "orjson"
+    # Runtime state (SQLite files, logs, blobs); not committed. `*_PATH` settings left unset land here.
+    DATA_DIR: Path = REPO_ROOT / "var"
+
+    # Idempotency-Key handling for POSTs: "memory" (per worker) or "sqlite" (shared across workers).
+    # Keyed request bodies over IDEMPOTENCY_MAX_BODY_BYTES are refused (413); larger responses are not stored.
+    IDEMPOTENCY_BACKEND: str = "memory"
+    IDEMPOTENCY_SQLITE_PATH: Path | None = None
+    IDEMPOTENCY_TTL_SEC: float = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 10_000
+    IDEMPOTENCY_WAIT_TIMEOUT_SEC: float = 30.0
+    IDEMPOTENCY_REQUIRE_KEY: bool = False
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1 << 20
+
+    # Job engine behind the 202 endpoints: worker tasks per kind and max waiting jobs per kind.
+    # Job GETs with ?wait= park for at most JOB_MAX_WAIT_SEC; jobs run by another worker process are
+    # re-read from SQLite every JOB_WAIT_POLL_SEC while parked.
+    JOBS_SQLITE_PATH: Path | None = None
+    JOB_CONCURRENCY: Dict[str, int] = {"images": 8, "voiceovers": 4, "background-music": 2, "slideshow-videos": 2, "videos": 2, "stories": 2, "storyboard-renders": 2}
+    JOB_DEFAULT_CONCURRENCY: int = 4
+    JOB_QUEUE_SIZE: int = 1000
+    JOB_MAX_WAIT_SEC: float = 30.0
+    JOB_WAIT_POLL_SEC: float = 1.0
+
+    # /v1/events: every event is written to SQLite; the newest are also cached in memory.
+    EVENTS_SQLITE_PATH: Path | None = None
+    EVENTS_RING_CAPACITY: int = 10_000
+    EVENTS_MAX_WAIT_SEC: float = 30.0
+    EVENTS_HEARTBEAT_SEC: float = 15.0
+
+    # /v1/jobs/{job_id}/logs: one append-only file per job. Followers are woken by writes in their own
+    # worker and check the file every JOB_LOGS_POLL_SEC for writes from other workers.
+    JOB_LOGS_DIR: Path | None = None
+    JOB_LOGS_POLL_SEC: float = 0.25
+
+    # Webhook delivery: pending/retrying deliveries persist in SQLite; WEBHOOK_BATCH_MAX > 1 enables batching.
+    # A worker's claim on a delivery lasts WEBHOOK_CLAIM_TTL_SEC (longer than a send can take); after that
+    # another worker may take it over, e.g. when the claiming worker died mid-send.
+    WEBHOOKS_SQLITE_PATH: Path | None = None
+    WEBHOOK_MAX_PER_HOST: int = 8
+    WEBHOOK_MAX_ATTEMPTS: int = 8
+    WEBHOOK_BACKOFF_BASE_SEC: float = 2.0
+    WEBHOOK_BACKOFF_MAX_SEC: float = 600.0
+    WEBHOOK_BATCH_MAX: int = 1
+    WEBHOOK_BATCH_WINDOW_SEC: float = 0.2
+    WEBHOOK_TIMEOUT_SEC: float = 10.0
+    WEBHOOK_CLAIM_TTL_SEC: float = 120.0
+
+    # Created resources behind the list endpoints; "sqlite" is the only built-in backend.
+    # List pages are read RESOURCES_LIST_BATCH items at a time; once a page reaches RESOURCES_STREAM_MIN_BYTES
+    # the rest of it is streamed rather than assembled in memory.
+    RESOURCES_BACKEND: str = "sqlite"
+    RESOURCES_SQLITE_PATH: Path | None = None
+    RESOURCES_LIST_BATCH: int = 25
+    RESOURCES_STREAM_MIN_BYTES: int = 256 << 10
+
+    # POST /v1/batch: operations per JSON batch, and the longest single NDJSON line.
+    BATCH_MAX_OPERATIONS: int = 1000
+    BATCH_MAX_LINE_BYTES: int = 1 << 20
+
+    # /metrics: with METRICS_MULTIPROCESS each worker publishes its samples to a shared SQLite file
+    # at most every METRICS_FLUSH_INTERVAL_SEC, and a scrape of any worker sums all of them.
+    METRICS_MULTIPROCESS: bool = True
+    METRICS_SQLITE_PATH: Path | None = None
+    METRICS_FLUSH_INTERVAL_SEC: float = 1.0
+
+    # Provider quotas from the catalog (`quota.rate_limit_per_min` / `burst`), enforced on create routes.
+    # "sqlite" shares one budget between all workers on the host; "memory" enforces it per worker.
+    # One API key may use RATE_LIMIT_KEY_SHARE of a provider's budget. Workers lease
+    # RATE_LIMIT_LEASE_FRACTION of a bucket (at least RATE_LIMIT_MIN_LEASE tokens) at a time and give
+    # unused tokens back after RATE_LIMIT_LEASE_TTL_SEC. Every RATE_LIMIT_SWEEP_INTERVAL_SEC, expired
+    # leases are returned and buckets that have refilled completely are dropped.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "sqlite"
+    RATE_LIMIT_SQLITE_PATH: Path | None = None
+    RATE_LIMIT_KEY_SHARE: float = 0.5
+    RATE_LIMIT_LEASE_FRACTION: float = 0.1
+    RATE_LIMIT_LEASE_TTL_SEC: float = 1.0
+    RATE_LIMIT_MIN_LEASE: int = 8
+    RATE_LIMIT_SWEEP_INTERVAL_SEC: float = 10.0
+
+    # Background provider probes (GET on HEALTH_PROBE_URLS[id], a real health endpoint; providers
+    # without one are not probed, and a non-2xx answer is a failure) feeding GET /providers/{id}/health
+    # and per-provider circuit breakers. Off by default; the simulator (SIMULATOR_ENABLED) supplies
+    # URLs for every provider. A breaker opens after HEALTH_FAILURE_THRESHOLD consecutive failures:
+    # routing skips the provider for HEALTH_BREAKER_COOLDOWN_SEC, then lets one trial call through;
+    # create routes fail fast with 503 only for job kinds that call the provider themselves.
+    HEALTH_PROBE_ENABLED: bool = False
+    HEALTH_PROBE_INTERVAL_SEC: float = 15.0
+    HEALTH_PROBE_TIMEOUT_SEC: float = 5.0
+    HEALTH_PROBE_URLS: Dict[str, str] = {}
+    HEALTH_RING_CAPACITY: int = 256
+    HEALTH_FAILURE_THRESHOLD: int = 5
+    HEALTH_BREAKER_COOLDOWN_SEC: float = 30.0
+    HEALTH_DEGRADED_SUCCESS_RATE: float = 0.95
+
+    # Provider routing for a capability: lower score wins. Latency is normalized against the slowest candidate,
+    # cost between the cheapest and priciest candidate billed in the same billing_unit; providers with no
+    # observed latency use latency_ms_estimate, else the default.
+    ROUTING_LATENCY_WEIGHT: float = 1.0
+    ROUTING_ERROR_WEIGHT: float = 2.0
+    ROUTING_COST_WEIGHT: float = 0.5
+    ROUTING_BUDGET_WEIGHT: float = 1.0
+    ROUTING_DEFAULT_LATENCY_MS: float = 1000.0
+
+    # Fake upstream providers (app/services/simulator.py). With SIMULATOR_ENABLED, health probes and
+    # provider calls are answered in-process instead of over the network; SIMULATOR_PROFILES_FILE is a
+    # JSON object of per-provider profile overrides, and SIMULATOR_TIME_SCALE multiplies every latency.
+    SIMULATOR_ENABLED: bool = False
+    SIMULATOR_SEED: int = 0
+    SIMULATOR_PROFILES_FILE: Path | None = None
+    SIMULATOR_TIME_SCALE: float = 1.0
+
+    # Storyboard render pipeline (app/services/render.py). Stage outputs are cached by a hash of their
+    # inputs; RENDER_STAGE_CONCURRENCY caps concurrent runs of each stage across all renders in flight.
+    RENDER_CACHE_SQLITE_PATH: Path | None = None
+    RENDER_CACHE_MAX_ENTRIES: int = 100_000
+    RENDER_STAGE_CONCURRENCY: Dict[str, int] = {"image": 8, "voiceover": 4, "music": 2, "slideshow": 2, "video": 2}
+
+    # Streamed script generation (POST /v1/scripts with Accept: text/event-stream or ?stream=true) through the
+    # `openrouter` provider: TEXTGEN_BACKEND "openrouter" calls its chat completions API, "fake" echoes the input
+    # a word every TEXTGEN_FAKE_DELAY_SEC for tests and offline runs.
+    TEXTGEN_BACKEND: str = "fake"
+    TEXTGEN_MODEL: str = "openai/gpt-4o-mini"
+    TEXTGEN_TIMEOUT_SEC: float = 60.0
+    TEXTGEN_FAKE_DELAY_SEC: float = 0.0
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    OPENROUTER_API_KEY: str | None = None
+
+    # Parsed schemas, examples and catalog data cached across restarts (app/utils/snapshot.py); the cache
+    # is ignored whenever a source file's size or mtime differs from when it was written. STARTUP_GC_FREEZE
+    # moves everything built at import into the GC's permanent generation, so forked workers keep sharing it.
+    STARTUP_CACHE_ENABLED: bool = True
+    STARTUP_CACHE_FILE: Path | None = None
+    STARTUP_GC_FREEZE: bool = True
+
+    # Content-addressed asset blobs (app/services/assets.py). Uploads stream to disk through a buffer of
+    # ASSETS_UPLOAD_BUFFER_BYTES; derived renditions are evicted LRU beyond ASSETS_RENDITION_CACHE_BYTES.
+    # Every ASSETS_SWEEP_INTERVAL_SEC, upload files untouched for ASSETS_UPLOAD_STALE_SEC and assets still
+    # pending after ASSETS_PENDING_TTL_SEC are removed.
+    # Downloads stream from Python under uvicorn, which offers neither the zerocopysend nor the pathsend
+    # ASGI extension. Behind nginx or Apache, set ASSETS_SENDFILE_HEADER to "X-Accel-Redirect" or
+    # "X-Sendfile" to have the proxy send the file (and its ranges) itself; X-Accel-Redirect points at
+    # ASSETS_SENDFILE_PREFIX + the path under ASSETS_DIR, which nginx must map as an `internal` location.
+    ASSETS_DIR: Path | None = None
+    ASSETS_MAX_UPLOAD_BYTES: int = 2 << 30
+    ASSETS_UPLOAD_BUFFER_BYTES: int = 1 << 20
+    ASSETS_RENDITION_CACHE_BYTES: int = 1 << 30
+    ASSETS_PENDING_TTL_SEC: float = 24 * 3600
+    ASSETS_UPLOAD_STALE_SEC: float = 600.0
+    ASSETS_SWEEP_INTERVAL_SEC: float = 600.0
+    ASSETS_SENDFILE_HEADER: str | None = None
+    ASSETS_SENDFILE_PREFIX: str = "/internal/assets/"
+
+    # Response compression (app/middleware/compression.py), negotiated from Accept-Encoding in the order of
+    # COMPRESSION_ENCODINGS; codings whose library is missing ("zstd": zstandard, "br": brotli/brotlicffi) are
+    # skipped. Bodies under COMPRESSION_MIN_BYTES are sent as-is. COMPRESSION_LEVELS is per coding
+    # (gzip 1-9, br 0-11, zstd 1-22): higher trades CPU for egress.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]
+    COMPRESSION_LEVELS: Dict[str, int] = {"gzip": 6, "br": 4, "zstd": 3}
+    COMPRESSION_MIN_BYTES: int = 1024
+
+    # Request profiling (app/middleware/profiling.py); nothing is installed unless PROFILING_ENABLED.
+    # A request is profiled when it sends PROFILING_HEADER (whose value must equal PROFILING_TOKEN when that
+    # is set) or is picked at PROFILING_SAMPLE_RATE; any request whose response has not started after
+    # PROFILING_SLOW_MS (unset: never; `?wait=` long-polls excepted) gets stack samples from then on and is
+    # captured. Captures are JSON files under PROFILING_DIR, the newest PROFILING_MAX_CAPTURES /
+    # PROFILING_MAX_BYTES of them, listed at GET /admin/profiles, which only exists when PROFILING_TOKEN is set.
+    PROFILING_ENABLED: bool = False
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_TOKEN: str | None = None
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_SLOW_MS: float | None = 1000.0
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_STACKS: int = 200
+    PROFILING_DIR: Path | None = None
+    PROFILING_MAX_CAPTURES: int = 200
+    PROFILING_MAX_BYTES: int = 64 << 20
+
+    @model_validator(mode="after")
+    def _default_data_files(self) -> "Settings":
+        for field, filename in _DATA_FILES.items():
+            if getattr(self, field) is None:
+                setattr(self, field, self.DATA_DIR / filename)
+        return self
 
 
 @lru_cache
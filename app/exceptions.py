@@ -14,3 +14,122 @@ def provider_not_found_exception_handler(request: Request, exc: ProviderNotFound
         status_code=status.HTTP_404_NOT_FOUND,
         content={"error": "not_found", "message": f"Provider '{exc.provider_id}' not found"},
     )
+
+
+class JobNotFoundException(Exception):
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+
+def job_not_found_exception_handler(request: Request, exc: JobNotFoundException):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"error": "not_found", "message": f"Job '{exc.job_id}' not found"},
+    )
+
+
+class JobQueueFullException(Exception):
+    def __init__(self, kind: str, retry_after: int):
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def job_queue_full_exception_handler(request: Request, exc: JobQueueFullException):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"error": "queue_full", "message": f"Too many pending '{exc.kind}' jobs; retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class RateLimitedException(Exception):
+    """`scope` is "provider" when the provider's whole budget is spent, "api_key" when only the caller's share is."""
+
+    def __init__(self, provider_id: str, scope: str, retry_after: int):
+        self.provider_id = provider_id
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def rate_limited_exception_handler(request: Request, exc: RateLimitedException):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"error": "rate_limited", "message": f"Rate limit for provider '{exc.provider_id}' exceeded", "scope": exc.scope},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class ProviderUnavailableException(Exception):
+    def __init__(self, provider_id: str, retry_after: int):
+        self.provider_id = provider_id
+        self.retry_after = retry_after
+
+
+def provider_unavailable_exception_handler(request: Request, exc: ProviderUnavailableException):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"error": "provider_unavailable", "message": f"Provider '{exc.provider_id}' is failing; its circuit is open"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class NoProviderAvailableException(Exception):
+    def __init__(self, capability: str, errors: list[str] | None = None):
+        self.capability = capability
+        self.errors = errors or []
+
+
+def no_provider_available_exception_handler(request: Request, exc: NoProviderAvailableException):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"error": "no_provider_available", "message": f"No provider could serve '{exc.capability}'", "attempts": exc.errors},
+    )
+
+
+class AssetNotFoundException(Exception):
+    def __init__(self, asset_id: str):
+        self.asset_id = asset_id
+
+
+def asset_not_found_exception_handler(request: Request, exc: AssetNotFoundException):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"error": "not_found", "message": f"Asset '{exc.asset_id}' not found"},
+    )
+
+
+class AssetTooLargeException(Exception):
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+
+def asset_too_large_exception_handler(request: Request, exc: AssetTooLargeException):
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"error": "too_large", "message": f"Assets are limited to {exc.max_bytes} bytes"},
+    )
+
+
+class AssetContentConflictException(Exception):
+    def __init__(self, asset_id: str):
+        self.asset_id = asset_id
+
+
+def asset_content_conflict_exception_handler(request: Request, exc: AssetContentConflictException):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"error": "conflict", "message": f"Asset '{exc.asset_id}' already has different content"},
+    )
+
+
+class AssetUploadInProgressException(Exception):
+    def __init__(self, asset_id: str):
+        self.asset_id = asset_id
+
+
+def asset_upload_in_progress_exception_handler(request: Request, exc: AssetUploadInProgressException):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"error": "upload_in_progress", "message": f"Content for asset '{exc.asset_id}' is already being uploaded"},
+        headers={"Retry-After": "1"},
+    )
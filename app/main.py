@@ -1,17 +1,136 @@
+import time
+
+_IMPORTS_STARTED = time.perf_counter()
+
 import logging
-from fastapi import FastAPI, Request
-from .routers import providers, slideshow, video, story
-from .exceptions import ProviderNotFoundException, provider_not_found_exception_handler
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from .config import get_settings
+from .routers import admin, batch, providers, slideshow, video, story
+from .exceptions import (
+    AssetContentConflictException,
+    AssetNotFoundException,
+    AssetTooLargeException,
+    AssetUploadInProgressException,
+    JobNotFoundException,
+    JobQueueFullException,
+    NoProviderAvailableException,
+    ProviderNotFoundException,
+    ProviderUnavailableException,
+    RateLimitedException,
+    asset_content_conflict_exception_handler,
+    asset_not_found_exception_handler,
+    asset_too_large_exception_handler,
+    asset_upload_in_progress_exception_handler,
+    job_not_found_exception_handler,
+    job_queue_full_exception_handler,
+    no_provider_available_exception_handler,
+    provider_not_found_exception_handler,
+    provider_unavailable_exception_handler,
+    rate_limited_exception_handler,
+)
+from .middleware.compression import CompressionMiddleware
+from .middleware.idempotency import IdempotencyMiddleware, get_idempotency_store
+from .middleware.metrics import MetricsMiddleware
+from .middleware.profiling import ProfilingMiddleware
+from .utils.common import json_response_class, raw_json_response
+from .utils.validation import get_schema_registry
+from .utils.stubgen import get_stub_engine
+from .services.catalog import get_provider_catalog
+from .services.ratelimit import get_rate_limiter
+from .services.health import get_health_monitor
+from .services.routing import get_provider_router
+from .services.textgen import get_text_generator
+from .services.jobs import CallableJobExecutor, get_job_engine
+from .services.render import get_render_pipeline
+from .services.timeline import get_slideshow_video_planner
+from .services.events import get_event_log
+from .services.joblogs import JobLogHandler, get_job_log_store
+from .services.webhooks import get_webhook_dispatcher
+from .services.resources import get_resource_store
+from .services.assets import get_asset_store
+from .services.metrics import JOB_QUEUE_DEPTH, get_metrics
+from .services.profiling import get_profile_store, get_stack_sampler
+from .utils.snapshot import StartupTimer, freeze_for_fork, get_startup_snapshot, save_startup_cache
+
+_IMPORTS_DONE = time.perf_counter()
+logger = logging.getLogger("potterlabs.startup")
+
+
+def _job_queue_depths():
+    return [(JOB_QUEUE_DEPTH, (("kind", kind),), depth) for kind, depth in get_job_engine().queue_depths().items()]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    jobs = get_job_engine()
+    webhooks = get_webhook_dispatcher()
+    health = get_health_monitor()
+    metrics = get_metrics()
+    assets = get_asset_store()
+    await metrics.start()
+    await assets.start()
+    await jobs.start()
+    await webhooks.start()
+    if get_settings().HEALTH_PROBE_ENABLED:
+        await health.start()
+    try:
+        yield
+    finally:
+        await jobs.stop()
+        await webhooks.stop()
+        await health.stop()
+        await assets.stop()
+        await metrics.stop()
 
 
-def create_app() -> FastAPI:
+def create_app(imports_started: float | None = None) -> FastAPI:
+    """Build the app and everything it serves from; `imports_started` adds module import time to the startup report."""
+    timer = StartupTimer(imports_started)
+    if imports_started is not None:
+        timer.mark("imports", imports_started, _IMPORTS_DONE)
+    settings = get_settings()
     app = FastAPI(
         title="Potterlabs API",
         version="0.1.0",
         description="FastAPI server for Providers and Slideshow groups (work in progress).",
+        lifespan=lifespan,
+        default_response_class=json_response_class(settings.JSON_RESPONSE_CLASS),
     )
 
+    # Parse schemas, compile validators and load examples/providers now so no request pays for it,
+    # and so multi-worker servers that import the app before forking share all of it.
+    with timer.phase("snapshot"):
+        snapshot = get_startup_snapshot()
+    with timer.phase("schemas"):
+        get_schema_registry()
+    with timer.phase("stubs"):
+        get_stub_engine().warm()
+    with timer.phase("catalog"):
+        get_provider_catalog()
+    save_startup_cache(settings, snapshot)
+    with timer.phase("services"):
+        get_rate_limiter()
+        get_provider_router()
+        get_text_generator()
+        get_job_engine().register("storyboard-renders", CallableJobExecutor(get_render_pipeline().run_job))
+        get_job_engine().register("slideshow-videos", CallableJobExecutor(get_slideshow_video_planner().run_job))
+        get_job_engine().add_listener(get_resource_store().record_job)
+        get_job_engine().add_listener(get_event_log().record_job)
+        get_job_engine().add_listener(get_job_log_store().record_job)
+        get_job_engine().add_listener(get_webhook_dispatcher().record_job)
+        get_metrics().add_collector(_job_queue_depths)
+
     app.add_exception_handler(ProviderNotFoundException, provider_not_found_exception_handler)
+    app.add_exception_handler(JobNotFoundException, job_not_found_exception_handler)
+    app.add_exception_handler(JobQueueFullException, job_queue_full_exception_handler)
+    app.add_exception_handler(RateLimitedException, rate_limited_exception_handler)
+    app.add_exception_handler(ProviderUnavailableException, provider_unavailable_exception_handler)
+    app.add_exception_handler(NoProviderAvailableException, no_provider_available_exception_handler)
+    app.add_exception_handler(AssetNotFoundException, asset_not_found_exception_handler)
+    app.add_exception_handler(AssetTooLargeException, asset_too_large_exception_handler)
+    app.add_exception_handler(AssetContentConflictException, asset_content_conflict_exception_handler)
+    app.add_exception_handler(AssetUploadInProgressException, asset_upload_in_progress_exception_handler)
 
     # Include providers at root to match spec (e.g., /providers)
     app.include_router(providers.router)
@@ -19,30 +138,67 @@ def create_app() -> FastAPI:
     app.include_router(slideshow.router)
     app.include_router(video.router)
     app.include_router(story.router)
+    app.include_router(batch.router)
+    if settings.PROFILING_ENABLED and settings.PROFILING_TOKEN:
+        app.include_router(admin.router)
 
     @app.get("/health", tags=["Health"])  # simple health check
     async def health():
-        return {"ok": True}
-
-    logger = logging.getLogger("potterlabs")
-    logging.basicConfig(level=logging.INFO)
+        return raw_json_response(b'{"ok":true}')
 
-    @app.middleware("http")
-    async def idempotency_and_validation(request: Request, call_next):
-        # Idempotency-Key: warn if missing on POST, but continue
-        if request.method.upper() == "POST":
-            if "Idempotency-Key" not in request.headers:
-                logger.warning("POST %s missing Idempotency-Key header", request.url.path)
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(await get_metrics().render_async(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
-            # Placeholder for JSON Schema validation hook by path.
-            # When implementing POST routes, call a validator with the appropriate schema.
-            # We intentionally don't block here until routes define a schema mapping.
+    logging.basicConfig(level=logging.INFO)
+    potterlabs_logger = logging.getLogger("potterlabs")
+    if not any(isinstance(h, JobLogHandler) for h in potterlabs_logger.handlers):
+        potterlabs_logger.addHandler(JobLogHandler(get_job_log_store()))
 
-        response = await call_next(request)
-        return response
+    # Request bodies are validated per route against the schema registry (422 on failure).
+    app.add_middleware(
+        IdempotencyMiddleware,
+        store=get_idempotency_store(),
+        require_key=settings.IDEMPOTENCY_REQUIRE_KEY,
+        wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT_SEC,
+        max_body_bytes=settings.IDEMPOTENCY_MAX_BODY_BYTES,
+    )
+    # Outside idempotency, so stored responses stay uncompressed and replays are encoded per client.
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            encodings=settings.COMPRESSION_ENCODINGS,
+            levels=settings.COMPRESSION_LEVELS,
+            min_size=settings.COMPRESSION_MIN_BYTES,
+        )
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=get_profile_store(),
+            sampler=get_stack_sampler(),
+            header=settings.PROFILING_HEADER,
+            token=settings.PROFILING_TOKEN,
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            slow_after=None if settings.PROFILING_SLOW_MS is None else settings.PROFILING_SLOW_MS / 1000,
+            max_stacks=settings.PROFILING_MAX_STACKS,
+        )
+    # Outermost, so request timings include idempotency replays and waits.
+    app.add_middleware(MetricsMiddleware, metrics=get_metrics())
 
+    app.state.startup_report = report = {**timer.report(), "startup_cache": "hit" if snapshot.from_cache else "miss"}
+    logger.info(
+        "Startup took %.1f ms (%s; startup cache %s)",
+        report["total_ms"],
+        ", ".join(f"{name} {ms:.1f}" for name, ms in report["phases_ms"].items()),
+        report["startup_cache"],
+    )
     return app
 
 
-# Uvicorn entrypoint: `uvicorn app.main:app --reload --port 4009`
-app = create_app()
+# Uvicorn entrypoint: `uvicorn app.main:app --reload --port 4009`. `uvicorn --workers N` spawns fresh
+# interpreters that each build their own app; to build it once and share it copy-on-write, fork the workers
+# from a preloaded parent (`gunicorn --preload -k uvicorn.workers.UvicornWorker`). Stores reopen their SQLite
+# connections in each forked worker (app/utils/sqlite.py); background tasks start with each worker's lifespan.
+app = create_app(imports_started=_IMPORTS_STARTED)
+if get_settings().STARTUP_GC_FREEZE:
+    freeze_for_fork()
@@ -0,0 +1 @@
+"""Pure-ASGI middleware wired up in `create_app`."""
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import zlib
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:  # Optional codecs; gzip is always available.
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    try:
+        import brotlicffi as brotli  # type: ignore[no-redef]
+    except ImportError:
+        brotli = None  # type: ignore[assignment]
+
+# Types worth compressing; everything else (images, audio, video, archives) already is.
+_COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/xml", "application/javascript", "image/svg+xml"}
+# Streams whose chunks must reach the client as they are produced and unbuffered by any proxy.
+_UNCOMPRESSED_TYPES = {"text/event-stream"}
+
+
+class Encoder:
+    """One response body's compressor: `compress` whatever is ready, `flush` to emit it now, `finish` at the end."""
+
+    __slots__ = ("compress", "flush", "finish")
+
+    def __init__(self, compress: Callable[[bytes], bytes], flush: Callable[[], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.flush = flush
+        self.finish = finish
+
+
+def _gzip(level: int) -> Encoder:
+    c = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return Encoder(c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush)
+
+
+def _brotli(level: int) -> Encoder:
+    c = brotli.Compressor(quality=level)
+    return Encoder(c.process, c.flush, c.finish)
+
+
+def _zstd(level: int) -> Encoder:
+    c = zstandard.ZstdCompressor(level=level).compressobj()
+    return Encoder(c.compress, lambda: c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), c.flush)
+
+
+# Levels for codings missing from `levels`: each coding's fast end, where JSON still shrinks several-fold.
+DEFAULT_LEVELS: Dict[str, int] = {"gzip": 6, "br": 4, "zstd": 3}
+# Content codings this process can produce.
+ENCODERS: Dict[str, Callable[[int], Encoder]] = {"gzip": _gzip}
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+
+
+def negotiate(accept_encoding: str, preferred: Sequence[str]) -> str | None:
+    """The coding from `preferred` the client ranks highest (ties go to the earlier one), or None for identity."""
+    ranks: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().lower().partition(";")
+        q = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                q = float(value)
+            except ValueError:
+                q = 0.0
+        ranks[coding.strip()] = q
+    wildcard = ranks.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in preferred:
+        q = ranks.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type in _UNCOMPRESSED_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES or media_type.endswith(("+json", "+xml"))
+
+
+class CompressionMiddleware:
+    """Compresses response bodies with the best coding the client accepts (`encodings` is our order of preference).
+
+    Bodies are compressed as they are sent, so a streamed response is never
+    held in memory: each chunk is flushed through the compressor as it
+    arrives, which keeps NDJSON results and streamed pages incremental.
+    Responses below `min_size` bytes (when their length is known), bodies
+    that are not text-like, event streams, byte ranges and responses that
+    already carry a Content-Encoding go out untouched. ETags are left as
+    they are: responses that support Range (the one strong-validator use,
+    via If-Range) are never compressed.
+    """
+
+    def __init__(self, app: ASGIApp, encodings: Sequence[str], levels: Dict[str, int], min_size: int = 1024):
+        self.app = app
+        self.encodings = [e for e in encodings if e in ENCODERS]
+        self.levels = {**DEFAULT_LEVELS, **levels}
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        accept = next((value for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        coding = negotiate(accept.decode("latin-1"), self.encodings) if accept else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        encoder: Encoder | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if self._eligible(message["headers"]):
+                    start = message  # held until the first body chunk shows whether there are more
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":  # e.g. pathsend: the server sends the body itself
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.min_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[coding](self.levels[coding])
+                headers = MutableHeaders(raw=list(start["headers"]))
+                start["headers"] = headers.raw
+                headers["content-encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["content-length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+            chunk = encoder.compress(body) + (encoder.flush() if more_body else encoder.finish())
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _eligible(self, raw_headers: List[Tuple[bytes, bytes]]) -> bool:
+        content_type = b""
+        for name, value in raw_headers:
+            if name in (b"content-encoding", b"content-range", b"accept-ranges"):
+                return False
+            if name == b"content-length" and int(value) < self.min_size:
+                return False
+            if name == b"content-type":
+                content_type = value
+        return _compressible(content_type.decode("latin-1"))
@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import get_settings
+from ..utils.sqlite import Database
+
+logger = logging.getLogger("potterlabs.idempotency")
+
+_HEADER = b"idempotency-key"
+# Headers worth replaying; hop-by-hop and length headers are recomputed.
+_REPLAY_HEADERS = {b"content-type", b"location", b"etag", b"retry-after"}
+# Answers that mean "not now" rather than "no"; storing them would replay the refusal for the whole TTL.
+_RETRY_LATER = frozenset({408, 409, 425, 429})
+
+
+def is_final(status: int, headers: Iterable[Tuple[bytes, bytes]] = ()) -> bool:
+    """Whether a response settles its request, so a retry with the same key should get it again."""
+    return status < 500 and status not in _RETRY_LATER and not any(k.lower() == b"retry-after" for k, _ in headers)
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class IdempotencyStore(ABC):
+    """Where completed responses live, keyed by `<method> <path> <Idempotency-Key>`.
+
+    `claim` arbitrates between processes: only the claimant runs the request,
+    everyone else waits for `get` to return the stored response.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> StoredResponse | None: ...
+
+    @abstractmethod
+    def claim(self, key: str, fingerprint: str) -> bool: ...
+
+    @abstractmethod
+    def complete(self, key: str, response: StoredResponse) -> None: ...
+
+    @abstractmethod
+    def release(self, key: str) -> None: ...
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Per-process LRU bounded to `max_entries`, with entries expiring after `ttl` seconds.
+
+    `claim` marks the key in flight until `complete` or `release` (or
+    `lock_ttl` passes), so only one caller in the process runs it.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, lock_ttl: float = 60.0):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock_ttl = lock_ttl
+        self._entries: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+        self._claims: Dict[str, float] = {}  # key -> claim expires at
+
+    def get(self, key: str) -> StoredResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        return response
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        now = time.monotonic()
+        if self._claims.get(key, 0.0) > now or self.get(key) is not None:
+            return False
+        self._claims[key] = now + self._lock_ttl
+        return True
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        self._claims.pop(key, None)
+        now = time.monotonic()
+        self._entries[key] = (now + self._ttl, response)
+        self._entries.move_to_end(key)
+        # Entries are appended in expiry order, so expired ones sit at the front.
+        while self._entries:
+            oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+            if len(self._entries) <= self._max_entries and expires_at >= now:
+                break
+            del self._entries[oldest_key]
+
+    def release(self, key: str) -> None:
+        self._claims.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """A SQLite file shared by every worker on the host; keys also survive restarts.
+
+    A claimed-but-unfinished key carries a short lease (`lock_ttl`) so a worker
+    that dies mid-request does not block the key until the full TTL elapses.
+    """
+
+    _PURGE_EVERY = 256
+
+    def __init__(self, path: Path, ttl: float, max_entries: int, lock_ttl: float = 60.0):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock_ttl = lock_ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, state TEXT NOT NULL,"
+                " status INTEGER, headers TEXT, body BLOB, expires_at REAL NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires_at)",
+            ),
+        )
+
+    def get(self, key: str) -> StoredResponse | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, status, headers, body FROM idempotency"
+                " WHERE key = ? AND state = 'done' AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        fingerprint, status, headers, body = row
+        decoded = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(headers)]
+        return StoredResponse(fingerprint, status, decoded, bytes(body))
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO idempotency (key, fingerprint, state, expires_at) VALUES (?, ?, 'pending', ?)"
+                " ON CONFLICT(key) DO UPDATE SET fingerprint = excluded.fingerprint,"
+                " state = 'pending', status = NULL, headers = NULL, body = NULL, expires_at = excluded.expires_at"
+                " WHERE idempotency.expires_at < ?",
+                (key, fingerprint, now + self._lock_ttl, now),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, key: str, response: StoredResponse) -> None:
+        headers = json.dumps([(k.decode("latin-1"), v.decode("latin-1")) for k, v in response.headers])
+        with self._lock:
+            self._conn.execute(
+                "UPDATE idempotency SET state = 'done', fingerprint = ?, status = ?, headers = ?, body = ?,"
+                " expires_at = ? WHERE key = ?",
+                (response.fingerprint, response.status, headers, response.body, time.time() + self._ttl, key),
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                self._purge()
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
+
+    def _purge(self) -> None:
+        self._conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM idempotency WHERE key IN (SELECT key FROM idempotency WHERE state = 'done'"
+            " ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_entries,),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _json_error(status: int, error: str, message: str, extra_headers: Iterable[Tuple[bytes, bytes]] = ()) -> StoredResponse:
+    body = json.dumps({"error": error, "message": message}).encode("utf-8")
+    return StoredResponse("", status, [(b"content-type", b"application/json"), *extra_headers], body)
+
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated `Idempotency-Key` on POST.
+
+    Concurrent requests with the same key are coalesced: the first one runs,
+    the others wait for its result (in-process via an event, across workers by
+    polling the shared store). Reusing a key with a different body is a 422.
+    Only final responses are stored (see `is_final`): 5xx and retry-later
+    answers (408/409/425/429, or anything with Retry-After) release the key,
+    so those requests can be retried for real.
+    Keyed requests are buffered to fingerprint them, so their bodies are
+    capped at `max_body_bytes` (413), like the responses that get stored.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: IdempotencyStore,
+        require_key: bool = False,
+        wait_timeout: float = 30.0,
+        max_body_bytes: int = 1 << 20,
+        poll_interval: float = 0.05,
+    ):
+        self.app = app
+        self.store = store
+        self.require_key = require_key
+        self.wait_timeout = wait_timeout
+        self.max_body_bytes = max_body_bytes
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = None
+        for name, value in scope["headers"]:
+            if name == _HEADER:
+                idempotency_key = value.decode("latin-1")
+                break
+        if not idempotency_key:
+            if self.require_key:
+                await self._send(send, _json_error(400, "missing_idempotency_key", "Idempotency-Key header is required"))
+                return
+            logger.warning("POST %s missing Idempotency-Key header", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        read = await self._read_body(receive)
+        if read is None:
+            await self._send(send, _json_error(413, "request_too_large", f"Requests with an Idempotency-Key are limited to {self.max_body_bytes} bytes"))
+            return
+        messages, fingerprint = read
+        key = f"POST {scope['path']} {idempotency_key}"
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            stored = self.store.get(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    await self._send(send, _json_error(422, "idempotency_key_reused", "Idempotency-Key was already used with a different request body"))
+                else:
+                    await self._send(send, stored, replayed=True)
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await self._send(send, _json_error(409, "idempotency_key_in_flight", "A request with this Idempotency-Key is still in progress", [(b"retry-after", b"1")]))
+                return
+
+            event = self._inflight.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if not self.store.claim(key, fingerprint):
+                # Another worker owns the key; wait for it to publish the result.
+                await asyncio.sleep(min(self.poll_interval, max(remaining, 0)))
+                continue
+            break
+
+        event = self._inflight[key] = asyncio.Event()
+        try:
+            await self._run_and_store(scope, messages, receive, send, key, fingerprint)
+        finally:
+            self._inflight.pop(key, None)
+            event.set()
+
+    async def _run_and_store(self, scope: Scope, messages: List[Message], receive: Receive, send: Send, key: str, fingerprint: str) -> None:
+        pending = list(messages)
+
+        async def replay_receive() -> Message:
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+        size = 0
+        storable = True
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, headers, size, storable
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k.lower(), v) for k, v in message.get("headers", []) if k.lower() in _REPLAY_HEADERS]
+                if any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers):
+                    storable = False
+            elif message["type"] == "http.response.body" and storable:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_body_bytes:
+                    storable = False
+                    chunks.clear()
+                else:
+                    chunks.append(chunk)
+            await send(message)
+
+        stored = False
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            if storable and is_final(status, headers):
+                self.store.complete(key, StoredResponse(fingerprint, status, headers, b"".join(chunks)))
+                stored = True
+        finally:
+            if not stored:
+                self.store.release(key)
+
+    async def _read_body(self, receive: Receive) -> Tuple[List[Message], str] | None:
+        """The request's messages, to replay to the app, and the SHA-256 of its body; None past `max_body_bytes`."""
+        messages: List[Message] = []
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body_bytes:
+                return None
+            digest.update(chunk)
+            if not message.get("more_body", False):
+                break
+        return messages, digest.hexdigest()
+
+    @staticmethod
+    async def _send(send: Send, response: StoredResponse, replayed: bool = False) -> None:
+        headers = list(response.headers)
+        headers.append((b"content-length", str(len(response.body)).encode("latin-1")))
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+
+def build_idempotency_store(backend: str, sqlite_path: Path, ttl: float, max_entries: int) -> IdempotencyStore:
+    if backend == "memory":
+        return MemoryIdempotencyStore(ttl, max_entries)
+    if backend == "sqlite":
+        return SQLiteIdempotencyStore(sqlite_path, ttl, max_entries)
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND '{backend}' (expected 'memory' or 'sqlite')")
+
+
+@lru_cache
+def get_idempotency_store() -> IdempotencyStore:
+    """The store shared by the middleware and per-item keys in `POST /v1/batch`."""
+    settings = get_settings()
+    return build_idempotency_store(
+        settings.IDEMPOTENCY_BACKEND,
+        settings.IDEMPOTENCY_SQLITE_PATH,
+        settings.IDEMPOTENCY_TTL_SEC,
+        settings.IDEMPOTENCY_MAX_ENTRIES,
+    )
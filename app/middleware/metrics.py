@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.metrics import HTTP_DURATION, HTTP_IN_FLIGHT, HTTP_REQUESTS, MetricsRegistry
+
+_UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    """Counts and times every HTTP request, labelled by route template rather than raw path.
+
+    The route is read back from the `endpoint` the router stores in the scope,
+    so requests are matched once, by the router itself. Paths that match no
+    route share one label to keep series cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: MetricsRegistry):
+        self.app = app
+        self.metrics = metrics
+        self._templates: Dict[Any, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.add(HTTP_IN_FLIGHT, (), 1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.add(HTTP_IN_FLIGHT, (), -1)
+            route = self._template(scope)
+            method = scope["method"]
+            metrics.inc(HTTP_REQUESTS, (("method", method), ("route", route), ("status", str(status))))
+            metrics.observe(HTTP_DURATION, (("method", method), ("route", route)), time.perf_counter() - started)
+
+    def _template(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return _UNMATCHED
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = _UNMATCHED
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            self._templates[endpoint] = template
+        return template
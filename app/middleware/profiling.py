@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import random
+import time
+from urllib.parse import parse_qsl
+
+import anyio
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.profiling import ProfileStore, RequestProfile, StackSampler, activate, deactivate
+
+logger = logging.getLogger("potterlabs.profiling")
+
+
+class ProfilingMiddleware:
+    """Profiles requests on demand and captures slow ones.
+
+    A request is profiled from its first byte when it carries `header` (with
+    the value `token`, when one is set) or is picked at `sample_rate`. Every
+    other request gets a profile that only records stage timings, plus a timer
+    that starts stack sampling once it has run for `slow_after` seconds; if it
+    finishes sooner the profile is dropped. "Run" ends when the response
+    starts, so SSE/NDJSON streams are judged by their handler's time, not by
+    how long the client listens; `?wait=` long-polls, which are slow on
+    purpose, are never captured as slow. Only installed when profiling is
+    enabled, so a disabled profiler adds nothing to the request path.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        sampler: StackSampler,
+        header: str,
+        token: str | None = None,
+        sample_rate: float = 0.0,
+        slow_after: float | None = None,
+        max_stacks: int = 200,
+    ):
+        self.app = app
+        self.store = store
+        self.sampler = sampler
+        self.header = header.lower().encode("latin-1")
+        self.token = None if token is None else token.encode("utf-8")
+        self.sample_rate = sample_rate
+        self.slow_after = slow_after
+        self.max_stacks = max_stacks
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/admin/"):
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None and (self.slow_after is None or _long_poll(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        responded: float | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, responded
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                responded = time.perf_counter()
+                if timer is not None:
+                    timer.cancel()
+            await send(message)
+
+        profile = RequestProfile(scope["method"], scope["path"], trigger)
+        timer = None
+        if trigger is not None:
+            self.sampler.attach(profile)
+        else:
+            timer = asyncio.get_running_loop().call_later(self.slow_after, self.sampler.attach, profile)
+        token = activate(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            deactivate(token)
+            if timer is not None:
+                timer.cancel()
+            self.sampler.detach(profile)
+            finished = time.perf_counter()
+            duration = finished - profile.started
+            if trigger is not None or (responded or finished) - profile.started >= self.slow_after:
+                capture = profile.capture(status, duration, self.sampler.interval, self.max_stacks)
+                try:
+                    await anyio.to_thread.run_sync(self.store.save, capture)
+                except OSError:
+                    logger.warning("Could not save profile %s", profile.id, exc_info=True)
+                else:
+                    logger.info("Profiled %s %s (%s, %.1f ms): %s", scope["method"], scope["path"], capture["trigger"], capture["duration_ms"], profile.id)
+
+    def _trigger(self, scope: Scope) -> str | None:
+        for name, value in scope["headers"]:
+            if name == self.header:
+                if self.token is None or hmac.compare_digest(value, self.token):
+                    return "header"
+                break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+
+def _long_poll(scope: Scope) -> bool:
+    """Whether the request asks to be held open (`?wait=` with a nonzero value)."""
+    return any(name == "wait" and value not in ("", "0") for name, value in parse_qsl(scope["query_string"].decode("latin-1")))
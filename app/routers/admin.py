@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from ..config import Settings, get_settings
+from ..services.profiling import ProfileStore, get_profile_store
+from ..utils.common import dumps, raw_json_response
+
+
+def _require_token(request: Request, settings: Settings = Depends(get_settings)) -> None:
+    """Admin routes want PROFILING_TOKEN in PROFILING_HEADER and are hidden (404) otherwise, or always when no token is set."""
+    token = settings.PROFILING_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get(settings.PROFILING_HEADER, "").encode("latin-1"), token.encode("utf-8")):
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": "Not Found"})
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], include_in_schema=False, dependencies=[Depends(_require_token)])
+
+_PROFILES_LIMIT = Query(50, ge=1, le=1000)
+
+
+@router.get("/profiles")
+async def list_profiles(limit: int = _PROFILES_LIMIT, store: ProfileStore = Depends(get_profile_store)) -> Response:
+    """Newest captures first, without their stacks."""
+    return raw_json_response(dumps({"profiles": store.list(limit)}))
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, store: ProfileStore = Depends(get_profile_store)) -> Response:
+    body = store.get(profile_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": f"Profile '{profile_id}' not found"})
+    return raw_json_response(body)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ..config import Settings, get_settings
+from ..exceptions import JobQueueFullException, ProviderUnavailableException, RateLimitedException
+from ..middleware.idempotency import IdempotencyStore, StoredResponse, get_idempotency_store
+from ..services.jobs import JobEngine, get_job_engine
+from ..services.ratelimit import Throttle, get_throttle
+from ..utils.common import NDJSON, dumps, raw_json_response
+from ..utils.validation import SchemaRegistry, get_schema_registry, validate_body
+
+router = APIRouter(prefix="/v1", tags=["Batch"])
+
+# `op` -> (request schema, job kind): every job-backed create endpoint, named after its path.
+OPERATIONS: Dict[str, Tuple[str, str]] = {
+    "images": ("ImageCreate", "images"),
+    "voiceovers": ("VoiceoverCreate", "voiceovers"),
+    "background-music": ("BackgroundMusicCreate", "background-music"),
+    "slideshow-videos": ("SlideshowVideoCreate", "slideshow-videos"),
+    "videos": ("VideoCreateRequest", "videos"),
+    "stories": ("StoryCreateRequest", "stories"),
+}
+
+
+class _Failure(Exception):
+    def __init__(self, status: int, error: str, message: str, **extra: Any):
+        self.status = status
+        self.detail = {"error": error, "message": message, **extra}
+
+
+class BatchRunner:
+    """Checks and submits batch operations, each with the semantics of its single-item POST.
+
+    An operation is `{"op": "<path>", "body": {...}, "idempotency_key": "..."}`.
+    A key is scoped to its op, like the header on the single endpoint, and a
+    repeat with the same body replays the stored result instead of submitting
+    again; a concurrent repeat (in another batch) waits up to `wait_timeout`
+    for the first one's result. Only submissions are stored: a failure
+    releases the key, so a rejected or retry-later item can be sent again.
+    Every operation yields a result of its own, so one bad item never fails
+    the rest.
+    """
+
+    _POLL_INTERVAL = 0.05
+
+    def __init__(self, registry: SchemaRegistry, jobs: JobEngine, store: IdempotencyStore, throttle: Throttle, wait_timeout: float = 30.0):
+        self._registry = registry
+        self._jobs = jobs
+        self._store = store
+        self._throttle = throttle
+        self._wait_timeout = wait_timeout
+
+    def check(self, item: Any) -> Tuple[str, Dict[str, Any], str | None]:
+        if not isinstance(item, dict):
+            raise _Failure(422, "invalid_operation", "Each operation must be an object")
+        op, body, key = item.get("op"), item.get("body"), item.get("idempotency_key")
+        if op not in OPERATIONS:
+            raise _Failure(422, "unknown_operation", f"Unknown op '{op}' (expected one of: {', '.join(OPERATIONS)})")
+        if not isinstance(body, dict):
+            raise _Failure(422, "invalid_operation", "'body' must be an object")
+        if key is not None and (not isinstance(key, str) or not key):
+            raise _Failure(422, "invalid_operation", "'idempotency_key' must be a non-empty string")
+        try:
+            validate_body(body, self._registry.validator(OPERATIONS[op][0]))
+        except HTTPException as exc:
+            raise _Failure(exc.status_code, **exc.detail)
+        return op, body, key
+
+    async def execute(self, op: str, body: Dict[str, Any], key: str | None) -> Tuple[int, bytes, bool]:
+        """Returns `(status, encoded resource, replayed)`."""
+        if key is None:
+            return status.HTTP_202_ACCEPTED, await self._submit(op, body), False
+
+        scoped = f"BATCH {op} {key}"
+        fingerprint = hashlib.sha256(dumps(body)).hexdigest()
+        deadline = time.monotonic() + self._wait_timeout
+        while True:
+            stored = self._store.get(scoped)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise _Failure(422, "idempotency_key_reused", "idempotency_key was already used with a different body")
+                return stored.status, stored.body, True
+            if self._store.claim(scoped, fingerprint):
+                break
+            if time.monotonic() >= deadline:
+                raise _Failure(409, "idempotency_key_in_flight", "An operation with this idempotency_key is still in progress", retry_after=1)
+            await asyncio.sleep(self._POLL_INTERVAL)
+        try:
+            encoded = await self._submit(op, body)
+        except BaseException:
+            self._store.release(scoped)
+            raise
+        self._store.complete(scoped, StoredResponse(fingerprint, status.HTTP_202_ACCEPTED, [(b"content-type", b"application/json")], encoded))
+        return status.HTTP_202_ACCEPTED, encoded, False
+
+    async def _submit(self, op: str, body: Dict[str, Any]) -> bytes:
+        kind = OPERATIONS[op][1]
+        try:
+            await self._throttle(kind, body)
+        except RateLimitedException as exc:
+            raise _Failure(429, "rate_limited", f"Rate limit for provider '{exc.provider_id}' exceeded", scope=exc.scope, retry_after=exc.retry_after)
+        except ProviderUnavailableException as exc:
+            raise _Failure(503, "provider_unavailable", f"Provider '{exc.provider_id}' is failing; its circuit is open", retry_after=exc.retry_after)
+        try:
+            return self._jobs.submit(kind, body).encode()
+        except JobQueueFullException as exc:
+            raise _Failure(429, "queue_full", f"Too many pending '{exc.kind}' jobs; retry later", retry_after=exc.retry_after)
+
+    async def run(self, index: int, item: Any) -> Tuple[bool, bytes]:
+        try:
+            return True, self.result(index, item, *await self.execute(*self.check(item)))
+        except _Failure as failure:
+            return False, self.failure(index, item, failure)
+
+    @staticmethod
+    def result(index: int, item: Any, status_code: int, encoded: bytes, replayed: bool) -> bytes:
+        head = b'{"index":%d,"op":%s,"status":%d,' % (index, dumps(item["op"]), status_code)
+        return head + (b'"replayed":true,' if replayed else b"") + b'"body":' + encoded + b"}"
+
+    @staticmethod
+    def failure(index: int, item: Any, failure: _Failure) -> bytes:
+        op = item.get("op") if isinstance(item, dict) else None
+        return dumps({"index": index, "op": op, "status": failure.status, "error": failure.detail})
+
+
+class _ResultStream(StreamingResponse):
+    """Streams results while the request body is still arriving.
+
+    `StreamingResponse` also listens on `receive` for a disconnect, which would
+    swallow the body chunks the results generator is reading; this never touches it.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _stream_results(request: Request, runner: BatchRunner, max_line_bytes: int) -> AsyncIterator[bytes]:
+    index = 0
+    buffer = bytearray()  # the line being read; appended in place so long lines do not copy per chunk
+
+    async def run_line(line: bytes) -> bytes:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            return runner.failure(index, None, _Failure(400, "invalid_json", "Line is not valid JSON")) + b"\n"
+        return (await runner.run(index, item))[1] + b"\n"
+
+    def too_long() -> bytes:
+        return runner.failure(index, None, _Failure(413, "line_too_long", f"Operation exceeds {max_line_bytes} bytes")) + b"\n"
+
+    async for chunk in request.stream():
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            buffer += chunk[start:end]
+            start = end + 1
+            if len(buffer) > max_line_bytes:
+                yield too_long()
+                return
+            if buffer.strip():
+                yield await run_line(bytes(buffer))
+                index += 1
+            buffer.clear()
+        buffer += chunk[start:]
+        if len(buffer) > max_line_bytes:
+            yield too_long()
+            return
+    if buffer.strip():
+        yield await run_line(bytes(buffer))
+
+
+@router.post("/batch")
+async def create_batch(
+    request: Request,
+    registry: SchemaRegistry = Depends(get_schema_registry),
+    jobs: JobEngine = Depends(get_job_engine),
+    store: IdempotencyStore = Depends(get_idempotency_store),
+    settings: Settings = Depends(get_settings),
+    throttle: Throttle = Depends(get_throttle),
+) -> Any:
+    """Submit many create operations in one request.
+
+    JSON: `{"operations": [...]}` in, `{"results": [...], "succeeded": n, "failed": m}` out,
+    one result per operation in order. NDJSON (`Content-Type: application/x-ndjson`):
+    one operation per line in, one result per line out as each is submitted, with no
+    size limit on the batch.
+    """
+    runner = BatchRunner(registry, jobs, store, throttle, settings.IDEMPOTENCY_WAIT_TIMEOUT_SEC)
+
+    if request.headers.get("content-type", "").startswith(NDJSON):
+        return _ResultStream(_stream_results(request, runner, settings.BATCH_MAX_LINE_BYTES), media_type=NDJSON)
+
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"error": "invalid_json", "message": "Request body is not valid JSON"})
+    operations = payload.get("operations") if isinstance(payload, dict) else None
+    if not isinstance(operations, list):
+        raise HTTPException(status_code=422, detail={"error": "unprocessable_entity", "message": "'operations' must be an array"})
+    if len(operations) > settings.BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail={"error": "batch_too_large", "message": f"At most {settings.BATCH_MAX_OPERATIONS} operations per batch; use NDJSON for more"},
+        )
+
+    # Check every operation before submitting any, so a malformed batch costs no queue slots.
+    checked: List[Any] = []
+    for operation in operations:
+        try:
+            checked.append(runner.check(operation))
+        except _Failure as failure:
+            checked.append(failure)
+
+    results: List[bytes] = []
+    succeeded = 0
+    for index, (operation, outcome) in enumerate(zip(operations, checked)):
+        if isinstance(outcome, _Failure):
+            results.append(runner.failure(index, operation, outcome))
+            continue
+        try:
+            results.append(runner.result(index, operation, *await runner.execute(*outcome)))
+            succeeded += 1
+        except _Failure as failure:
+            results.append(runner.failure(index, operation, failure))
+    failed = len(results) - succeeded
+    return raw_json_response(b'{"results":[' + b",".join(results) + b'],"succeeded":%d,"failed":%d}' % (succeeded, failed))
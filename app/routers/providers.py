@@ -1,79 +1,43 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import List
 
-from fastapi import APIRouter, Depends
-from pydantic import BaseModel, AnyUrl, Field
+from fastapi import APIRouter, Depends, Request, Response
 
-from ..config import Settings, get_settings
 from ..exceptions import ProviderNotFoundException
+from ..services.health import HealthMonitor, get_health_monitor
+from ..services.catalog import CAPABILITY_MAP, Capability, Provider, ProviderCatalog, get_provider_catalog  # noqa: F401
+from ..utils.common import conditional_json_response, raw_json_response
 
 router = APIRouter(tags=["Providers"])
 
-
-class Provider(BaseModel):
-    id: str
-    name: str
-    category: str
-    description: str | None = None
-    url: AnyUrl | None = None
-    status: str = Field("active", pattern=r"^(active|inactive)$")
-
-
-class Capability(BaseModel):
-    id: str
-    name: str
-    type: str
-    input_schema: str | None = None
-    output_schema: str | None = None
-
-
-def _load_json(path: Path) -> Any:
-    import json
-
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def _all_providers(settings: Settings) -> List[Provider]:
-    data = _load_json(settings.PROVIDERS_EXAMPLES_PATH / "providers.json")
-    return [Provider(**p) for p in data]
-
-
-def _all_capabilities(settings: Settings) -> List[Capability]:
-    data = _load_json(settings.PROVIDERS_EXAMPLES_PATH / "capabilities.json")
-    return [Capability(**c) for c in data]
-
-
-# Optional, simple mapping so some providers expose a subset.
-CAPABILITY_MAP: Dict[str, List[str]] = {
-    # OpenRouter focuses on text generation
-    "openrouter": ["text-gen"],
-    # others fall back to all capabilities for now
-}
+# `response_model` only documents these routes: they return pre-encoded catalog bytes as a
+# Response, which FastAPI sends as-is without re-validating or re-serializing the models.
 
 
 @router.get("/providers", response_model=List[Provider])
-async def list_providers(settings: Settings = Depends(get_settings)) -> List[Provider]:
-    return _all_providers(settings)
+async def list_providers(request: Request, catalog: ProviderCatalog = Depends(get_provider_catalog)) -> Response:
+    encoded = catalog.snapshot.providers_encoded
+    return conditional_json_response(request, encoded.body, encoded.etag)
 
 
 @router.get("/providers/{id}", response_model=Provider)
-async def get_provider(id: str, settings: Settings = Depends(get_settings)) -> Provider:
-    for p in _all_providers(settings):
-        if p.id == id:
-            return p
-    raise ProviderNotFoundException(id)
+async def get_provider(id: str, request: Request, catalog: ProviderCatalog = Depends(get_provider_catalog)) -> Response:
+    encoded = catalog.snapshot.provider_encoded.get(id)
+    if encoded is None:
+        raise ProviderNotFoundException(id)
+    return conditional_json_response(request, encoded.body, encoded.etag)
 
 
 @router.get("/providers/{id}/capabilities", response_model=List[Capability])
-async def list_capabilities(id: str, settings: Settings = Depends(get_settings)) -> List[Capability]:
-    # Validate provider exists
-    await get_provider(id, settings)
+async def list_capabilities(id: str, request: Request, catalog: ProviderCatalog = Depends(get_provider_catalog)) -> Response:
+    encoded = catalog.snapshot.capabilities_encoded.get(id)
+    if encoded is None:
+        raise ProviderNotFoundException(id)
+    return conditional_json_response(request, encoded.body, encoded.etag)
+
 
-    caps = _all_capabilities(settings)
-    names = CAPABILITY_MAP.get(id)
-    if names:
-        return [c for c in caps if c.id in names]
-    return caps
+@router.get("/providers/{id}/health")
+async def get_provider_health(id: str, health: HealthMonitor = Depends(get_health_monitor)) -> Response:
+    """`ProviderHealth` from the background prober's cached state; never calls the provider."""
+    return raw_json_response(health.health(id))
@@ -1,199 +1,430 @@
 from __future__ import annotations
 
-from typing import Any, Dict
-
-from fastapi import APIRouter, Body, status, Depends
-
-from ..utils.validation import validate_body, load_schema
-from ..utils.stubgen import generate_stub
+import json
+import logging
+import secrets
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response, status, Depends
+from fastapi.responses import StreamingResponse
+
+from ..utils.validation import SchemaRegistry, get_schema_registry, validate_body
+from ..utils.stubgen import StubEngine, StubSpec, get_stub_engine
+from ..utils.common import NDJSON, dumps, file_response, raw_json_response
+from ..services.ratelimit import Throttle, get_throttle
+from ..services.jobs import JobEngine, get_job_engine
+from ..services.events import EventLog, get_event_log
+from ..services.joblogs import JobLogStore, get_job_log_store
+from ..services.resources import InvalidCursor, Page, ResourceStore, get_resource_store
+from ..services.assets import AssetStore, get_asset_store
+from ..services.timeline import slideshow_slides
+from ..services.textgen import TextGenerator, get_text_generator, script_prompt, stream_sections
+from ..exceptions import JobNotFoundException
 from ..config import Settings, get_settings
-from ..utils.common import _read_json, _maybe_example
 
 router = APIRouter(prefix="/v1", tags=["Slideshow"])
 
-
-def _response_from_schema(schema_file: str, settings: Settings) -> Any:
-    schema = load_schema(settings.SLIDESHOW_SCHEMAS_PATH / schema_file)
-    return generate_stub(schema)
+logger = logging.getLogger("potterlabs.scripts")
+
+# Create responses are the schema stub with a fresh id, persisted in the resource store so
+# GETs and lists return them; GETs of unknown ids still patch the path id into a stub.
+# The 202 endpoints (images, voiceovers, music, slideshow videos) are backed by the job engine.
+_SCRIPT = StubSpec("Script", slots=("id", "status"))
+_SCRIPT_GET = StubSpec("Script", slots=("id", "status"), defaults={"created_at": "1970-01-01T00:00:00Z", "sections": []})
+_BEATS = StubSpec("Beats", slots=("id", "status"))
+_SLIDESHOW_GET = StubSpec("Slideshow", slots=("id",))
+_VOICE = StubSpec("Voice", slots=("id", "provider", "name"))
+_ASSET_GET = StubSpec("Asset", slots=("id",))
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{secrets.token_hex(8)}"
+
+
+def _list_chunks(pages: Iterable[Page], ndjson: bool, envelope: bool) -> Iterator[bytes]:
+    """A listing's body a page at a time: `{"items":[...],"next":...}`, a bare array, or one item per line."""
+    if not ndjson:
+        yield b'{"items":[' if envelope else b"["
+    last, separator = None, b""
+    for last in pages:
+        if not last.items:
+            continue
+        if ndjson:
+            yield b"\n".join(last.items) + b"\n"
+        else:
+            yield separator + b",".join(last.items)
+            separator = b","
+    if not ndjson:
+        yield (b"]," + last.encode_next() + b"}") if envelope else b"]"
+
+
+def _list_response(request: Request, store: ResourceStore, kind: str, cursor: str | None, limit: int, status: str | None = None, envelope: bool = True) -> Response:
+    """A page of `kind`: a `ListResponse` object, a bare array (`envelope=False`), or NDJSON when the client accepts it.
+
+    Items are read RESOURCES_LIST_BATCH at a time. A page that reaches
+    RESOURCES_STREAM_MIN_BYTES is streamed from there on instead of being
+    joined in memory. Bare arrays and NDJSON carry the next cursor in
+    `X-Next-Cursor`, which a streamed page looks up before sending.
+    """
+    settings = get_settings()
+    ndjson = NDJSON in request.headers.get("accept", "")
+    media_type = NDJSON if ndjson else "application/json"
+    pages = store.pages(kind, limit, cursor, status, settings.RESOURCES_LIST_BATCH)
+    head: List[Page] = []
+    size = 0
+    try:
+        for page in pages:
+            head.append(page)
+            size += sum(map(len, page.items))
+            if size >= settings.RESOURCES_STREAM_MIN_BYTES:
+                response: Response = StreamingResponse(_list_chunks(chain(head, pages), ndjson, envelope), media_type=media_type)
+                next_cursor = store.next_cursor(kind, limit, cursor, status) if ndjson or not envelope else None
+                break
+        else:
+            response = Response(b"".join(_list_chunks(head, ndjson, envelope)), media_type=media_type)
+            next_cursor = head[-1].next
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail={"error": "invalid_cursor", "message": f"Invalid cursor '{cursor}'"})
+    if next_cursor is not None and (ndjson or not envelope):
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+_CURSOR = Query(None, description="Opaque cursor from a previous page's `next`.")
+_LIMIT = Query(50, ge=1, le=200)
+_STATUS = Query(None, description="Only list resources in this status.")
+_WAIT = Query(0, ge=0, description="Long-poll: seconds to wait for the job's status to change.")
+
+
+def _sse(event: bytes, data: Any) -> bytes:
+    return b"event: %s\ndata: %s\n\n" % (event, data if isinstance(data, bytes) else dumps(data))
+
+
+async def _script_stream(script_id: str, provider: str, deltas: AsyncIterator[str], options: Dict[str, Any], store: ResourceStore) -> AsyncIterator[bytes]:
+    """SSE: `start`, then `delta` per chunk of generated text and `section` per completed section, then the persisted `script`.
+
+    The script is persisted however the stream ends; if the client goes away
+    first, with the sections it got so far and status "failed".
+    """
+    created_at = datetime.now(timezone.utc).isoformat()
+    sections = []
+    saved = None
+
+    def save(outcome: str) -> bytes:
+        body = dumps({"id": script_id, "status": outcome, "created_at": created_at, "sections": sections})
+        store.put("scripts", script_id, body, outcome)
+        return body
+
+    try:
+        yield _sse(b"start", {"id": script_id, "provider": provider})
+        try:
+            async for kind, text in stream_sections(deltas, options.get("segment", "section"), options.get("normalize", True)):
+                if kind == "delta":
+                    yield _sse(b"delta", {"text": text})
+                else:
+                    section = {"id": f"sec_{len(sections) + 1}", "text": text}
+                    sections.append(section)
+                    yield _sse(b"section", section)
+        except Exception as exc:  # noqa: BLE001 - the stream has started; report the failure in-band
+            logger.exception("Script %s generation via %s failed", script_id, provider)
+            saved = save("failed")
+            yield _sse(b"error", {"error": "upstream_failed", "message": str(exc) or exc.__class__.__name__})
+        else:
+            saved = save("succeeded")
+        yield _sse(b"script", saved)
+    finally:
+        if saved is None:
+            logger.info("Script %s stream closed by the client after %d sections", script_id, len(sections))
+            save("failed")
 
 
 @router.post("/scripts", status_code=status.HTTP_201_CREATED)
-async def create_script(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "ScriptCreate.json")
-    example = _maybe_example("scripts.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("Script.json", settings)
+async def create_script(
+    request: Request,
+    payload: Dict[str, Any] = Body(...),
+    stream: bool = Query(False, description="Stream the script as it is generated (server-sent events); same as Accept: text/event-stream."),
+    registry: SchemaRegistry = Depends(get_schema_registry),
+    stubs: StubEngine = Depends(get_stub_engine),
+    store: ResourceStore = Depends(get_resource_store),
+    textgen: TextGenerator = Depends(get_text_generator),
+) -> Any:
+    validate_body(payload, registry.validator("ScriptCreate"))
+    script_id = _new_id("scr")
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        # Open the upstream stream before answering, so a provider outage is still a plain 503.
+        provider, deltas = await textgen.open(script_prompt(payload["input"]))
+        return StreamingResponse(
+            _script_stream(script_id, provider, deltas, payload.get("options") or {}, store),
+            status_code=status.HTTP_201_CREATED,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    body = stubs.example_or_render("scripts.create", _SCRIPT, id=script_id, status="succeeded")
+    store.put("scripts", script_id, body, "succeeded")
+    return raw_json_response(body, status.HTTP_201_CREATED)
 
 
 @router.get("/scripts")
-async def list_scripts() -> Any:
-    # Minimal list stub conforms to ListResponseScripts
-    return {"items": []}
+async def list_scripts(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, status: str | None = _STATUS, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return _list_response(request, store, "scripts", cursor, limit, status)
 
 
 @router.get("/scripts/{script_id}")
-async def get_script(script_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("Script.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", script_id)
-        data.setdefault("status", "succeeded")
-        data.setdefault("created_at", "1970-01-01T00:00:00Z")
-        data.setdefault("sections", [])
-    return data
+async def get_script(script_id: str, stubs: StubEngine = Depends(get_stub_engine), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    body = store.get("scripts", script_id)
+    return raw_json_response(body if body is not None else stubs.render(_SCRIPT_GET, id=script_id, status="succeeded"))
 
 
 @router.post("/beats", status_code=status.HTTP_201_CREATED)
-async def create_beats(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "BeatsCreate.json")
-    example = _maybe_example("beats.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("Beats.json", settings)
+async def create_beats(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), stubs: StubEngine = Depends(get_stub_engine), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    validate_body(payload, registry.validator("BeatsCreate"))
+    beats_id = _new_id("bt")
+    body = stubs.example_or_render("beats.create", _BEATS, id=beats_id, status="succeeded")
+    store.put("beats", beats_id, body, "succeeded")
+    return raw_json_response(body, status.HTTP_201_CREATED)
 
 
 @router.get("/beats")
-async def list_beats() -> Any:
-    # No explicit list schema; return empty for now
-    return {"items": []}
+async def list_beats(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, status: str | None = _STATUS, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return _list_response(request, store, "beats", cursor, limit, status)
 
 
 @router.post("/images", status_code=status.HTTP_202_ACCEPTED)
-async def create_images(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "ImageCreate.json")
-    example = _maybe_example("images.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("ImageJob.json", settings)
+async def create_images(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("ImageCreate"))
+    await throttle("images", payload)
+    job = jobs.submit("images", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/images")
-async def list_images() -> Any:
-    return {"items": []}
+async def list_images(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, status: str | None = _STATUS, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return _list_response(request, store, "images", cursor, limit, status)
 
 
 @router.get("/images/{image_job_id}")
-async def get_image_job(image_job_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("ImageJob.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", image_job_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_image_job(image_job_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(image_job_id, "images", wait)).encode())
 
 
 @router.post("/voiceovers", status_code=status.HTTP_202_ACCEPTED)
-async def create_voiceovers(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "VoiceoverCreate.json")
-    example = _maybe_example("voiceovers.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("VoiceoverJob.json", settings)
+async def create_voiceovers(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("VoiceoverCreate"))
+    await throttle("voiceovers", payload)
+    job = jobs.submit("voiceovers", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/voiceovers")
-async def list_voiceovers() -> Any:
-    return {"items": []}
+async def list_voiceovers(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, status: str | None = _STATUS, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return _list_response(request, store, "voiceovers", cursor, limit, status)
 
 
 @router.get("/voiceovers/{voiceover_id}")
-async def get_voiceover(voiceover_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("VoiceoverJob.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", voiceover_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_voiceover(voiceover_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(voiceover_id, "voiceovers", wait)).encode())
 
 
 @router.post("/background-music", status_code=status.HTTP_202_ACCEPTED)
-async def create_background_music(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "BackgroundMusicCreate.json")
-    example = _maybe_example("background-music.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("BackgroundMusicJob.json", settings)
+async def create_background_music(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("BackgroundMusicCreate"))
+    await throttle("background-music", payload)
+    job = jobs.submit("background-music", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/background-music/{music_id}")
-async def get_background_music(music_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("BackgroundMusicJob.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", music_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_background_music(music_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(music_id, "background-music", wait)).encode())
 
 
 @router.post("/slideshows", status_code=status.HTTP_201_CREATED)
-async def create_slideshows(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "SlideshowCreate.json")
-    example = _maybe_example("slideshows.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("Slideshow.json", settings)
+async def create_slideshows(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), store: ResourceStore = Depends(get_resource_store), assets: AssetStore = Depends(get_asset_store)) -> Any:
+    validate_body(payload, registry.validator("SlideshowCreate"))
+    preferred = payload["image_strategy"].get("prefer_asset_ids") or []
+    if preferred:
+        found = assets.lookup(preferred)
+        for i, asset_id in enumerate(preferred):
+            if found.get(asset_id, {}).get("status") != "ready":
+                detail = {"error": "unprocessable_entity", "message": f"Asset '{asset_id}' does not exist or has no content yet", "path": ["image_strategy", "prefer_asset_ids", i]}
+                raise HTTPException(status_code=422, detail=detail)
+    beats = payload["beats"].get("items")
+    if beats is None:
+        stored = store.get("beats", payload["beats"]["beats_id"])
+        beats = (json.loads(stored).get("beats") or []) if stored is not None else []
+    slideshow_id = _new_id("ss")
+    body = dumps({
+        "id": slideshow_id,
+        "status": "succeeded",
+        "slides": slideshow_slides(payload, beats),
+        "links": {"self": f"/v1/slideshows/{slideshow_id}", "render": None},
+    })
+    store.put("slideshows", slideshow_id, body, "succeeded")
+    return raw_json_response(body, status.HTTP_201_CREATED)
 
 
 @router.get("/slideshows")
-async def list_slideshows() -> Any:
-    return {"items": []}
+async def list_slideshows(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, status: str | None = _STATUS, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return _list_response(request, store, "slideshows", cursor, limit, status)
 
 
 @router.get("/slideshows/{slideshow_id}")
-async def get_slideshow(slideshow_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("Slideshow.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", slideshow_id)
-    return data
+async def get_slideshow(slideshow_id: str, stubs: StubEngine = Depends(get_stub_engine), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    body = store.get("slideshows", slideshow_id)
+    return raw_json_response(body if body is not None else stubs.render(_SLIDESHOW_GET, id=slideshow_id))
 
 
 @router.post("/slideshow-videos", status_code=status.HTTP_202_ACCEPTED)
-async def create_slideshow_videos(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "SlideshowVideoCreate.json")
-    example = _maybe_example("slideshow-videos.create", settings.SLIDESHOW_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("SlideshowVideoJob.json", settings)
+async def create_slideshow_videos(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("SlideshowVideoCreate"))
+    await throttle("slideshow-videos", payload)
+    job = jobs.submit("slideshow-videos", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/slideshow-videos/{video_id}")
-async def get_slideshow_video(video_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("SlideshowVideoJob.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", video_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_slideshow_video(video_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(video_id, "slideshow-videos", wait)).encode())
+
+
+def _parse_cursor(cursor: str | None) -> int | None:
+    if cursor is None or cursor == "":
+        return None
+    try:
+        seq = int(cursor)
+    except ValueError:
+        seq = -1
+    if seq < 0:
+        raise HTTPException(status_code=400, detail={"error": "invalid_cursor", "message": f"Invalid cursor '{cursor}'"})
+    return seq
+
+
+async def _event_stream(log: EventLog, after: int, limit: int, heartbeat: float) -> AsyncIterator[bytes]:
+    yield b"retry: 2000\n\n"
+    while True:
+        events = log.read(after, limit)
+        if events:
+            after = events[-1].seq
+            yield b"".join(e.sse() for e in events)
+            continue
+        if not await log.wait(after, heartbeat):
+            yield b": keep-alive\n\n"
 
 
 @router.get("/events")
-async def get_events() -> Any:
-    return {"events": []}
+async def get_events(
+    request: Request,
+    cursor: str | None = Query(None, description="Opaque cursor from a previous page's next_cursor (or an SSE event id)."),
+    limit: int = Query(100, ge=1, le=1000),
+    wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for new events when none are pending."),
+    log: EventLog = Depends(get_event_log),
+    settings: Settings = Depends(get_settings),
+) -> Any:
+    after = _parse_cursor(cursor if cursor is not None else request.headers.get("last-event-id"))
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        # A stream without a cursor starts at the live tail rather than replaying history.
+        start = log.last_seq if after is None else after
+        return StreamingResponse(
+            _event_stream(log, start, limit, settings.EVENTS_HEARTBEAT_SEC),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    after = after or 0
+    events = log.read(after, limit)
+    if not events and wait > 0:
+        if await log.wait(after, min(wait, settings.EVENTS_MAX_WAIT_SEC)):
+            events = log.read(after, limit)
+    next_cursor = events[-1].seq if events else after
+    body = b'{"events":[' + b",".join(e.encoded for e in events) + b'],"next_cursor":"%d"}' % next_cursor
+    return raw_json_response(body)
 
 
 @router.get("/jobs/{job_id}/logs")
-async def get_job_logs(job_id: str) -> Any:
-    return {"lines": []}
+async def get_job_logs(
+    job_id: str,
+    request: Request,
+    tail: int = Query(200, ge=1, le=1000),
+    since: int | None = Query(None, ge=0, description="Byte offset (a previous next_offset) to read forward from."),
+    follow: bool = Query(False, description="Keep the response open and push new lines until the job finishes."),
+    logs: JobLogStore = Depends(get_job_log_store),
+    jobs: JobEngine = Depends(get_job_engine),
+    settings: Settings = Depends(get_settings),
+) -> Any:
+    if jobs.get(job_id) is None and not logs.exists(job_id):
+        raise JobNotFoundException(job_id)
+
+    if follow:
+        def finished() -> bool:
+            job = jobs.get(job_id)
+            return job is None or job.finished
+
+        sse = "text/event-stream" in request.headers.get("accept", "")
+        start = logs.tail_offset(job_id, tail) if since is None else since
+        return StreamingResponse(
+            logs.follow(job_id, start, finished, settings.EVENTS_HEARTBEAT_SEC, sse),
+            media_type="text/event-stream" if sse else "text/plain; charset=utf-8",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if since is None:
+        lines, next_offset = logs.read_tail(job_id, tail)
+    else:
+        lines, next_offset = logs.read_range(job_id, since)
+    return raw_json_response(dumps({"lines": lines, "next_offset": next_offset}))
 
 
 # Voices and Assets minimal support
 @router.get("/voices")
-async def list_voices() -> Any:
-    return []
+async def list_voices(request: Request, cursor: str | None = _CURSOR, limit: int = _LIMIT, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    # The spec types this response as a bare array, so the next cursor travels in a header.
+    return _list_response(request, store, "voices", cursor, limit, envelope=False)
 
 
 @router.post("/voices", status_code=status.HTTP_201_CREATED)
-async def create_voice(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "VoiceCreate.json")
-    data = _response_from_schema("Voice.json", settings)
-    return data
+async def create_voice(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), stubs: StubEngine = Depends(get_stub_engine), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    validate_body(payload, registry.validator("VoiceCreate"))
+    voice_id = _new_id("voice")
+    body = stubs.render(_VOICE, id=voice_id, provider=payload["provider"], name=payload["name"])
+    store.put("voices", voice_id, body)
+    return raw_json_response(body, status.HTTP_201_CREATED)
 
 
 @router.post("/assets", status_code=status.HTTP_201_CREATED)
-async def create_asset(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    validate_body(payload, settings.SLIDESHOW_SCHEMAS_PATH / "AssetCreate.json")
-    return _response_from_schema("Asset.json", settings)
+async def create_asset(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), assets: AssetStore = Depends(get_asset_store)) -> Any:
+    # Both modes upload the content to the returned `url` with PUT; there is no external bucket to presign for.
+    validate_body(payload, registry.validator("AssetCreate"))
+    asset = assets.create(payload["filename"], payload["mime"], payload.get("size_bytes"))
+    return raw_json_response(dumps(asset), status.HTTP_201_CREATED)
 
 
 @router.get("/assets/{asset_id}")
-async def get_asset(asset_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("Asset.json", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", asset_id)
-    return data
+async def get_asset(asset_id: str, stubs: StubEngine = Depends(get_stub_engine), assets: AssetStore = Depends(get_asset_store)) -> Any:
+    asset = assets.get(asset_id)
+    return raw_json_response(dumps(asset) if asset is not None else stubs.render(_ASSET_GET, id=asset_id))
+
+
+@router.put("/assets/{asset_id}/content")
+async def upload_asset_content(asset_id: str, request: Request, assets: AssetStore = Depends(get_asset_store), events: EventLog = Depends(get_event_log)) -> Any:
+    """Streams the request body into the blob store; identical content is stored once."""
+    was_ready = assets.require(asset_id)["status"] == "ready"
+    asset, deduplicated = await assets.ingest(asset_id, request.stream())
+    if not was_ready:
+        events.append("asset.created", {"id": asset_id, "checksum": asset["checksum"], "size_bytes": asset["size_bytes"], "deduplicated": deduplicated})
+    return raw_json_response(dumps(asset))
+
+
+@router.get("/assets/{asset_id}/content")
+async def get_asset_content(asset_id: str, request: Request, assets: AssetStore = Depends(get_asset_store), settings: Settings = Depends(get_settings)) -> Any:
+    asset = assets.require(asset_id)
+    path = assets.content_path(asset_id)
+    header, offload = settings.ASSETS_SENDFILE_HEADER, None
+    if header:  # the proxy in front sends the blob itself
+        if header.lower() == "x-accel-redirect":
+            offload = (header, settings.ASSETS_SENDFILE_PREFIX + path.relative_to(assets.root).as_posix())
+        else:
+            offload = (header, str(path))
+    return file_response(request, path, asset["mime"], f'"{asset["checksum"]}"', asset["filename"], offload)
@@ -1,69 +1,100 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import json
+import re
+import secrets
+from typing import Any, Dict, List
 
-from fastapi import APIRouter, Body, status, Depends
+from fastapi import APIRouter, Body, HTTPException, Query, status, Depends
 
-from ..utils.validation import validate_body, load_schema_from_openapi
-from ..utils.stubgen import generate_stub
-from ..config import Settings, get_settings
-from ..utils.common import _read_json, _maybe_example
+from ..utils.validation import SchemaRegistry, get_schema_registry, validate_body
+from ..utils.common import dumps, raw_json_response
+from ..services.ratelimit import Throttle, get_throttle
+from ..services.jobs import JobEngine, get_job_engine
+from ..services.resources import ResourceStore, get_resource_store
+from ..exceptions import JobNotFoundException
 
 router = APIRouter(prefix="/v1", tags=["Story"])
 
+_WAIT = Query(0, ge=0, description="Long-poll: seconds to wait for the job's status to change.")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
 
-def _response_from_schema(schema_name: str, settings: Settings) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, schema_name)
-    return generate_stub(schema)
+
+def _scenes(script: str, beats: List[str] | None) -> List[str]:
+    """The storyboard's scenes: its beats, or without any, each sentence of the script."""
+    return beats or [s for s in _SENTENCE.split(script.strip()) if s]
+
+
+def _storyboard(store: ResourceStore, storyboard_id: str) -> bytes:
+    body = store.get("storyboards", storyboard_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail={"error": "not_found", "message": f"Storyboard '{storyboard_id}' not found"})
+    return body
 
 
 @router.post("/storyboards", status_code=status.HTTP_201_CREATED)
-async def create_storyboard(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, "StoryboardCreateRequest")
-    validate_body(payload, schema)
-    example = _maybe_example("storyboard.create", settings.STORY_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("Storyboard", settings)
+async def create_storyboard(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    validate_body(payload, registry.validator("StoryboardCreateRequest"))
+    # Storyboards are persisted so renders can read them back.
+    script = payload.get("script") or ""
+    storyboard_id = f"sb_{secrets.token_hex(8)}"
+    body = dumps({"id": storyboard_id, "scenes": _scenes(script, payload.get("beats")), "script": script})
+    store.put("storyboards", storyboard_id, body, "succeeded")
+    return raw_json_response(body, status.HTTP_201_CREATED)
 
 
 @router.get("/storyboards/{storyboard_id}")
-async def get_storyboard(storyboard_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("Storyboard", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", storyboard_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_storyboard(storyboard_id: str, store: ResourceStore = Depends(get_resource_store)) -> Any:
+    return raw_json_response(_storyboard(store, storyboard_id))
+
+
+@router.patch("/storyboards/{storyboard_id}")
+async def update_storyboard(storyboard_id: str, payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), store: ResourceStore = Depends(get_resource_store)) -> Any:
+    """Replaces the script and/or beats; a new script alone re-splits scenes that came from the old one. The next render reruns only what changed."""
+    validate_body(payload, registry.validator("StoryboardUpdateRequest"))
+    storyboard = json.loads(_storyboard(store, storyboard_id))
+    script = payload.get("script", storyboard["script"]) or ""
+    if "beats" in payload:
+        storyboard["scenes"] = _scenes(script, payload["beats"])
+    elif "script" in payload and storyboard["scenes"] == _scenes(storyboard["script"], None):
+        storyboard["scenes"] = _scenes(script, None)
+    storyboard["script"] = script
+    body = dumps(storyboard)
+    store.put("storyboards", storyboard_id, body, "succeeded")
+    return raw_json_response(body)
 
 
 @router.post("/storyboards/{storyboard_id}/render", status_code=status.HTTP_202_ACCEPTED)
-async def render_storyboard(storyboard_id: str, payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, "StoryboardRenderRequest")
-    validate_body(payload, schema)
-    # This endpoint is not fully defined in the OpenAPI spec, so we'll return a generic response
-    return {"message": "Storyboard rendering started", "storyboard_id": storyboard_id}
+async def render_storyboard(storyboard_id: str, payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), store: ResourceStore = Depends(get_resource_store), jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    """Renders the storyboard to a video as a `storyboard-renders` job (see app/services/render.py)."""
+    validate_body(payload, registry.validator("StoryboardRenderRequest"))
+    body = _storyboard(store, storyboard_id)
+    job = jobs.submit("storyboard-renders", {**payload, "storyboard_id": storyboard_id, "storyboard": json.loads(body)})
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
+
+
+@router.get("/storyboards/{storyboard_id}/renders/{render_id}")
+async def get_storyboard_render(storyboard_id: str, render_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    job = jobs.get(render_id, "storyboard-renders")
+    if job is None or job.payload.get("storyboard_id") != storyboard_id:
+        raise JobNotFoundException(render_id)
+    return raw_json_response((await jobs.wait_for_change(render_id, "storyboard-renders", wait)).encode())
 
 
 @router.post("/stories", status_code=status.HTTP_202_ACCEPTED)
-async def create_story(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, "StoryCreateRequest")
-    validate_body(payload, schema)
-    example = _maybe_example("story.create", settings.STORY_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("StoryJob", settings)
+async def create_story(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("StoryCreateRequest"))
+    await throttle("stories", payload)
+    job = jobs.submit("stories", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/stories/{story_id}")
-async def get_story(story_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("StoryJob", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", story_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_story(story_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(story_id, "stories", wait)).encode())
 
 
 @router.get("/stories/{story_id}/videos")
 async def get_story_videos(story_id: str) -> Any:
     # This endpoint is not fully defined in the OpenAPI spec, so we'll return a generic response
-    return {"items": []}
+    return raw_json_response(b'{"items":[]}')
@@ -2,35 +2,26 @@ from __future__ import annotations
 
 from typing import Any, Dict
 
-from fastapi import APIRouter, Body, status, Depends
+from fastapi import APIRouter, Body, Query, status, Depends
 
-from ..utils.validation import validate_body, load_schema_from_openapi
-from ..utils.stubgen import generate_stub
-from ..config import Settings, get_settings
-from ..utils.common import _read_json, _maybe_example
+from ..utils.validation import SchemaRegistry, get_schema_registry, validate_body
+from ..utils.common import raw_json_response
+from ..services.ratelimit import Throttle, get_throttle
+from ..services.jobs import JobEngine, get_job_engine
 
 router = APIRouter(prefix="/v1", tags=["Video"])
 
-
-def _response_from_schema(schema_name: str, settings: Settings) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, schema_name)
-    return generate_stub(schema)
+_WAIT = Query(0, ge=0, description="Long-poll: seconds to wait for the job's status to change.")
 
 
 @router.post("/videos", status_code=status.HTTP_202_ACCEPTED)
-async def create_video(payload: Dict[str, Any] = Body(...), settings: Settings = Depends(get_settings)) -> Any:
-    schema = load_schema_from_openapi(settings.STORY_OPENAPI_FILE, "VideoCreateRequest")
-    validate_body(payload, schema)
-    example = _maybe_example("video.create", settings.STORY_EXAMPLES_PATH)
-    if example is not None:
-        return example
-    return _response_from_schema("VideoJob", settings)
+async def create_video(payload: Dict[str, Any] = Body(...), registry: SchemaRegistry = Depends(get_schema_registry), jobs: JobEngine = Depends(get_job_engine), throttle: Throttle = Depends(get_throttle)) -> Any:
+    validate_body(payload, registry.validator("VideoCreateRequest"))
+    await throttle("videos", payload)
+    job = jobs.submit("videos", payload)
+    return raw_json_response(job.encode(), status.HTTP_202_ACCEPTED)
 
 
 @router.get("/videos/{video_id}")
-async def get_video(video_id: str, settings: Settings = Depends(get_settings)) -> Any:
-    data = _response_from_schema("VideoJob", settings)
-    if isinstance(data, dict):
-        data.setdefault("id", video_id)
-        data.setdefault("status", "succeeded")
-    return data
+async def get_video(video_id: str, wait: float = _WAIT, jobs: JobEngine = Depends(get_job_engine)) -> Any:
+    return raw_json_response((await jobs.wait_for_change(video_id, "videos", wait)).encode())
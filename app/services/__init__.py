@@ -0,0 +1 @@
+"""Long-lived in-process components shared by the routers."""
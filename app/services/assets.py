@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterable, List
+
+from ..config import get_settings
+from ..exceptions import AssetContentConflictException, AssetNotFoundException, AssetTooLargeException, AssetUploadInProgressException
+from ..utils.sqlite import Database
+
+logger = logging.getLogger("potterlabs.assets")
+
+
+class AssetStore:
+    """Content-addressed blobs on local disk, plus a SQLite index of asset metadata.
+
+    Layout under `root`: `blobs/ab/abcdef...` holds each distinct content once,
+    named by its SHA-256; `renditions/` holds derived files (thumbnails,
+    transcodes) cached by `(checksum, name)`; `tmp/` holds uploads in flight.
+
+    Uploads are streamed: chunks are hashed as they arrive and written out in
+    `buffer_bytes` batches on a worker thread, so memory use is bounded by the
+    buffer whatever the asset size. Each pending asset has one upload file,
+    `tmp/<id>.part`, created exclusively, so a second concurrent upload of the
+    same asset is refused; one untouched for `stale_after` seconds is taken to
+    be abandoned. A finished upload whose content is already stored only gains
+    an index row pointing at the existing blob. Renditions are evicted least
+    recently used once they exceed `rendition_cache_bytes`.
+
+    A background sweep (`start`/`stop`, every `sweep_interval` seconds)
+    removes abandoned files under `tmp/` and assets still pending
+    `pending_ttl` seconds after they were created.
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        max_upload_bytes: int = 2 << 30,
+        rendition_cache_bytes: int = 1 << 30,
+        buffer_bytes: int = 1 << 20,
+        pending_ttl: float = 24 * 3600.0,
+        stale_after: float = 600.0,
+        sweep_interval: float = 600.0,
+    ):
+        self.root = Path(root)
+        for sub in ("blobs", "renditions", "tmp"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        self.max_upload_bytes = max_upload_bytes
+        self.rendition_cache_bytes = rendition_cache_bytes
+        self.buffer_bytes = buffer_bytes
+        self.pending_ttl = pending_ttl
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self._sweeper: asyncio.Task | None = None
+        self._lock = threading.Lock()
+        self._conn = Database(
+            self.root / "index.sqlite3",
+            (
+                "CREATE TABLE IF NOT EXISTS assets (id TEXT PRIMARY KEY, filename TEXT NOT NULL, mime TEXT NOT NULL,"
+                " size_bytes INTEGER, checksum TEXT, status TEXT NOT NULL, created_at TEXT NOT NULL) WITHOUT ROWID",
+                "CREATE INDEX IF NOT EXISTS assets_checksum ON assets (checksum)",
+                "CREATE TABLE IF NOT EXISTS renditions (checksum TEXT NOT NULL, name TEXT NOT NULL, size_bytes INTEGER NOT NULL,"
+                " used_at REAL NOT NULL, PRIMARY KEY (checksum, name)) WITHOUT ROWID",
+                "CREATE INDEX IF NOT EXISTS renditions_used ON renditions (used_at)",
+            ),
+        )
+
+    # -- metadata index -------------------------------------------------
+
+    def create(self, filename: str, mime: str, size_bytes: int | None = None) -> Dict[str, Any]:
+        """Registers an asset awaiting its content; returns its view."""
+        if size_bytes is not None and size_bytes > self.max_upload_bytes:
+            raise AssetTooLargeException(self.max_upload_bytes)
+        asset_id = f"ast_{secrets.token_hex(8)}"
+        created_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO assets (id, filename, mime, size_bytes, checksum, status, created_at) VALUES (?, ?, ?, ?, NULL, 'pending', ?)",
+                (asset_id, filename, mime, size_bytes, created_at),
+            )
+        return self._view((asset_id, filename, mime, size_bytes, None, "pending", created_at))
+
+    def get(self, asset_id: str) -> Dict[str, Any] | None:
+        return self.lookup([asset_id]).get(asset_id)
+
+    def require(self, asset_id: str) -> Dict[str, Any]:
+        asset = self.get(asset_id)
+        if asset is None:
+            raise AssetNotFoundException(asset_id)
+        return asset
+
+    def lookup(self, asset_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Views of the given assets that exist, by id, in one index query."""
+        ids = list(dict.fromkeys(asset_ids))
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, filename, mime, size_bytes, checksum, status, created_at FROM assets WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        return {row[0]: self._view(row) for row in rows}
+
+    @staticmethod
+    def _view(row: tuple) -> Dict[str, Any]:
+        asset_id, filename, mime, size_bytes, checksum, status, created_at = row
+        return {
+            "id": asset_id,
+            "url": f"/v1/assets/{asset_id}/content",
+            "filename": filename,
+            "mime": mime,
+            "size_bytes": size_bytes,
+            "checksum": f"sha256:{checksum}" if checksum else None,
+            "status": status,
+            "created_at": created_at,
+        }
+
+    # -- blobs ----------------------------------------------------------
+
+    def blob_path(self, checksum: str) -> Path:
+        return self.root / "blobs" / checksum[:2] / checksum
+
+    def content_path(self, asset_id: str) -> Path:
+        """The blob holding a ready asset's content."""
+        with self._lock:
+            row = self._conn.execute("SELECT checksum FROM assets WHERE id = ? AND status = 'ready'", (asset_id,)).fetchone()
+        if row is None:
+            raise AssetNotFoundException(asset_id)
+        return self.blob_path(row[0])
+
+    async def ingest(self, asset_id: str, chunks: AsyncIterator[bytes]) -> tuple[Dict[str, Any], bool]:
+        """Stores an asset's streamed content; returns its view and whether the content was already stored.
+
+        Content is immutable: uploading to a ready asset again is a no-op when
+        the bytes are the same and raises AssetContentConflictException when not.
+        Raises AssetUploadInProgressException while another upload of the asset runs.
+        """
+        previous = self.require(asset_id)["checksum"]
+        tmp = self.root / "tmp" / f"{asset_id}.part"
+        digest = hashlib.sha256()
+        size = 0
+        pending: List[bytes] = []
+        pending_bytes = 0
+        # A ready asset's content is fixed; a repeat upload is only hashed, to compare.
+        f = await asyncio.to_thread(self._open_upload, asset_id, tmp) if previous is None else None
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if size > self.max_upload_bytes:
+                    raise AssetTooLargeException(self.max_upload_bytes)
+                digest.update(chunk)
+                if f is None:
+                    continue
+                pending.append(chunk)
+                pending_bytes += len(chunk)
+                if pending_bytes >= self.buffer_bytes:
+                    await asyncio.to_thread(f.writelines, pending)
+                    pending, pending_bytes = [], 0
+            if f is not None:
+                await asyncio.to_thread(f.writelines, pending)
+        except BaseException:
+            if f is not None:
+                f.close()
+                tmp.unlink(missing_ok=True)
+            raise
+
+        checksum = digest.hexdigest()
+        if f is None:
+            if previous != f"sha256:{checksum}":
+                raise AssetContentConflictException(asset_id)
+            return self.require(asset_id), True
+        f.close()
+        blob = self.blob_path(checksum)
+        deduplicated = await asyncio.to_thread(self._commit_blob, tmp, blob)
+        with self._lock:
+            # Guarded, so content that became ready meanwhile is never replaced.
+            updated = self._conn.execute(
+                "UPDATE assets SET size_bytes = ?, checksum = ?, status = 'ready' WHERE id = ? AND (checksum IS NULL OR checksum = ?)",
+                (size, checksum, asset_id, checksum),
+            ).rowcount
+        if not updated:
+            self.require(asset_id)
+            raise AssetContentConflictException(asset_id)
+        return self.require(asset_id), deduplicated
+
+    def _open_upload(self, asset_id: str, tmp: Path) -> BinaryIO:
+        try:
+            return tmp.open("xb")
+        except FileExistsError:
+            try:
+                stale = time.time() - tmp.stat().st_mtime > self.stale_after
+            except FileNotFoundError:  # it just finished
+                stale = True
+            if not stale:
+                raise AssetUploadInProgressException(asset_id) from None
+        # Abandoned by an upload that died; take its place, unless another upload just did.
+        tmp.unlink(missing_ok=True)
+        try:
+            return tmp.open("xb")
+        except FileExistsError:
+            raise AssetUploadInProgressException(asset_id) from None
+
+    @staticmethod
+    def _commit_blob(tmp: Path, blob: Path) -> bool:
+        if blob.exists():
+            tmp.unlink()
+            return True
+        blob.parent.mkdir(exist_ok=True)
+        os.replace(tmp, blob)
+        return False
+
+    # -- renditions -----------------------------------------------------
+
+    async def rendition(self, asset_id: str, name: str, build: Callable[[Path, Path], None]) -> Path:
+        """The path of the asset's `name` rendition, running `build(source, target)` on a worker thread on a miss."""
+        source = self.content_path(asset_id)
+        checksum = source.name
+        path = self.root / "renditions" / checksum[:2] / f"{checksum}.{name}"
+        with self._lock:
+            hit = self._conn.execute("UPDATE renditions SET used_at = ? WHERE checksum = ? AND name = ?", (time.time(), checksum, name)).rowcount
+        if hit and path.exists():
+            return path
+        path.parent.mkdir(exist_ok=True)
+        tmp = self.root / "tmp" / f"{checksum}.{name}.{secrets.token_hex(4)}"
+        try:
+            await asyncio.to_thread(build, source, tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO renditions (checksum, name, size_bytes, used_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(checksum, name) DO UPDATE SET size_bytes = excluded.size_bytes, used_at = excluded.used_at",
+                (checksum, name, path.stat().st_size, time.time()),
+            )
+            self._evict_renditions()
+        return path
+
+    def _evict_renditions(self) -> None:
+        """Drops least recently used renditions beyond the cache budget; caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM renditions").fetchone()[0]
+        if total <= self.rendition_cache_bytes:
+            return
+        for checksum, name, size in self._conn.execute("SELECT checksum, name, size_bytes FROM renditions ORDER BY used_at").fetchall():
+            if total <= self.rendition_cache_bytes:
+                break
+            (self.root / "renditions" / checksum[:2] / f"{checksum}.{name}").unlink(missing_ok=True)
+            self._conn.execute("DELETE FROM renditions WHERE checksum = ? AND name = ?", (checksum, name))
+            total -= size
+
+    # -- expiry ---------------------------------------------------------
+
+    def sweep(self) -> int:
+        """Removes abandoned upload and rendition files and expired pending assets; returns how many assets."""
+        now = time.time()
+        for path in (self.root / "tmp").iterdir():
+            try:
+                if now - path.stat().st_mtime > self.stale_after:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+        cutoff = datetime.fromtimestamp(now - self.pending_ttl, timezone.utc).isoformat()
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute("SELECT id FROM assets WHERE status = 'pending' AND created_at < ?", (cutoff,))]
+            # An expired asset still receiving content keeps its row until the upload ends or goes stale.
+            expired = [asset_id for asset_id in expired if not (self.root / "tmp" / f"{asset_id}.part").exists()]
+            self._conn.executemany("DELETE FROM assets WHERE id = ? AND status = 'pending'", [(asset_id,) for asset_id in expired])
+        return len(expired)
+
+    async def start(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_periodically())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            try:
+                expired = await asyncio.to_thread(self.sweep)
+                if expired:
+                    logger.info("Removed %d assets whose content never arrived", expired)
+            except Exception:  # noqa: BLE001 - retried on the next pass
+                logger.exception("Asset sweep failed")
+            await asyncio.sleep(self.sweep_interval)
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+@lru_cache
+def get_asset_store() -> AssetStore:
+    settings = get_settings()
+    return AssetStore(
+        settings.ASSETS_DIR,
+        settings.ASSETS_MAX_UPLOAD_BYTES,
+        settings.ASSETS_RENDITION_CACHE_BYTES,
+        settings.ASSETS_UPLOAD_BUFFER_BYTES,
+        pending_ttl=settings.ASSETS_PENDING_TTL_SEC,
+        stale_after=settings.ASSETS_UPLOAD_STALE_SEC,
+        sweep_interval=settings.ASSETS_SWEEP_INTERVAL_SEC,
+    )
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from pydantic import AnyUrl, BaseModel, Field
+
+from ..config import get_settings
+from ..utils.common import dumps
+from ..utils.snapshot import get_startup_snapshot
+
+
+class Quota(BaseModel):
+    rate_limit_per_min: int | None = None
+    burst: int | None = None
+
+
+class Provider(BaseModel):
+    id: str
+    name: str
+    category: str
+    description: str | None = None
+    url: AnyUrl | None = None
+    status: str = Field("active", pattern=r"^(active|inactive)$")
+    quota: Quota | None = None
+    latency_ms_estimate: int | None = None
+    billing_unit: str | None = None
+    cost_per_unit: float | None = None
+
+
+class Capability(BaseModel):
+    id: str
+    name: str
+    type: str
+    input_schema: str | None = None
+    output_schema: str | None = None
+
+
+# Optional, simple mapping so some providers expose a subset.
+CAPABILITY_MAP: Dict[str, List[str]] = {
+    # OpenRouter focuses on text generation
+    "openrouter": ["text-gen"],
+    "elevenlabs": ["tts", "music-gen"],
+    "runway": ["video-gen", "image-gen"],
+    "pika": ["video-gen"],
+    # providers not listed here fall back to all capabilities
+}
+
+
+class Encoded:
+    """A response body encoded once, with its strong ETag."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, data: Any):
+        self.body = dumps(data)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=12).hexdigest() + '"'
+
+
+def _load_json(path: Path) -> Any:
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CatalogSnapshot:
+    """Immutable, fully indexed view of the provider and capability files.
+
+    Every lookup a route needs is a dict hit, and every body a route sends is
+    pre-encoded, so request cost does not grow with the catalog.
+    """
+
+    def __init__(self, providers: List[Provider], capabilities: List[Capability], capability_map: Dict[str, List[str]]):
+        self.providers: Tuple[Provider, ...] = tuple(providers)
+        self.capabilities: Tuple[Capability, ...] = tuple(capabilities)
+        self.by_id: Dict[str, Provider] = {p.id: p for p in self.providers}
+        # provider id -> (tokens per second, bucket capacity) for providers with a quota.
+        self.rate_limits: Dict[str, Tuple[float, float]] = {}
+        for p in self.providers:
+            if p.quota is not None and p.quota.rate_limit_per_min:
+                per_min = p.quota.rate_limit_per_min
+                self.rate_limits[p.id] = (per_min / 60.0, float(p.quota.burst or per_min))
+
+        caps_by_id = {c.id: c for c in self.capabilities}
+        self.capabilities_by_provider: Dict[str, Tuple[Capability, ...]] = {}
+        for p in self.providers:
+            names = capability_map.get(p.id)
+            if names:
+                self.capabilities_by_provider[p.id] = tuple(caps_by_id[n] for n in names if n in caps_by_id)
+            else:
+                self.capabilities_by_provider[p.id] = self.capabilities
+
+        # capability id -> active providers offering it, in catalog order; what the router ranks.
+        by_capability: Dict[str, List[str]] = {}
+        for p in self.providers:
+            if p.status == "active":
+                for c in self.capabilities_by_provider[p.id]:
+                    by_capability.setdefault(c.id, []).append(p.id)
+        self.providers_by_capability: Dict[str, Tuple[str, ...]] = {c: tuple(ids) for c, ids in by_capability.items()}
+
+        dumped = {p.id: p.model_dump(mode="json") for p in self.providers}
+        self.providers_encoded = Encoded(list(dumped.values()))
+        self.provider_encoded: Dict[str, Encoded] = {pid: Encoded(d) for pid, d in dumped.items()}
+        all_caps = Encoded([c.model_dump(mode="json") for c in self.capabilities])
+        self.capabilities_encoded: Dict[str, Encoded] = {
+            pid: all_caps if caps is self.capabilities else Encoded([c.model_dump(mode="json") for c in caps])
+            for pid, caps in self.capabilities_by_provider.items()
+        }
+
+    @classmethod
+    def from_data(cls, providers: List[Dict[str, Any]], capabilities: List[Dict[str, Any]]) -> "CatalogSnapshot":
+        return cls([Provider(**p) for p in providers], [Capability(**c) for c in capabilities], CAPABILITY_MAP)
+
+    @classmethod
+    def from_files(cls, providers_file: Path, capabilities_file: Path) -> "CatalogSnapshot":
+        return cls.from_data(_load_json(providers_file), _load_json(capabilities_file))
+
+
+class ProviderCatalog:
+    """Holds the current `CatalogSnapshot` and swaps in a new one when the files change.
+
+    Source files are stat'ed at most once per `reload_interval` seconds, on the
+    request path. A rebuild happens off to the side and replaces the snapshot
+    reference in one assignment, so readers always see a complete snapshot. A
+    file that fails to parse keeps the previous snapshot in service.
+    """
+
+    def __init__(self, providers_file: Path, capabilities_file: Path, reload_interval: float = 2.0, snapshot: CatalogSnapshot | None = None):
+        """`snapshot`, when given, must have been built from the files as they are now."""
+        self._files = (providers_file, capabilities_file)
+        self._reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self._snapshot = snapshot if snapshot is not None else CatalogSnapshot.from_files(*self._files)
+        self._next_check = time.monotonic() + reload_interval
+
+    def _stat(self) -> Tuple[Tuple[int, int], ...]:
+        return tuple((s.st_mtime_ns, s.st_size) for s in (f.stat() for f in self._files))
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        if self._reload_interval >= 0 and time.monotonic() >= self._next_check:
+            self.maybe_reload()
+        return self._snapshot
+
+    def maybe_reload(self) -> bool:
+        """Rebuild the snapshot if either file changed; True when a new one was swapped in."""
+        if not self._lock.acquire(blocking=False):
+            return False  # another thread is already checking; serve the current snapshot
+        try:
+            self._next_check = time.monotonic() + self._reload_interval
+            try:
+                signature = self._stat()
+            except OSError:
+                return False
+            if signature == self._signature:
+                return False
+            try:
+                snapshot = CatalogSnapshot.from_files(*self._files)
+            except (OSError, ValueError):
+                return False
+            self._snapshot, self._signature = snapshot, signature
+            return True
+        finally:
+            self._lock.release()
+
+
+@lru_cache
+def get_provider_catalog() -> ProviderCatalog:
+    settings = get_settings()
+    startup = get_startup_snapshot()
+    return ProviderCatalog(
+        settings.PROVIDERS_EXAMPLES_PATH / "providers.json",
+        settings.PROVIDERS_EXAMPLES_PATH / "capabilities.json",
+        reload_interval=settings.PROVIDERS_RELOAD_INTERVAL_SEC,
+        snapshot=CatalogSnapshot.from_data(startup.providers, startup.capabilities),
+    )
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+from ..config import get_settings
+from ..utils.common import dumps
+from ..utils.sqlite import Database
+
+
+# Largest SQLite INTEGER, the open upper bound of a seq range.
+_MAX_SEQ = (1 << 63) - 1
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Event:
+    """One lifecycle event; `encoded` is its JSON form, built once at append time."""
+
+    __slots__ = ("seq", "type", "encoded")
+
+    def __init__(self, seq: int, type: str, encoded: bytes):
+        self.seq = seq
+        self.type = type
+        self.encoded = encoded
+
+    @classmethod
+    def build(cls, seq: int, type: str, data: Dict[str, Any], created_at: str | None = None) -> "Event":
+        body = {"id": str(seq), "type": type, "created_at": created_at or _now(), "data": data}
+        return cls(seq, type, dumps(body))
+
+    def sse(self) -> bytes:
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.seq, self.type.encode("utf-8"), self.encoded)
+
+
+class EventLog:
+    """Append-only log of resource lifecycle events, addressed by a monotonically increasing `seq`.
+
+    Each event is written to SQLite as it is appended, and its `seq` is
+    allocated inside that write transaction, so workers sharing the file
+    share one gap-free sequence and cursors survive restarts. The newest
+    `capacity` events are also kept in an in-memory ring, a contiguous window
+    of that sequence where a cursor is an index computation; older cursors
+    seek the primary-key B-tree, O(log n) however far back they are. Events
+    other workers append are pulled into the ring when this worker next
+    appends or a reader reaches the end of the ring. `wait` is woken by
+    appends in this process; other workers' events surface when it times out.
+    """
+
+    def __init__(self, path: Path | str, capacity: int = 10_000):
+        self._capacity = max(1, capacity)
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY, type TEXT NOT NULL, body BLOB NOT NULL)",
+            ),
+        )
+        (last,) = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()
+        self._ring: List[Event] = []
+        self._ring_first = last + 1  # seq of self._ring[0]
+        self._waiters: Set[asyncio.Future] = set()
+
+    @property
+    def last_seq(self) -> int:
+        return self._ring_first + len(self._ring) - 1
+
+    def append(self, type: str, data: Dict[str, Any]) -> Event:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM events").fetchone()
+                event = Event.build(seq, type, data)
+                self._conn.execute("INSERT INTO events (seq, type, body) VALUES (?, ?, ?)", (seq, type, event.encoded))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._catch_up(through=seq - 1)
+            self._push([event])
+        for waiter in self._waiters:
+            if not waiter.done() and not waiter.get_loop().is_closed():
+                waiter.set_result(None)
+        self._waiters.clear()
+        return event
+
+    def _catch_up(self, through: int | None = None) -> None:
+        """Pull events other workers appended after the ring's end (up to `through`) into the ring. Holds the lock."""
+        if through is not None and through <= self.last_seq:
+            return
+        rows = self._conn.execute(
+            "SELECT seq, type, body FROM events WHERE seq > ? AND seq <= ? ORDER BY seq DESC LIMIT ?",
+            (self.last_seq, _MAX_SEQ if through is None else through, self._capacity),
+        ).fetchall()
+        self._push([Event(seq, type, bytes(body)) for seq, type, body in reversed(rows)])
+
+    def _push(self, events: List[Event]) -> None:
+        if not events:
+            return
+        if events[0].seq != self.last_seq + 1:  # too far behind to bridge: restart the window
+            self._ring = []
+            self._ring_first = events[0].seq
+        self._ring.extend(events)
+        excess = len(self._ring) - self._capacity
+        if excess > 0:
+            del self._ring[:excess]
+            self._ring_first += excess
+
+    def read(self, after: int, limit: int) -> List[Event]:
+        """Up to `limit` events with `seq > after`, oldest first."""
+        with self._lock:
+            if self.last_seq - after < limit:  # the page reaches the ring's end: look for other workers' events
+                self._catch_up()
+            if after + 1 < self._ring_first:  # every event is in the file; the ring only caches the newest
+                rows = self._conn.execute(
+                    "SELECT seq, type, body FROM events WHERE seq > ? ORDER BY seq LIMIT ?", (after, limit)
+                ).fetchall()
+                return [Event(seq, type, bytes(body)) for seq, type, body in rows]
+            start = after + 1 - self._ring_first
+            return self._ring[start:start + limit]
+
+    async def wait(self, after: int, timeout: float) -> bool:
+        """Park until an event newer than `after` exists, or `timeout` elapses. True if one does."""
+        if self.last_seq > after:
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+        if self.last_seq <= after:
+            with self._lock:
+                self._catch_up()
+        return self.last_seq > after
+
+    def record_job(self, job: Any) -> None:
+        """Job engine listener: one `job.<status>` event per state change."""
+        self.append(f"job.{job.status}", {"id": job.id, "kind": job.kind, "status": job.status})
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+@lru_cache
+def get_event_log() -> EventLog:
+    settings = get_settings()
+    return EventLog(settings.EVENTS_SQLITE_PATH, capacity=settings.EVENTS_RING_CAPACITY)
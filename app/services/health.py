@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import httpx
+
+from ..config import get_settings
+from ..exceptions import ProviderNotFoundException, ProviderUnavailableException
+from ..utils.common import dumps
+from .catalog import Provider, ProviderCatalog, get_provider_catalog
+
+logger = logging.getLogger("potterlabs.health")
+
+WINDOW_SEC = 300.0  # `success_rate_5m`
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Weight of the newest outcome in the moving averages `stats` reports.
+EWMA_ALPHA = 0.2
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class RingBuffer:
+    """The last `capacity` call outcomes as flat arrays: timestamp, latency in ms, success flag."""
+
+    __slots__ = ("_ts", "_ms", "_ok", "_next", "_size")
+
+    def __init__(self, capacity: int = 256):
+        self._ts = array("d", bytes(8 * capacity))
+        self._ms = array("f", bytes(4 * capacity))
+        self._ok = bytearray(capacity)
+        self._next = 0
+        self._size = 0
+
+    def append(self, ts: float, latency_ms: float, ok: bool) -> None:
+        i = self._next
+        self._ts[i], self._ms[i], self._ok[i] = ts, latency_ms, ok
+        self._next = (i + 1) % len(self._ok)
+        self._size = min(self._size + 1, len(self._ok))
+
+    def window(self, since: float) -> Tuple[int, List[float]]:
+        """Successes and the latencies of every outcome recorded at or after `since`."""
+        successes = 0
+        latencies: List[float] = []
+        for i in range(self._size):
+            if self._ts[i] >= since:
+                successes += self._ok[i]
+                latencies.append(self._ms[i])
+        return successes, latencies
+
+
+def _quantile(ordered: List[float], q: float) -> int:
+    return round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)])
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and stays open for `cooldown` seconds.
+
+    After the cooldown it is half-open: `admit` lets one trial call through,
+    and that call's outcome either closes the breaker or opens it again. A
+    trial that never reports back frees the slot after another `cooldown`.
+    """
+
+    __slots__ = ("failure_threshold", "cooldown", "failures", "opened_at", "trial_at", "_state")
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_at: float | None = None  # when the half-open trial call was let through
+        self._state = CLOSED
+
+    def state(self, now: float) -> str:
+        if self._state == OPEN and now >= self.opened_at + self.cooldown:
+            self._state = HALF_OPEN
+        return self._state
+
+    def blocked_for(self, now: float) -> float:
+        """Seconds until a call may be let through again; 0 when closed or when the half-open trial is free."""
+        state = self.state(now)
+        if state == OPEN:
+            return self.opened_at + self.cooldown - now
+        if state == HALF_OPEN and self.trial_at is not None:
+            return max(0.0, self.trial_at + self.cooldown - now)
+        return 0.0
+
+    def admit(self, now: float) -> bool:
+        """Whether to make a call now; half-open, this takes the single trial slot."""
+        if self.blocked_for(now) > 0:
+            return False
+        if self._state == HALF_OPEN:
+            self.trial_at = now
+        return True
+
+    def record(self, ok: bool, now: float) -> None:
+        self.trial_at = None
+        if ok:
+            self.failures = 0
+            self._state = CLOSED
+            return
+        self.failures += 1
+        if self.state(now) == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._state = OPEN
+            self.opened_at = now
+
+
+class _ProviderState:
+    __slots__ = ("ring", "breaker", "status", "since", "encoded", "encoded_for", "latency_ewma", "error_ewma")
+
+    def __init__(self, capacity: int, breaker: CircuitBreaker, now: float):
+        self.ring = RingBuffer(capacity)
+        self.breaker = breaker
+        self.status = "available"
+        self.since = now
+        self.encoded: bytes | None = None  # None when an outcome arrived since the last encode
+        self.encoded_for = CLOSED  # breaker state `encoded` was built with; cooldowns end without an outcome
+        self.latency_ewma: float | None = None
+        self.error_ewma = 0.0
+
+
+class HealthMonitor:
+    """Probes every provider in the catalog in the background and keeps its recent health.
+
+    Outcomes, from probes and from anyone calling `record`, land in a
+    per-provider ring buffer and circuit breaker. `health` serves the
+    `ProviderHealth` body from that cached state without touching the
+    provider. Callers about to call a provider ask `admit` first, which
+    turns them away while its breaker is open and lets a single trial
+    through once it is half-open; `check` raises
+    `ProviderUnavailableException` instead, for callers that fail fast.
+    Only providers with a probe URL (a real health endpoint) are probed.
+    """
+
+    def __init__(
+        self,
+        catalog: ProviderCatalog,
+        interval: float = 15.0,
+        timeout: float = 5.0,
+        probe_urls: Dict[str, str] | None = None,
+        capacity: int = 256,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        degraded_success_rate: float = 0.95,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self._catalog = catalog
+        self._interval = interval
+        self._timeout = timeout
+        self._probe_urls = dict(probe_urls or {})
+        self._capacity = capacity
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._degraded_success_rate = degraded_success_rate
+        self._transport = transport
+        self._states: Dict[str, _ProviderState] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._runner: asyncio.Task | None = None
+
+    def _state(self, provider_id: str) -> _ProviderState:
+        state = self._states.get(provider_id)
+        if state is None:
+            breaker = CircuitBreaker(self._failure_threshold, self._cooldown)
+            state = self._states[provider_id] = _ProviderState(self._capacity, breaker, time.time())
+        return state
+
+    def record(self, provider_id: str, ok: bool, latency_ms: float) -> None:
+        now = time.time()
+        state = self._state(provider_id)
+        state.ring.append(now, latency_ms, ok)
+        state.breaker.record(ok, now)
+        state.encoded = None
+        state.latency_ewma = latency_ms if state.latency_ewma is None else state.latency_ewma + EWMA_ALPHA * (latency_ms - state.latency_ewma)
+        state.error_ewma += EWMA_ALPHA * ((not ok) - state.error_ewma)
+
+    def admit(self, provider_id: str) -> bool:
+        """Whether to call `provider_id` now; see `CircuitBreaker.admit`."""
+        state = self._states.get(provider_id)
+        return state is None or state.breaker.admit(time.time())
+
+    def check(self, provider_id: str | None) -> None:
+        state = self._states.get(provider_id) if provider_id else None
+        if state is None:
+            return
+        blocked = state.breaker.blocked_for(time.time())
+        if blocked > 0:
+            raise ProviderUnavailableException(provider_id, max(1, math.ceil(blocked)))
+
+    def stats(self, provider_id: str) -> Tuple[float | None, float]:
+        """`(latency ms, error rate)` as moving averages over recent outcomes; `(None, 0.0)` before any."""
+        state = self._states.get(provider_id)
+        if state is None:
+            return None, 0.0
+        return state.latency_ewma, state.error_ewma
+
+    def is_open(self, provider_id: str) -> bool:
+        state = self._states.get(provider_id)
+        return state is not None and state.breaker.blocked_for(time.time()) > 0
+
+    def health(self, provider_id: str) -> bytes:
+        if provider_id not in self._catalog.snapshot.by_id:
+            raise ProviderNotFoundException(provider_id)
+        state = self._state(provider_id)
+        now = time.time()
+        breaker_state = state.breaker.state(now)
+        if state.encoded is None or breaker_state != state.encoded_for:
+            state.encoded, state.encoded_for = self._encode(provider_id, state, breaker_state, now), breaker_state
+        return state.encoded
+
+    def _encode(self, provider_id: str, state: _ProviderState, breaker_state: str, now: float) -> bytes:
+        successes, latencies = state.ring.window(now - WINDOW_SEC)
+        metrics: Dict[str, float] = {}
+        if latencies:
+            ordered = sorted(latencies)
+            metrics = {"success_rate_5m": round(successes / len(latencies), 4), "p50_ms": _quantile(ordered, 0.5), "p95_ms": _quantile(ordered, 0.95)}
+
+        notes = None
+        if breaker_state == OPEN:
+            status, notes = "unavailable", f"circuit open after {state.breaker.failures} consecutive failures"
+        elif breaker_state == HALF_OPEN:
+            status, notes = "degraded", "circuit half-open; waiting for a successful call"
+        elif latencies and metrics["success_rate_5m"] < self._degraded_success_rate:
+            status = "degraded"
+        else:
+            status = "available"
+            if not latencies:
+                notes = "no calls observed in the last 5 minutes"
+        if status != state.status:
+            state.status, state.since = status, now
+        return dumps({"id": provider_id, "status": status, "since": _iso(state.since), "metrics": metrics, "notes": notes})
+
+    async def probe(self, provider: Provider) -> None:
+        url = self._probe_urls.get(provider.id)
+        if url is None:  # the catalog `url` is the provider's homepage, which says nothing about its API
+            return
+        assert self._client is not None
+        started = time.perf_counter()
+        try:
+            # Transports that never time out (in-process ASGI, as the simulator's) are bounded here.
+            response = await asyncio.wait_for(self._client.get(url), self._timeout)
+            ok = response.is_success
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            ok = False
+        self.record(provider.id, ok, (time.perf_counter() - started) * 1000)
+
+    async def probe_all(self) -> None:
+        """Probe every active provider with a probe URL concurrently; returns once all probes have finished."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self._timeout, transport=self._transport, follow_redirects=True)
+        providers = [p for p in self._catalog.snapshot.providers if p.status == "active" and p.id in self._probe_urls]
+        await asyncio.gather(*(self.probe(p) for p in providers))
+
+    async def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+        self._runner = self._client = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:  # noqa: BLE001 - keep probing; one bad pass must not stop the monitor
+                logger.exception("Provider health probe pass failed")
+            await asyncio.sleep(self._interval)
+
+
+@lru_cache
+def get_health_monitor() -> HealthMonitor:
+    from .simulator import get_simulator
+
+    settings = get_settings()
+    catalog = get_provider_catalog()
+    simulator = get_simulator()
+    probe_urls = dict(settings.HEALTH_PROBE_URLS)
+    if simulator is not None:
+        probe_urls = {p.id: f"http://simulator/{p.id}/health" for p in catalog.snapshot.providers}
+    return HealthMonitor(
+        catalog,
+        interval=settings.HEALTH_PROBE_INTERVAL_SEC,
+        timeout=settings.HEALTH_PROBE_TIMEOUT_SEC,
+        probe_urls=probe_urls,
+        capacity=settings.HEALTH_RING_CAPACITY,
+        failure_threshold=settings.HEALTH_FAILURE_THRESHOLD,
+        cooldown=settings.HEALTH_BREAKER_COOLDOWN_SEC,
+        degraded_success_rate=settings.HEALTH_DEGRADED_SUCCESS_RATE,
+        transport=simulator.transport() if simulator is not None else None,
+    )
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import mmap
+import os
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Set, Tuple
+
+from ..config import get_settings
+
+# Set by the job engine while an executor runs, so plain `logging` calls land in that job's log.
+current_job_id: ContextVar[str | None] = ContextVar("current_job_id", default=None)
+
+_JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+_READ_CHUNK = 64 << 10  # bytes a follower reads per step
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobLogStore:
+    """Append-only `<job_id>.log` files, one line per record.
+
+    Readers never load a whole file: range and tail reads go through `mmap`,
+    and followers `pread` the bytes past their own offset, a bounded chunk at
+    a time. Followers are woken by a write to that job in this process and
+    check the file size every `poll_interval` seconds otherwise, so writes
+    from other workers reach them too.
+    """
+
+    def __init__(self, directory: Path, max_open_files: int = 256, poll_interval: float = 0.25):
+        self._dir = directory
+        self._poll_interval = poll_interval
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._max_open = max_open_files
+        self._handles: "OrderedDict[str, BinaryIO]" = OrderedDict()
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    def path(self, job_id: str) -> Path | None:
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        return self._dir / f"{job_id}.log"
+
+    def exists(self, job_id: str) -> bool:
+        path = self.path(job_id)
+        return path is not None and path.exists()
+
+    def write(self, job_id: str, message: str, level: str = "INFO") -> None:
+        path = self.path(job_id)
+        if path is None:
+            return
+        handle = self._handles.get(job_id)
+        if handle is None:
+            handle = self._handles[job_id] = path.open("ab", buffering=0)
+            while len(self._handles) > self._max_open:
+                _, oldest = self._handles.popitem(last=False)
+                oldest.close()
+        else:
+            self._handles.move_to_end(job_id)
+        text = " ".join(message.splitlines()) if "\n" in message else message
+        handle.write(f"{_now()} {level} {text}\n".encode("utf-8"))
+        self._wake(job_id)
+
+    def close_job(self, job_id: str) -> None:
+        handle = self._handles.pop(job_id, None)
+        if handle is not None:
+            handle.close()
+        self._wake(job_id)
+
+    def _wake(self, job_id: str) -> None:
+        waiters = self._waiters.pop(job_id, None)
+        if not waiters:
+            return
+        for waiter in waiters:
+            if not waiter.done() and not waiter.get_loop().is_closed():
+                waiter.set_result(None)
+
+    def size(self, job_id: str) -> int:
+        path = self.path(job_id)
+        try:
+            return os.stat(path).st_size if path is not None else 0
+        except FileNotFoundError:
+            return 0
+
+    def read_range(self, job_id: str, since: int, limit_bytes: int = 1 << 20) -> Tuple[List[str], int]:
+        """Complete lines starting at byte `since`, and the offset to resume from."""
+        with self._map(job_id) as view:
+            if view is None:
+                return [], 0
+            if since >= len(view):
+                return [], len(view)
+            end = min(len(view), since + limit_bytes)
+            cut = view.rfind(b"\n", since, end)
+            if cut < 0:
+                return [], since
+            return view[since:cut].decode("utf-8", "replace").split("\n"), cut + 1
+
+    def tail_offset(self, job_id: str, lines: int) -> int:
+        """Byte offset where the last `lines` complete lines start, scanning back from the end of the map."""
+        with self._map(job_id) as view:
+            if view is None:
+                return 0
+            start = view.rfind(b"\n")
+            if start < 0:
+                return 0
+            for _ in range(lines):
+                start = view.rfind(b"\n", 0, start)
+                if start < 0:
+                    break
+            return start + 1
+
+    def read_tail(self, job_id: str, lines: int) -> Tuple[List[str], int]:
+        """The last `lines` complete lines, and the offset to resume from."""
+        return self.read_range(job_id, self.tail_offset(job_id, lines))
+
+    def _map(self, job_id: str) -> "_Mapped":
+        return _Mapped(self.path(job_id))
+
+    async def wait(self, job_id: str, offset: int, timeout: float) -> bool:
+        """Park until the log grows past `offset` (or the job's log is closed); False on timeout."""
+        if self.size(job_id) > offset:
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    async def follow(self, job_id: str, offset: int, finished: Callable[[], bool], heartbeat: float, sse: bool) -> AsyncIterator[bytes]:
+        """Yield new complete lines as they are written, until the job finishes."""
+        path = self.path(job_id)
+        want = _READ_CHUNK
+        quiet_since = time.monotonic()
+        while True:
+            size = self.size(job_id)
+            if size > offset and path is not None:
+                with path.open("rb") as f:
+                    chunk = os.pread(f.fileno(), min(size - offset, want), offset)
+                cut = chunk.rfind(b"\n")
+                if cut >= 0:
+                    lines = chunk[:cut + 1]
+                    offset += cut + 1
+                    want = _READ_CHUNK
+                    quiet_since = time.monotonic()
+                    if sse:
+                        yield b"".join(b"id: %d\ndata: %s\n\n" % (offset, line) for line in lines.splitlines())
+                    else:
+                        yield lines
+                    continue
+                if len(chunk) == want:
+                    want *= 2  # one line longer than a chunk; read further to reach its end
+                    continue
+                # Only a partial line so far; its writer is mid-syscall, so check back shortly.
+                await asyncio.sleep(0.01)
+                continue
+            if finished() and self.size(job_id) <= offset:
+                return
+            if await self.wait(job_id, offset, min(self._poll_interval, heartbeat)):
+                continue
+            if sse and time.monotonic() - quiet_since >= heartbeat:
+                quiet_since = time.monotonic()
+                yield b": keep-alive\n\n"
+
+    def record_job(self, job: Any) -> None:
+        """Job engine listener: lifecycle lines, and the file is closed once the job finishes."""
+        if job.status == "failed":
+            self.write(job.id, f"job {job.status}: {job.error}", "ERROR")
+        else:
+            self.write(job.id, f"job {job.status}")
+        if job.finished:
+            self.close_job(job.id)
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+
+class _Mapped:
+    """Context manager yielding a read-only mmap of a log file, or None if it is missing/empty."""
+
+    def __init__(self, path: Path | None):
+        self._path = path
+        self._fd = -1
+        self._map: mmap.mmap | None = None
+
+    def __enter__(self) -> mmap.mmap | None:
+        if self._path is None:
+            return None
+        try:
+            self._fd = os.open(self._path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        if os.fstat(self._fd).st_size == 0:
+            return None
+        self._map = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._map is not None:
+            self._map.close()
+        if self._fd >= 0:
+            os.close(self._fd)
+
+
+class JobLogHandler(logging.Handler):
+    """Copies log records emitted while a job runs into that job's log."""
+
+    def __init__(self, store: JobLogStore):
+        super().__init__()
+        self._store = store
+
+    def emit(self, record: logging.LogRecord) -> None:
+        job_id = current_job_id.get()
+        if job_id is None:
+            return
+        try:
+            self._store.write(job_id, record.getMessage(), record.levelname)
+        except Exception:  # noqa: BLE001 - logging must never raise
+            self.handleError(record)
+
+
+@lru_cache
+def get_job_log_store() -> JobLogStore:
+    settings = get_settings()
+    return JobLogStore(settings.JOB_LOGS_DIR, poll_interval=settings.JOB_LOGS_POLL_SEC)
@@ -0,0 +1,468 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Mapping
+
+from ..config import get_settings
+from ..exceptions import JobNotFoundException, JobQueueFullException
+from .joblogs import current_job_id
+from ..utils.common import dumps, process_alive
+from ..utils.sqlite import Database
+from ..utils.stubgen import generate_stub
+from ..utils.validation import get_schema_registry
+
+logger = logging.getLogger("potterlabs.jobs")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+FINISHED_STATUSES = frozenset({"succeeded", "failed"})
+
+# kind -> (id prefix, response schema)
+JOB_KINDS: Dict[str, tuple[str, str]] = {
+    "images": ("img", "ImageJob"),
+    "voiceovers": ("vo", "VoiceoverJob"),
+    "background-music": ("bgm", "BackgroundMusicJob"),
+    "slideshow-videos": ("ssv", "SlideshowVideoJob"),
+    "videos": ("vid", "VideoJob"),
+    "stories": ("sty", "StoryJob"),
+    "storyboard-renders": ("sbr", "StoryboardRenderJob"),
+}
+# Kinds whose jobs are generated by the provider named in their payload; the others are planned or rendered here.
+PROVIDER_KINDS = frozenset({"images", "voiceovers", "background-music", "stories"})
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    __slots__ = ("id", "kind", "status", "payload", "result", "error", "created_at", "updated_at")
+
+    def __init__(
+        self,
+        id: str,
+        kind: str,
+        payload: Dict[str, Any],
+        status: str = "queued",
+        result: Dict[str, Any] | None = None,
+        error: str | None = None,
+        created_at: str | None = None,
+        updated_at: str | None = None,
+    ):
+        self.id = id
+        self.kind = kind
+        self.status = status
+        self.payload = payload
+        self.result = result or {}
+        self.error = error
+        self.created_at = created_at or _now()
+        self.updated_at = updated_at or self.created_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def view(self) -> Dict[str, Any]:
+        """The resource body clients see: the executor's result plus id and status."""
+        data: Dict[str, Any] = {"id": self.id, "status": self.status}
+        for key, value in self.result.items():
+            data.setdefault(key, value)
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+    def encode(self) -> bytes:
+        return dumps(self.view())
+
+
+class JobStore:
+    """The job table. One SQLite file is shared by every worker on the host.
+
+    Each row records the pid of the worker that owns it (accepted it, or
+    recovered it), so a worker starting up can take over the unfinished
+    jobs of workers that died without touching those of live ones.
+    """
+
+    def __init__(self, path: Path | str):
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL,"
+                " result TEXT, error TEXT, created_at TEXT NOT NULL, updated_at TEXT NOT NULL, owner INTEGER)",
+                "CREATE INDEX IF NOT EXISTS jobs_kind_status ON jobs (kind, status)",
+            ),
+        )
+        if "owner" not in {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}:  # tables from before owners
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+
+    def insert(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, result, error, created_at, updated_at, owner)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.status, json.dumps(job.payload), json.dumps(job.result), job.error, job.created_at, job.updated_at, os.getpid()),
+            )
+
+    def update(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (job.status, json.dumps(job.result), job.error, job.updated_at, job.id),
+            )
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else _job(row)
+
+    def recover(self, kinds: Collection[str]) -> List[Job]:
+        """Takes over unfinished jobs of `kinds` whose owner process is gone; returns them, requeued, oldest first.
+
+        Each row is claimed with a compare-and-set on its owner, so when
+        several workers start at once every orphan goes to exactly one.
+        """
+        kinds = list(kinds)
+        if not kinds:
+            return []
+        me = os.getpid()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_JOB_COLUMNS}, owner FROM jobs WHERE status IN ('queued', 'running')"
+                f" AND kind IN ({','.join('?' * len(kinds))}) ORDER BY created_at",
+                kinds,
+            ).fetchall()
+            jobs: List[Job] = []
+            for row in rows:
+                owner = row[-1]
+                if owner is not None and (owner == me or process_alive(owner)):
+                    continue
+                job = _job(row[:-1])
+                job.status, job.updated_at = "queued", _now()
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET owner = ?, status = ?, updated_at = ? WHERE id = ? AND owner IS ? AND status IN ('queued', 'running')",
+                    (me, job.status, job.updated_at, job.id, owner),
+                ).rowcount
+                if claimed:
+                    jobs.append(job)
+        return jobs
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_JOB_COLUMNS = "id, kind, status, payload, result, error, created_at, updated_at"
+
+
+def _job(row: tuple) -> Job:
+    id, kind, status, payload, result, error, created_at, updated_at = row
+    return Job(id, kind, json.loads(payload), status, json.loads(result or "{}"), error, created_at, updated_at)
+
+
+class JobExecutor(ABC):
+    """Does the work for one kind of job and returns the result fields for its resource."""
+
+    # Whether `run` calls the provider named in the job's payload; only then does an open circuit turn new jobs away.
+    calls_provider = False
+
+    @abstractmethod
+    async def run(self, job: Job) -> Dict[str, Any]: ...
+
+    def close(self) -> None:
+        pass
+
+
+class CallableJobExecutor(JobExecutor):
+    """Runs an async function on the event loop; for I/O-bound stages."""
+
+    def __init__(self, fn: Callable[[Job], Awaitable[Dict[str, Any]]], calls_provider: bool = False):
+        self._fn = fn
+        self.calls_provider = calls_provider
+
+    async def run(self, job: Job) -> Dict[str, Any]:
+        return await self._fn(job)
+
+
+class ProcessPoolJobExecutor(JobExecutor):
+    """Runs a picklable `fn(kind, payload) -> dict` in a process pool; for CPU-bound stages."""
+
+    def __init__(self, fn: Callable[[str, Dict[str, Any]], Dict[str, Any]], max_workers: int | None = None):
+        self._fn = fn
+        self._max_workers = max_workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def run(self, job: Job) -> Dict[str, Any]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._max_workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self._fn, job.kind, job.payload)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class StubJobExecutor(JobExecutor):
+    """Completes immediately with the schema stub for the job's resource (until real providers exist)."""
+
+    def __init__(self, schema: Dict[str, Any], calls_provider: bool = False):
+        self.calls_provider = calls_provider
+        result = generate_stub(schema)
+        self._result = {k: v for k, v in result.items() if k not in ("id", "status")} if isinstance(result, dict) else {}
+
+    async def run(self, job: Job) -> Dict[str, Any]:
+        return dict(self._result)
+
+
+class _KindState:
+    __slots__ = ("queue", "concurrency", "workers", "avg_duration")
+
+    def __init__(self, concurrency: int):
+        self.queue: asyncio.Queue[Job] = asyncio.Queue()
+        self.concurrency = concurrency
+        self.workers: List[asyncio.Task] = []
+        self.avg_duration = 1.0
+
+
+class JobEngine:
+    """In-process asyncio scheduler over a persistent job table.
+
+    Each job kind has its own queue, bounded at `queue_size` waiting jobs, and
+    `concurrency` worker tasks. A full queue rejects new work with
+    `JobQueueFullException` (429 + Retry-After) instead of growing latency.
+    Workers start with the app lifespan, or on the first submit if the app
+    runs without one. On start, unfinished jobs of this engine are re-queued
+    (the event loop may have changed), and so are unfinished jobs in the
+    store whose worker process died.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        concurrency: Mapping[str, int] | None = None,
+        default_concurrency: int = 4,
+        queue_size: int = 1000,
+        executors: Mapping[str, JobExecutor] | None = None,
+        cache_size: int = 10_000,
+        max_wait: float = 30.0,
+        wait_poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self._concurrency = dict(concurrency or {})
+        self._default_concurrency = default_concurrency
+        self._queue_size = queue_size
+        self._executors: Dict[str, JobExecutor] = dict(executors or {})
+        self._kinds: Dict[str, _KindState] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # Jobs accepted or recovered by this process, newest last; unfinished ones are never evicted.
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._cache_size = cache_size
+        self._listeners: List[Callable[[Job], None]] = []
+        # job id -> futures of parked `wait_for_change` calls; a bare future per waiter keeps each one small.
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._max_wait = max_wait
+        self._wait_poll_interval = wait_poll_interval
+
+    def register(self, kind: str, executor: JobExecutor) -> None:
+        old = self._executors.get(kind)
+        self._executors[kind] = executor
+        if old is not None and old is not executor:
+            old.close()
+
+    def add_listener(self, listener: Callable[[Job], None]) -> None:
+        """Call `listener(job)` after a job is created and after every state change."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, job: Job) -> None:
+        for waiter in self._waiters.pop(job.id, ()):
+            if not waiter.done() and not waiter.get_loop().is_closed():
+                waiter.set_result(None)
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception:  # noqa: BLE001 - a broken listener must not fail the job
+                logger.exception("Job listener %r failed for %s", listener, job.id)
+
+    def executor(self, kind: str) -> JobExecutor:
+        return self._executors[kind]
+
+    def calls_provider(self, kind: str) -> bool:
+        executor = self._executors.get(kind)
+        return executor is not None and executor.calls_provider
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        tasks = [t for state in self._kinds.values() for t in state.workers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._kinds.clear()
+        self._loop = None
+        for executor in self._executors.values():
+            executor.close()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._kinds = {}
+        for kind in self._executors:
+            self._state(kind)
+        for job in self._jobs.values():
+            if not job.finished and job.kind in self._kinds:
+                job.status = "queued"
+                self._kinds[job.kind].queue.put_nowait(job)
+        for job in self.store.recover(self._kinds):
+            logger.info("Recovered job %s (%s) from a worker that exited", job.id, job.kind)
+            self._remember(job)
+            self._kinds[job.kind].queue.put_nowait(job)
+            self._notify(job)
+
+    def _state(self, kind: str) -> _KindState:
+        state = self._kinds.get(kind)
+        if state is None:
+            assert self._loop is not None
+            state = self._kinds[kind] = _KindState(self._concurrency.get(kind, self._default_concurrency))
+            state.workers = [self._loop.create_task(self._worker(kind, state)) for _ in range(state.concurrency)]
+        return state
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Job:
+        if kind not in self._executors:
+            raise KeyError(f"No executor registered for job kind '{kind}'")
+        self._ensure_started()
+        state = self._state(kind)
+        depth = state.queue.qsize()
+        if depth >= self._queue_size:
+            retry_after = max(1, math.ceil(state.avg_duration * (depth + 1) / state.concurrency))
+            raise JobQueueFullException(kind, retry_after)
+
+        prefix = JOB_KINDS.get(kind, (kind, ""))[0]
+        job = Job(f"{prefix}_{secrets.token_hex(8)}", kind, payload)
+        self.store.insert(job)
+        self._remember(job)
+        state.queue.put_nowait(job)
+        self._notify(job)
+        return job
+
+    def get(self, job_id: str, kind: str | None = None) -> Job | None:
+        job = self._jobs.get(job_id) or self.store.get(job_id)
+        if job is None or (kind is not None and job.kind != kind):
+            return None
+        return job
+
+    def require(self, job_id: str, kind: str) -> Job:
+        job = self.get(job_id, kind)
+        if job is None:
+            raise JobNotFoundException(job_id)
+        return job
+
+    async def wait_for_change(self, job_id: str, kind: str, timeout: float) -> Job:
+        """The job once its status differs from what it is now, or as it is after `timeout` seconds (capped at `max_wait`).
+
+        Finished jobs return at once. Jobs of this process wake their waiters on
+        every transition; jobs accepted by another worker process are re-read from
+        the store every `wait_poll_interval` seconds instead.
+        """
+        job = self.require(job_id, kind)
+        if job.finished or timeout <= 0:
+            return job
+        status = job.status
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, self._max_wait)
+        local = job_id in self._jobs
+        while (remaining := deadline - loop.time()) > 0:
+            waiter = loop.create_future()
+            waiters = self._waiters.setdefault(job_id, [])
+            waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining if local else min(remaining, self._wait_poll_interval))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in waiters:  # timed out or cancelled rather than woken
+                    waiters.remove(waiter)
+                    if not waiters and self._waiters.get(job_id) is waiters:
+                        del self._waiters[job_id]
+            job = self.require(job_id, kind)
+            if job.status != status:
+                break
+        return job
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Waiting jobs per registered kind; 0 for kinds whose workers have not started yet."""
+        return {kind: (self._kinds[kind].queue.qsize() if kind in self._kinds else 0) for kind in self._executors}
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        for _ in range(len(self._jobs) - self._cache_size):
+            job_id, oldest = self._jobs.popitem(last=False)
+            if not oldest.finished:  # still in flight: keep it, now as the newest
+                self._jobs[job_id] = oldest
+
+    def _transition(self, job: Job, status: str) -> None:
+        job.status = status
+        job.updated_at = _now()
+        self.store.update(job)
+        self._notify(job)
+
+    async def _worker(self, kind: str, state: _KindState) -> None:
+        while True:
+            job = await state.queue.get()
+            try:
+                if job.finished:
+                    continue
+                self._transition(job, "running")
+                started = time.monotonic()
+                token = current_job_id.set(job.id)
+                try:
+                    job.result = await self._executors[kind].run(job) or {}
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:  # noqa: BLE001 - any executor failure fails the job
+                    logger.exception("Job %s (%s) failed", job.id, kind)
+                    job.error = str(exc) or exc.__class__.__name__
+                    self._transition(job, "failed")
+                else:
+                    self._transition(job, "succeeded")
+                finally:
+                    current_job_id.reset(token)
+                state.avg_duration = 0.8 * state.avg_duration + 0.2 * (time.monotonic() - started)
+            finally:
+                state.queue.task_done()
+
+
+def default_executors() -> Dict[str, JobExecutor]:
+    registry = get_schema_registry()
+    return {kind: StubJobExecutor(registry.schema(schema), kind in PROVIDER_KINDS) for kind, (_, schema) in JOB_KINDS.items()}
+
+
+@lru_cache
+def get_job_engine() -> JobEngine:
+    settings = get_settings()
+    return JobEngine(
+        JobStore(settings.JOBS_SQLITE_PATH),
+        concurrency=settings.JOB_CONCURRENCY,
+        default_concurrency=settings.JOB_DEFAULT_CONCURRENCY,
+        queue_size=settings.JOB_QUEUE_SIZE,
+        executors=default_executors(),
+        max_wait=settings.JOB_MAX_WAIT_SEC,
+        wait_poll_interval=settings.JOB_WAIT_POLL_SEC,
+    )
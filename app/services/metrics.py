@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from ..config import get_settings
+from ..utils import stages
+from ..utils.common import process_alive
+from ..utils.sqlite import Database
+
+logger = logging.getLogger("potterlabs.metrics")
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, str, str, Labels, float]  # family, type, sample name, labels, value
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = "potterlabs_http_requests_total"
+HTTP_DURATION = "potterlabs_http_request_duration_seconds"
+HTTP_IN_FLIGHT = "potterlabs_http_requests_in_flight"
+STAGE_DURATION = "potterlabs_stage_duration_seconds"
+JOB_QUEUE_DEPTH = "potterlabs_job_queue_depth"
+
+_HELP: Dict[str, str] = {
+    HTTP_REQUESTS: "HTTP requests by method, route template and status code.",
+    HTTP_DURATION: "HTTP request latency by method and route template, until the response body is sent.",
+    HTTP_IN_FLIGHT: "HTTP requests currently being served.",
+    STAGE_DURATION: "Time spent in internal stages: schema_load, validate_body, generate_stub, example_io.",
+    JOB_QUEUE_DEPTH: "Jobs waiting for a worker, by kind.",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, family: str, labels: Labels) -> Iterator[Sample]:
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield family, "histogram", family + "_bucket", labels + (("le", le),), float(cumulative)
+        yield family, "histogram", family + "_sum", labels, self.sum
+        yield family, "histogram", family + "_count", labels, float(cumulative)
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for this process, keyed by `(family, labels)`.
+
+    Updates are plain dict operations on the event loop thread. With a
+    `store`, each worker publishes its samples every `flush_interval` seconds
+    and `render` sums them across workers, so any worker can answer a scrape.
+    Publishing runs in a background task (`start`/`stop`, with the app
+    lifespan) that takes the samples on the loop and writes them from a
+    thread, so no request waits on SQLite.
+    """
+
+    def __init__(self, store: "SQLiteMetricsStore | None" = None, flush_interval: float = 1.0):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Labels, float]]]] = []
+        self._store = store
+        self._flush_interval = flush_interval
+        self._flusher: asyncio.Task | None = None
+
+    def inc(self, family: str, labels: Labels = (), value: float = 1.0) -> None:
+        key = (family, labels)
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def add(self, family: str, labels: Labels = (), value: float = 1.0) -> None:
+        key = (family, labels)
+        self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, family: str, labels: Labels, value: float) -> None:
+        key = (family, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def observe_stage(self, name: str, seconds: float) -> None:
+        self.observe(STAGE_DURATION, (("stage", name),), seconds)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Labels, float]]]) -> None:
+        """`collector()` yields `(family, labels, value)` gauge readings, taken at flush/scrape time."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def samples(self) -> Iterator[Sample]:
+        for (family, labels), value in list(self._counters.items()):
+            yield family, "counter", family, labels, value
+        for (family, labels), value in list(self._gauges.items()):
+            yield family, "gauge", family, labels, value
+        for collector in self._collectors:
+            for family, labels, value in collector():
+                yield family, "gauge", family, labels, float(value)
+        for (family, labels), histogram in list(self._histograms.items()):
+            yield from histogram.samples(family, labels)
+
+    async def start(self) -> None:
+        if self._store is not None and self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            await self.flush_async()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush_async()
+            except Exception:  # noqa: BLE001 - a failed publish is retried on the next tick
+                logger.exception("Publishing metrics failed")
+
+    async def flush_async(self) -> None:
+        if self._store is not None:
+            samples = list(self.samples())  # taken on the loop, where the metrics are updated
+            await asyncio.to_thread(self._store.publish, os.getpid(), samples)
+
+    def flush(self) -> None:
+        if self._store is not None:
+            self._store.publish(os.getpid(), list(self.samples()))
+
+    def render(self) -> bytes:
+        """Prometheus text exposition (format 0.0.4) of every worker's samples, summed."""
+        return self._merge_and_render(list(self.samples()))
+
+    async def render_async(self) -> bytes:
+        """`render` for the loop: samples are taken here, where they are updated; the merge and encoding run in a thread."""
+        return await asyncio.to_thread(self._merge_and_render, list(self.samples()))
+
+    def _merge_and_render(self, samples: List[Sample]) -> bytes:
+        if self._store is None:
+            return _render(samples)
+        self._store.publish(os.getpid(), samples)
+        return _render(self._store.aggregate())
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _sort_key(sample: Sample) -> tuple:
+    family, _, name, labels, _ = sample
+    plain = tuple(kv for kv in labels if kv[0] != "le")
+    le = next((float(v) for k, v in labels if k == "le"), 0.0)
+    return family, plain, name, le
+
+
+def _render(samples: Iterable[Sample]) -> bytes:
+    lines: List[str] = []
+    current = None
+    for family, type, name, labels, value in sorted(samples, key=_sort_key):
+        if family != current:
+            current = family
+            lines.append(f"# HELP {family} {_HELP.get(family, family)}")
+            lines.append(f"# TYPE {family} {type}")
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class SQLiteMetricsStore:
+    """Per-worker samples in one SQLite file, summed at scrape time.
+
+    Counters and histograms of exited workers stay in the totals; their
+    gauges are dropped, since nothing they were tracking is in flight anymore.
+    When a worker first publishes, rows of exited workers, and rows left
+    under its own pid by an earlier process, are folded into one retained
+    row per series (pid 0) and deleted. The table stays bounded as workers
+    come and go, and a recycled pid never reads as a counter reset.
+    """
+
+    _RETAINED = 0
+
+    def __init__(self, path: Path | str):
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS metrics ("
+                " pid INTEGER NOT NULL, family TEXT NOT NULL, type TEXT NOT NULL, name TEXT NOT NULL,"
+                " labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (pid, name, labels))",
+            ),
+        )
+        self._published: set[int] = set()
+
+    def publish(self, pid: int, samples: Iterable[Sample]) -> None:
+        rows = [(pid, family, type, name, json.dumps(labels), value) for family, type, name, labels, value in samples]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if pid not in self._published:
+                    self._retire(pid)
+                self._conn.execute("DELETE FROM metrics WHERE pid = ?", (pid,))
+                self._conn.executemany("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._published.add(pid)
+
+    def _retire(self, starting: int) -> None:
+        """Folds the counters and histograms of exited workers, and `starting`'s stale rows, into the retained rows."""
+        pids = [pid for (pid,) in self._conn.execute("SELECT DISTINCT pid FROM metrics WHERE pid != ?", (self._RETAINED,))]
+        gone = [pid for pid in pids if pid == starting or not process_alive(pid)]
+        if not gone:
+            return
+        marks = ",".join("?" * len(gone))
+        self._conn.execute(
+            "INSERT INTO metrics SELECT ?, family, type, name, labels, SUM(value) FROM metrics"
+            f" WHERE pid IN ({marks}) AND type != 'gauge' GROUP BY family, type, name, labels"
+            " ON CONFLICT (pid, name, labels) DO UPDATE SET value = value + excluded.value",
+            (self._RETAINED, *gone),
+        )
+        self._conn.execute(f"DELETE FROM metrics WHERE pid IN ({marks})", gone)
+
+    def aggregate(self) -> List[Sample]:
+        with self._lock:
+            pids = [pid for (pid,) in self._conn.execute("SELECT DISTINCT pid FROM metrics WHERE type = 'gauge'")]
+            dead = [(pid,) for pid in pids if not process_alive(pid)]
+            if dead:
+                self._conn.executemany("DELETE FROM metrics WHERE pid = ? AND type = 'gauge'", dead)
+            rows = self._conn.execute(
+                "SELECT family, type, name, labels, SUM(value) FROM metrics GROUP BY family, type, name, labels"
+            ).fetchall()
+        return [(family, type, name, tuple(tuple(kv) for kv in json.loads(labels)), value) for family, type, name, labels, value in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+@lru_cache
+def get_metrics() -> MetricsRegistry:
+    settings = get_settings()
+    store = SQLiteMetricsStore(settings.METRICS_SQLITE_PATH) if settings.METRICS_MULTIPROCESS else None
+    return MetricsRegistry(store, settings.METRICS_FLUSH_INTERVAL_SEC)
+
+
+def _observe_stage(name: str, seconds: float) -> None:
+    get_metrics().observe_stage(name, seconds)
+
+
+# Stages timed below the services layer (schema loads, validation, stub generation) land in the app's registry.
+stages.add_observer(_observe_stage)
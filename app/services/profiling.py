@@ -0,0 +1,243 @@
+"""Per-request profiles: stack samples plus internal stage timings, kept on disk for /admin/profiles.
+
+A `RequestProfile` is bound to the request's context while it runs and
+records its stages (`app.utils.stages`), including `dumps`' serialization. The
+`StackSampler` is one daemon thread that, while any profile is attached,
+samples the event loop thread's Python stack every `interval` seconds and
+credits each sample to the profile whose task was running at that moment.
+Nothing here runs unless ProfilingMiddleware is installed (PROFILING_ENABLED).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from secrets import token_hex
+from types import FrameType
+from typing import Any, Dict, List, Tuple
+
+from ..config import get_settings
+from ..utils import stages
+
+_ID = re.compile(r"prof_[0-9a-f]{16}")
+_CURRENT: ContextVar["RequestProfile | None"] = ContextVar("potterlabs_profile", default=None)
+
+
+def current_profile() -> "RequestProfile | None":
+    """The profile of the request being served, if it is being profiled."""
+    return _CURRENT.get()
+
+
+def activate(profile: "RequestProfile") -> Tuple[Token, Token]:
+    """Make `profile` the current request's profile, recording its stages, until `deactivate(tokens)`."""
+    return _CURRENT.set(profile), stages.record_into(profile.add_stage)
+
+
+def deactivate(tokens: Tuple[Token, Token]) -> None:
+    profile_token, stages_token = tokens
+    stages.stop_recording(stages_token)
+    _CURRENT.reset(profile_token)
+
+
+class RequestProfile:
+    """What one request spent its time on: per-stage totals, and (once sampling starts) folded stacks."""
+
+    __slots__ = ("id", "method", "path", "trigger", "started", "task", "loop", "thread_id", "stages", "stacks", "elsewhere", "sampling_since")
+
+    def __init__(self, method: str, path: str, trigger: str | None):
+        self.id = "prof_" + token_hex(8)
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.task = asyncio.current_task()
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.stages: Dict[str, List[float]] = {}  # name -> [count, seconds]
+        self.stacks: Counter[str] = Counter()
+        self.elsewhere = 0  # samples taken while the loop was idle or running another task
+        self.sampling_since: float | None = None
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        totals = self.stages.get(name)
+        if totals is None:
+            self.stages[name] = [1, seconds]
+        else:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def capture(self, status: int, duration: float, interval: float, max_stacks: int) -> Dict[str, Any]:
+        stacks = self.stacks.most_common(max_stacks)
+        return {
+            "id": self.id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "trigger": self.trigger or "slow",
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 3),
+            "stages_ms": {name: {"count": int(count), "total_ms": round(seconds * 1000, 3)} for name, (count, seconds) in sorted(self.stages.items())},
+            "sampling": {
+                "interval_ms": round(interval * 1000, 3),
+                "started_after_ms": None if self.sampling_since is None else round((self.sampling_since - self.started) * 1000, 3),
+                "samples": sum(self.stacks.values()),
+                "elsewhere": self.elsewhere,
+                "dropped_stacks": len(self.stacks) - len(stacks),
+            },
+            # Root-first, ";"-joined frames: the "folded" format flame graph tools read.
+            "stacks": [{"stack": stack, "count": count} for stack, count in stacks],
+        }
+
+
+def _fold(frame: FrameType | None, max_depth: int) -> str:
+    frames: List[str] = []
+    while frame is not None and len(frames) < max_depth:
+        code = frame.f_code
+        frames.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}:{frame.f_lineno}")
+        frame = frame.f_back
+    frames.reverse()
+    return ";".join(frames)
+
+
+class StackSampler:
+    """Samples the stacks of attached profiles' event loop threads from one daemon thread.
+
+    The thread only exists while at least one profile is attached. Each tick
+    folds each loop thread's stack once and credits it to the profile whose
+    task is current on that loop; every other attached profile on that loop
+    counts the tick as `elsewhere`.
+    """
+
+    def __init__(self, interval: float, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._profiles: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def attach(self, profile: RequestProfile) -> None:
+        with self._lock:
+            if profile.sampling_since is not None:
+                return
+            profile.sampling_since = time.perf_counter()
+            self._profiles.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="potterlabs-profiler", daemon=True)
+                self._thread.start()
+
+    def detach(self, profile: RequestProfile) -> None:
+        with self._lock:
+            if profile in self._profiles:
+                self._profiles.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+            self.sample(profiles)
+            time.sleep(self.interval)
+
+    def sample(self, profiles: List[RequestProfile]) -> None:
+        frames = sys._current_frames()
+        by_loop: Dict[Tuple[int, asyncio.AbstractEventLoop], List[RequestProfile]] = {}
+        for profile in profiles:
+            by_loop.setdefault((profile.thread_id, profile.loop), []).append(profile)
+        for (thread_id, loop), group in by_loop.items():
+            try:
+                running = asyncio.current_task(loop)
+            except RuntimeError:
+                running = None
+            stack = None
+            for profile in group:
+                if running is not None and running is profile.task:
+                    if stack is None:
+                        stack = _fold(frames.get(thread_id), self.max_depth)
+                    profile.stacks[stack] += 1
+                else:
+                    profile.elsewhere += 1
+
+
+class ProfileStore:
+    """Captures as one JSON file each under `root`, pruned oldest-first beyond `max_entries` or `max_bytes`.
+
+    File names start with the capture time, so a directory listing is also the
+    history; workers share the directory and writes are atomic renames.
+    """
+
+    def __init__(self, root: Path, max_entries: int, max_bytes: int):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def save(self, capture: Dict[str, Any]) -> Path:
+        path = self.root / f"{time.time_ns():020d}-{capture['id']}.json"
+        tmp = self.root / f".{capture['id']}.{os.getpid()}.tmp"
+        tmp.write_bytes(json.dumps(capture, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp, path)
+        self.prune()
+        return path
+
+    def _files(self) -> List[Path]:
+        return sorted(self.root.glob("*-prof_*.json"), reverse=True)
+
+    def prune(self) -> None:
+        total = 0
+        for i, path in enumerate(self._files()):
+            try:
+                total += path.stat().st_size
+                if i >= self.max_entries or total > self.max_bytes:
+                    path.unlink()
+            except FileNotFoundError:  # pruned by another worker
+                continue
+
+    def list(self, limit: int) -> List[Dict[str, Any]]:
+        """Summaries of the newest `limit` captures, newest first."""
+        summaries = []
+        for path in self._files()[:limit]:
+            capture = self._read(path)
+            if capture is not None:
+                capture.pop("stacks", None)
+                summaries.append(capture)
+        return summaries
+
+    def get(self, profile_id: str) -> bytes | None:
+        if not _ID.fullmatch(profile_id):
+            return None
+        for path in self.root.glob(f"*-{profile_id}.json"):
+            try:
+                return path.read_bytes()
+            except FileNotFoundError:
+                return None
+        return None
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, Any] | None:
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+@lru_cache
+def get_profile_store() -> ProfileStore:
+    settings = get_settings()
+    return ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_CAPTURES, settings.PROFILING_MAX_BYTES)
+
+
+@lru_cache
+def get_stack_sampler() -> StackSampler:
+    return StackSampler(get_settings().PROFILING_INTERVAL_MS / 1000)
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from fastapi import Depends, Request
+
+from ..config import get_settings
+from ..exceptions import RateLimitedException
+from ..utils.sqlite import Database
+from .catalog import ProviderCatalog, get_provider_catalog
+from .health import HealthMonitor, get_health_monitor
+from .jobs import JobEngine, get_job_engine
+
+Limit = Tuple[float, float]  # (tokens per second, capacity)
+T = TypeVar("T")
+
+
+class BucketStore(ABC):
+    """Token buckets keyed by name, refilled lazily from wall-clock time on each `take`.
+
+    A missing bucket is a full one, so buckets that have refilled completely
+    can be dropped by `evict` without changing any answer.
+    """
+
+    # Whether calls do I/O and so belong off the event loop.
+    blocking = False
+
+    @abstractmethod
+    def take(self, key: str, limit: Limit, want: int) -> Tuple[int, float, float]:
+        """Removes up to `want` whole tokens; returns `(granted, seconds until the next token, tokens left)`."""
+
+    @abstractmethod
+    def give(self, key: str, limit: Limit, tokens: float) -> None:
+        """Puts back `tokens` taken earlier and not spent."""
+
+    @abstractmethod
+    def evict(self) -> int:
+        """Drops buckets that are full again; returns how many."""
+
+
+def _refill(tokens: float, updated: float, now: float, limit: Limit, want: int) -> Tuple[float, int, float]:
+    rate, capacity = limit
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    granted = min(want, int(tokens))
+    tokens -= granted
+    wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+    return tokens, granted, wait
+
+
+def _full_at(tokens: float, now: float, limit: Limit) -> float:
+    rate, capacity = limit
+    return now + max(0.0, capacity - tokens) / rate
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-worker buckets: each worker enforces the full limit on its own."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> (tokens, updated, full at)
+
+    def take(self, key: str, limit: Limit, want: int) -> Tuple[int, float, float]:
+        now = time.time()
+        tokens, updated, _ = self._buckets.get(key, (limit[1], now, now))
+        tokens, granted, wait = _refill(tokens, updated, now, limit, want)
+        self._buckets[key] = (tokens, now, _full_at(tokens, now, limit))
+        return granted, wait, tokens
+
+    def give(self, key: str, limit: Limit, tokens: float) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            now = time.time()
+            left, _, _ = _refill(bucket[0] + tokens, bucket[1], now, limit, 0)
+            self._buckets[key] = (left, now, _full_at(left, now, limit))
+
+    def evict(self) -> int:
+        now = time.time()
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+        return len(full)
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets in one SQLite file, so every worker on the host draws from the same budget."""
+
+    blocking = True
+
+    def __init__(self, path: Path | str):
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL DEFAULT 0) WITHOUT ROWID",
+            ),
+        )
+        if "full_at" not in {row[1] for row in self._conn.execute("PRAGMA table_info(buckets)")}:  # tables from before eviction
+            self._conn.execute("ALTER TABLE buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)")
+
+    def take(self, key: str, limit: Limit, want: int) -> Tuple[int, float, float]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row is not None else (limit[1], now)
+                tokens, granted, wait = _refill(tokens, updated, now, limit, want)
+                self._conn.execute(
+                    "INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, full_at = excluded.full_at",
+                    (key, tokens, now, _full_at(tokens, now, limit)),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return granted, wait, tokens
+
+    def give(self, key: str, limit: Limit, tokens: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                if row is not None:  # else the bucket is full already
+                    left, _, _ = _refill(row[0] + tokens, row[1], now, limit, 0)
+                    self._conn.execute(
+                        "UPDATE buckets SET tokens = ?, updated = ?, full_at = ? WHERE key = ?", (left, now, _full_at(left, now, limit), key)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def evict(self) -> int:
+        with self._lock:
+            return self._conn.execute("DELETE FROM buckets WHERE full_at <= ?", (time.time(),)).rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class RateLimiter:
+    """Enforces the catalog's `quota` per provider, and a share of it per API key.
+
+    Each worker leases tokens from the shared `store`, at least `min_lease`
+    at a time, and spends them locally, so the common case is a dict lookup
+    and a decrement on the event loop, with no lock and no I/O; refills run
+    in a thread when the store blocks. Tokens are only taken from the shared
+    bucket, never created locally, so workers together can not exceed a
+    limit. A lease expires after `lease_ttl` seconds and its unused tokens go
+    back to the bucket; every `sweep_interval` seconds expired leases are
+    returned and dropped, and so are buckets, here and in the store, that
+    have refilled completely, so neither grows with the number of API keys
+    ever seen.
+    """
+
+    def __init__(
+        self,
+        store: BucketStore,
+        catalog: ProviderCatalog,
+        key_share: float = 0.5,
+        lease_fraction: float = 0.1,
+        lease_ttl: float = 1.0,
+        min_lease: int = 8,
+        sweep_interval: float = 10.0,
+    ):
+        self._store = store
+        self._catalog = catalog
+        self._key_share = key_share
+        self._lease_fraction = lease_fraction
+        self._lease_ttl = lease_ttl
+        self._min_lease = min_lease
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._leases: Dict[str, List[Any]] = {}  # bucket key -> [tokens, expires_at, limit]
+        self._levels: Dict[str, Tuple[float, float, float]] = {}  # bucket key -> (shared tokens left, when we last saw them, when it is full)
+
+    async def check(self, provider_id: str | None, api_key: str) -> None:
+        """Spends one token of `provider_id`'s budget for `api_key`, or raises `RateLimitedException`."""
+        limit = self._catalog.snapshot.rate_limits.get(provider_id) if provider_id else None
+        if limit is None:
+            return
+        rate, capacity = limit
+        key_bucket = f"key:{provider_id}:{api_key}"
+        key_limit = (rate * self._key_share, max(1.0, capacity * self._key_share))
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            await self.sweep(now)
+        wait = await self._spend(key_bucket, key_limit, now)
+        if wait:
+            raise RateLimitedException(provider_id, "api_key", max(1, math.ceil(wait)))
+        wait = await self._spend(f"provider:{provider_id}", limit, now)
+        if wait:
+            lease = self._leases.get(key_bucket)
+            if lease is not None:  # the request is not going through; give the key its token back
+                lease[0] += 1
+            raise RateLimitedException(provider_id, "provider", max(1, math.ceil(wait)))
+
+    def budget(self, provider_id: str) -> float:
+        """Estimated fraction of `provider_id`'s bucket still available, 0..1, without touching the store.
+
+        Based on the level seen at this worker's last refill plus refill since,
+        so it is cheap enough to consult for every routing decision.
+        """
+        limit = self._catalog.snapshot.rate_limits.get(provider_id)
+        key = f"provider:{provider_id}"
+        level = self._levels.get(key)
+        if limit is None or level is None:
+            return 1.0
+        rate, capacity = limit
+        left, seen_at, _ = level
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        leased = lease[0] if lease is not None and lease[1] > now else 0.0
+        return min(1.0, (left + leased + (now - seen_at) * rate) / capacity)
+
+    async def sweep(self, now: float | None = None) -> None:
+        """Returns the tokens of expired leases to the store and forgets buckets that are full again."""
+        now = time.monotonic() if now is None else now
+        expired = [key for key, lease in self._leases.items() if lease[1] <= now]
+        unused = [(key, lease[2], lease[0]) for key, lease in ((key, self._leases.pop(key)) for key in expired) if lease[0] >= 1]
+        for key in [key for key, (_, _, full_at) in self._levels.items() if full_at <= now]:
+            del self._levels[key]
+        await self._call(self._return_and_evict, unused)
+
+    def _return_and_evict(self, unused: List[Tuple[str, Limit, float]]) -> None:
+        for key, limit, tokens in unused:
+            self._store.give(key, limit, tokens)
+        self._store.evict()
+
+    def _refill_lease(self, key: str, limit: Limit, want: int, unused: float) -> Tuple[int, float, float]:
+        if unused >= 1:
+            self._store.give(key, limit, unused)
+        return self._store.take(key, limit, want)
+
+    async def _call(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _spend(self, key: str, limit: Limit, now: float) -> float:
+        """Returns 0 when a token was spent, else the seconds until one is available."""
+        lease = self._leases.get(key)
+        if lease is not None and lease[1] > now:
+            if lease[0] >= 1:
+                lease[0] -= 1
+                return 0.0
+            unused = 0.0
+        else:
+            unused = self._leases.pop(key)[0] if lease is not None else 0.0  # expired: its tokens go back
+        want = max(self._min_lease, int(limit[1] * self._lease_fraction))
+        granted, wait, left = await self._call(self._refill_lease, key, limit, want, unused)
+        self._levels[key] = (left, now, now + max(0.0, limit[1] - left) / limit[0])
+        if not granted:
+            return max(wait, 1e-3)
+        lease = self._leases.get(key)
+        if lease is not None and lease[1] > now:  # another request refilled it meanwhile
+            lease[0] += granted - 1
+        else:
+            self._leases[key] = [granted - 1, now + self._lease_ttl, limit]
+        return 0.0
+
+
+def client_key(request: Request) -> str:
+    """Who a request is billed to: its API key (hashed, so it is never stored), else its client address."""
+    key = request.headers.get("x-api-key")
+    if not key:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        key = token if scheme.lower() == "bearer" else None
+    if key:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+    return "addr:" + (request.client.host if request.client else "unknown")
+
+
+def build_bucket_store(backend: str, path: Path) -> BucketStore:
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(path)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}' (expected 'memory' or 'sqlite')")
+
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter | None:
+    settings = get_settings()
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    return RateLimiter(
+        build_bucket_store(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_SQLITE_PATH),
+        get_provider_catalog(),
+        key_share=settings.RATE_LIMIT_KEY_SHARE,
+        lease_fraction=settings.RATE_LIMIT_LEASE_FRACTION,
+        lease_ttl=settings.RATE_LIMIT_LEASE_TTL_SEC,
+        min_lease=settings.RATE_LIMIT_MIN_LEASE,
+        sweep_interval=settings.RATE_LIMIT_SWEEP_INTERVAL_SEC,
+    )
+
+
+Throttle = Callable[[str, Dict], Awaitable[None]]  # (job kind, validated body)
+
+
+def provider_of(payload: Dict) -> str | None:
+    """The provider a create body targets: top-level `provider`, or `voice.provider` for an ad-hoc voice."""
+    provider = payload.get("provider")
+    if provider is None and isinstance(payload.get("voice"), dict):
+        provider = payload["voice"].get("provider")
+    return provider if isinstance(provider, str) else None
+
+
+def get_throttle(
+    request: Request,
+    limiter: RateLimiter | None = Depends(get_rate_limiter),
+    health: HealthMonitor = Depends(get_health_monitor),
+    jobs: JobEngine = Depends(get_job_engine),
+) -> Throttle:
+    """Dependency for create routes: call it with the job kind and validated body to admit its `provider`.
+
+    Fails fast while the provider's circuit is open, if jobs of that kind call
+    the provider (kinds served locally only route around it), then spends one
+    of its rate-limit tokens.
+    """
+    api_key = client_key(request)
+
+    async def throttle(kind: str, payload: Dict) -> None:
+        provider = provider_of(payload)
+        if jobs.calls_provider(kind):
+            health.check(provider)
+        if limiter is not None:
+            await limiter.check(provider, api_key)
+
+    return throttle
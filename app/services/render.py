@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, NamedTuple, Tuple
+
+import httpx
+
+from ..config import get_settings
+from ..utils.common import dumps
+from ..utils.sqlite import Database
+from .jobs import Job
+from .routing import ProviderRouter, get_provider_router
+from .simulator import get_simulator
+
+logger = logging.getLogger("potterlabs.render")
+
+# Bump a stage's version when its output for the same inputs changes, so old cache entries stop matching.
+STAGE_VERSIONS: Dict[str, int] = {"script": 1, "beats": 1, "image": 1, "voiceover": 2, "music": 1, "slideshow": 2, "video": 1}
+
+# Seconds of narration per word, to size music before the voiceover exists.
+_SECONDS_PER_WORD = 0.4
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+class StageCache:
+    """Stage outputs keyed by the content hash of their inputs, in SQLite so every worker shares them.
+
+    Least recently used entries beyond `max_entries` are dropped. A hit only
+    writes back its use time once that is `_TOUCH_AFTER` seconds old, so reads
+    stay reads and recency is kept to within that much.
+    """
+
+    _PURGE_EVERY = 256
+    _TOUCH_AFTER = 60.0
+
+    def __init__(self, path: Path | str, max_entries: int = 100_000):
+        self._max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS stage_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, used_at REAL NOT NULL) WITHOUT ROWID",
+                "CREATE INDEX IF NOT EXISTS stage_cache_used ON stage_cache (used_at)",
+            ),
+        )
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value, used_at FROM stage_cache WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] >= self._TOUCH_AFTER:
+                self._conn.execute("UPDATE stage_cache SET used_at = ? WHERE key = ?", (now, key))
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO stage_cache (key, value, used_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, used_at = excluded.used_at",
+                (key, dumps(value), time.time()),
+            )
+            self._writes += 1
+            if self._writes % self._PURGE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM stage_cache WHERE key IN (SELECT key FROM stage_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self._max_entries,),
+                )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def content_key(stage: str, inputs: Any) -> str:
+    """The cache key of `stage` run on `inputs`: a SHA-256 over its name, version and canonical JSON inputs."""
+    material = json.dumps([stage, STAGE_VERSIONS[stage], inputs], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class RenderWorkers:
+    """Produces each stage's artifact from its inputs.
+
+    Until real provider integrations exist, artifacts are content-addressed
+    placeholders under `artifact_base`. Provider-backed stages still make their
+    upstream call through the router when a `transport` is given (the simulator,
+    with SIMULATOR_ENABLED), so renders exercise fallback, breakers and latency.
+    """
+
+    def __init__(self, router: ProviderRouter | None = None, transport: httpx.AsyncBaseTransport | None = None, artifact_base: str = "https://cdn.potterlabs.dev/renders"):
+        self._router = router
+        self._transport = transport
+        self._artifact_base = artifact_base.rstrip("/")
+
+    def _url(self, key: str, ext: str) -> str:
+        return f"{self._artifact_base}/{key[:24]}.{ext}"
+
+    async def _upstream(self, capability: str) -> None:
+        if self._router is None or self._transport is None:
+            return
+
+        async def call(provider_id: str) -> None:
+            async with httpx.AsyncClient(transport=self._transport, base_url="http://simulator") as client:
+                (await client.post(f"/{provider_id}/{capability}")).raise_for_status()
+
+        await self._router.call(capability, call)
+
+    async def script(self, key: str, script: str, style: str | None) -> Dict[str, Any]:
+        return {"script_id": f"scr_{key[:16]}", "text": script.strip()}
+
+    async def beats(self, key: str, script: Dict[str, Any], captions: List[str]) -> List[Dict[str, Any]]:
+        captions = captions or [s for s in _SENTENCE.split(script["text"]) if s]
+        return [{"index": i, "caption": caption} for i, caption in enumerate(captions)]
+
+    async def image(self, key: str, caption: str, style: str | None, resolution: str | None) -> Dict[str, Any]:
+        await self._upstream("image-gen")
+        return {"image_url": self._url(key, "png")}
+
+    async def voiceover(self, key: str, text: str) -> Dict[str, Any]:
+        await self._upstream("tts")
+        return {"audio_url": self._url(key, "wav"), "duration_sec": round(len(text.split()) * _SECONDS_PER_WORD, 2)}
+
+    async def music(self, key: str, style: str | None, duration_sec: float) -> Dict[str, Any]:
+        await self._upstream("music-gen")
+        return {"audio_url": self._url(key, "mp3"), "duration_sec": duration_sec}
+
+    async def slideshow(self, key: str, beats: List[Dict[str, Any]], images: List[Dict[str, Any]], voiceover: List[Dict[str, Any]], music: Dict[str, Any]) -> Dict[str, Any]:
+        per_slide = sum(clip["duration_sec"] for clip in voiceover) / max(1, len(beats))
+        slides = [{"caption": b["caption"], "image_url": i["image_url"], "duration_sec": round(per_slide, 2)} for b, i in zip(beats, images)]
+        return {"slideshow_id": f"ss_{key[:16]}", "slides": slides, "voiceover_urls": [clip["audio_url"] for clip in voiceover], "music_url": music["audio_url"]}
+
+    async def video(self, key: str, slideshow: Dict[str, Any], resolution: str | None) -> Dict[str, Any]:
+        await self._upstream("video-gen")
+        return {"video_url": self._url(key, "mp4")}
+
+
+def narration(script: Dict[str, Any], beats: List[Dict[str, Any]]) -> List[str]:
+    """The lines to voice, one clip each: the script's sentences, or the beats' captions when there is no script."""
+    return [s for s in _SENTENCE.split(script["text"]) if s] or [beat["caption"] for beat in beats]
+
+
+class _Run:
+    """Book-keeping for one render: what each stage did."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def note(self, stage: str, cached: bool, seconds: float) -> None:
+        entry = self.stages.setdefault(stage, {"ran": 0, "cached": 0, "ms": 0.0})
+        entry["cached" if cached else "ran"] += 1
+        entry["ms"] = round(entry["ms"] + seconds * 1000, 2)
+
+
+class Stage(NamedTuple):
+    name: str
+    deps: Tuple[str, ...]
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+async def run_dag(stages: List[Stage]) -> Dict[str, Any]:
+    """Runs each stage as soon as its dependencies are done; independent stages run concurrently.
+
+    `stages` must be in dependency order. The first failure cancels whatever is still running.
+    """
+    tasks: Dict[str, asyncio.Future] = {}
+
+    async def start(stage: Stage) -> Any:
+        inputs = {dep: await tasks[dep] for dep in stage.deps}
+        return await stage.run(inputs)
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(start(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return {name: task.result() for name, task in tasks.items()}
+
+
+class RenderPipeline:
+    """Renders a storyboard: script -> beats -> (images || voiceover || music) -> slideshow -> video.
+
+    Every stage, every beat's image and every narration line's voiceover is
+    cached under `content_key` of exactly the inputs it reads, so a
+    re-render only reruns what an edit reaches: a changed caption reruns
+    that beat's image (and, for a storyboard without a script, that line's
+    voiceover) plus the slideshow and video, while everything else is a
+    cache hit. Stage work is bounded process-wide by `limits` (stage name
+    -> concurrent runs), shared by all renders in flight.
+    """
+
+    def __init__(self, cache: StageCache, workers: RenderWorkers, limits: Mapping[str, int] | None = None):
+        self.cache = cache
+        self.workers = workers
+        self._limits = dict(limits or {})
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore | None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphores, self._inflight = loop, {}, {}
+        limit = self._limits.get(stage)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = self._semaphores[stage] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def _cached(self, run: _Run, stage: str, inputs: Any, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        key = content_key(stage, inputs)
+        started = time.perf_counter()
+        semaphore = self._semaphore(stage)
+        hit = self.cache.get(key)
+        if hit is not None:
+            run.note(stage, True, time.perf_counter() - started)
+            return hit
+        # Identical work already running for another render: share its result.
+        pending = self._inflight.get(key)
+        if pending is not None:
+            value = await asyncio.shield(pending)
+            run.note(stage, True, time.perf_counter() - started)
+            return value
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            if semaphore is None:
+                value = await fn(key)
+            else:
+                async with semaphore:
+                    value = await fn(key)
+            self.cache.put(key, value)
+            future.set_result(value)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved here, so an unshared failure is not logged as unhandled
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        run.note(stage, False, time.perf_counter() - started)
+        return value
+
+    async def render(self, storyboard: Dict[str, Any], style: str | None = None, resolution: str | None = None) -> Dict[str, Any]:
+        run = _Run()
+        w = self.workers
+        script_text = storyboard.get("script") or ""
+        captions = list(storyboard.get("scenes") or [])
+
+        async def script(_: Dict[str, Any]) -> Any:
+            return await self._cached(run, "script", [script_text, style], lambda key: w.script(key, script_text, style))
+
+        async def beats(deps: Dict[str, Any]) -> Any:
+            return await self._cached(run, "beats", [deps["script"], captions], lambda key: w.beats(key, deps["script"], captions))
+
+        async def images(deps: Dict[str, Any]) -> Any:
+            return await asyncio.gather(*(
+                self._cached(run, "image", [beat["caption"], style, resolution], lambda key, beat=beat: w.image(key, beat["caption"], style, resolution))
+                for beat in deps["beats"]
+            ))
+
+        async def voiceover(deps: Dict[str, Any]) -> Any:
+            return await asyncio.gather(*(
+                self._cached(run, "voiceover", [line], lambda key, line=line: w.voiceover(key, line))
+                for line in narration(deps["script"], deps["beats"])
+            ))
+
+        async def music(deps: Dict[str, Any]) -> Any:
+            words = sum(len(line.split()) for line in narration(deps["script"], deps["beats"]))
+            duration = round(words * _SECONDS_PER_WORD, 2)
+            return await self._cached(run, "music", [style, duration], lambda key: w.music(key, style, duration))
+
+        async def slideshow(deps: Dict[str, Any]) -> Any:
+            parts = [deps["beats"], deps["images"], deps["voiceover"], deps["music"]]
+            return await self._cached(run, "slideshow", parts, lambda key: w.slideshow(key, *parts))
+
+        async def video(deps: Dict[str, Any]) -> Any:
+            return await self._cached(run, "video", [deps["slideshow"], resolution], lambda key: w.video(key, deps["slideshow"], resolution))
+
+        started = time.perf_counter()
+        outputs = await run_dag([
+            Stage("script", (), script),
+            Stage("beats", ("script",), beats),
+            Stage("images", ("beats",), images),
+            Stage("voiceover", ("script", "beats"), voiceover),
+            Stage("music", ("script", "beats"), music),
+            Stage("slideshow", ("beats", "images", "voiceover", "music"), slideshow),
+            Stage("video", ("slideshow",), video),
+        ])
+        logger.info("Rendered storyboard %s in %.0f ms: %s", storyboard.get("id"), (time.perf_counter() - started) * 1000, run.stages)
+        return {
+            "storyboard_id": storyboard.get("id"),
+            "slideshow_id": outputs["slideshow"]["slideshow_id"],
+            "video_url": outputs["video"]["video_url"],
+            "stages": run.stages,
+        }
+
+    async def run_job(self, job: Job) -> Dict[str, Any]:
+        """`storyboard-renders` job executor."""
+        payload = job.payload
+        return await self.render(payload["storyboard"], payload.get("style"), payload.get("resolution"))
+
+
+@lru_cache
+def get_render_pipeline() -> RenderPipeline:
+    settings = get_settings()
+    simulator = get_simulator()
+    workers = RenderWorkers(get_provider_router(), simulator.transport() if simulator is not None else None)
+    return RenderPipeline(StageCache(settings.RENDER_CACHE_SQLITE_PATH, settings.RENDER_CACHE_MAX_ENTRIES), workers, settings.RENDER_STAGE_CONCURRENCY)
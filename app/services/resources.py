@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import base64
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Tuple
+
+from ..config import get_settings
+from ..utils.sqlite import Database
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: str, id: str) -> str:
+    raw = json.dumps([created_at, id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+    except Exception as exc:  # noqa: BLE001 - any malformed cursor is the client's error
+        raise InvalidCursor(cursor) from exc
+    if not isinstance(created_at, str) or not isinstance(id, str):
+        raise InvalidCursor(cursor)
+    return created_at, id
+
+
+class Page(NamedTuple):
+    items: List[bytes]
+    next: str | None
+
+    def encode(self) -> bytes:
+        """The `ListResponse*` body, built from the stored bytes without re-parsing them."""
+        return b'{"items":[' + b",".join(self.items) + b"]," + self.encode_next() + b"}"
+
+    def encode_next(self) -> bytes:
+        return b'"next":' + (b"null" if self.next is None else b'"%s"' % self.next.encode("ascii"))
+
+
+class ResourceStore(ABC):
+    """Created resources keyed by `(kind, id)`, each stored as its encoded JSON body.
+
+    `list` pages newest first with a keyset cursor on `(created_at, id)`, so
+    page N costs the same index seek as page 1.
+    """
+
+    @abstractmethod
+    def put(self, kind: str, id: str, body: bytes, status: str | None = None, created_at: str | None = None) -> None: ...
+
+    @abstractmethod
+    def get(self, kind: str, id: str) -> bytes | None: ...
+
+    @abstractmethod
+    def list(self, kind: str, limit: int, cursor: str | None = None, status: str | None = None) -> Page: ...
+
+    @abstractmethod
+    def next_cursor(self, kind: str, limit: int, cursor: str | None = None, status: str | None = None) -> str | None:
+        """`list(kind, limit, cursor, status).next`, without reading any bodies."""
+
+    def pages(self, kind: str, limit: int, cursor: str | None = None, status: str | None = None, batch_size: int = 50) -> Iterator[Page]:
+        """`list(kind, limit, cursor, status)` read `batch_size` items at a time; the last page's `next` is the listing's.
+
+        Raises InvalidCursor on the first `next()`, before anything is yielded.
+        """
+        remaining = limit
+        while remaining > 0:
+            page = self.list(kind, min(batch_size, remaining), cursor, status)
+            remaining -= len(page.items)
+            yield page
+            if page.next is None:
+                return
+            cursor = page.next
+
+    def record_job(self, job: Any) -> None:
+        """Job engine listener: keeps the job's current view listable under its kind."""
+        self.put(job.kind, job.id, job.encode(), job.status, job.created_at)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteResourceStore(ResourceStore):
+    def __init__(self, path: Path | str):
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS resources ("
+                " kind TEXT NOT NULL, id TEXT NOT NULL, status TEXT, created_at TEXT NOT NULL, body BLOB NOT NULL,"
+                " PRIMARY KEY (kind, id)) WITHOUT ROWID",
+                "CREATE INDEX IF NOT EXISTS resources_page ON resources (kind, created_at, id)",
+                "CREATE INDEX IF NOT EXISTS resources_status_page ON resources (kind, status, created_at, id)",
+            ),
+        )
+
+    def put(self, kind: str, id: str, body: bytes, status: str | None = None, created_at: str | None = None) -> None:
+        with self._lock:
+            # An update keeps the original created_at so a resource never moves between pages.
+            self._conn.execute(
+                "INSERT INTO resources (kind, id, status, created_at, body) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (kind, id) DO UPDATE SET status = excluded.status, body = excluded.body",
+                (kind, id, status, created_at or _now(), body),
+            )
+
+    def get(self, kind: str, id: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM resources WHERE kind = ? AND id = ?", (kind, id)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    @staticmethod
+    def _where(kind: str, cursor: str | None, status: str | None) -> Tuple[str, List[str]]:
+        where, params = ["kind = ?"], [kind]
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if cursor:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        return " AND ".join(where), params
+
+    def list(self, kind: str, limit: int, cursor: str | None = None, status: str | None = None) -> Page:
+        where, params = self._where(kind, cursor, status)
+        sql = f"SELECT created_at, id, body FROM resources WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit + 1)).fetchall()
+        next = encode_cursor(rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+        return Page([bytes(body) for _, _, body in rows[:limit]], next)
+
+    def next_cursor(self, kind: str, limit: int, cursor: str | None = None, status: str | None = None) -> str | None:
+        where, params = self._where(kind, cursor, status)
+        # Served from the page indexes alone: the last key of this page and whether one follows it.
+        sql = f"SELECT created_at, id FROM resources WHERE {where} ORDER BY created_at DESC, id DESC LIMIT 2 OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit - 1)).fetchall()
+        return encode_cursor(rows[0][0], rows[0][1]) if len(rows) == 2 else None
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def build_resource_store(backend: str, sqlite_path: Path) -> ResourceStore:
+    if backend == "sqlite":
+        return SQLiteResourceStore(sqlite_path)
+    raise ValueError(f"Unknown RESOURCES_BACKEND '{backend}' (expected 'sqlite')")
+
+
+@lru_cache
+def get_resource_store() -> ResourceStore:
+    settings = get_settings()
+    return build_resource_store(settings.RESOURCES_BACKEND, settings.RESOURCES_SQLITE_PATH)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Tuple, TypeVar
+
+from ..config import get_settings
+from ..exceptions import NoProviderAvailableException
+from .catalog import CatalogSnapshot, ProviderCatalog, get_provider_catalog
+from .health import HealthMonitor, get_health_monitor
+from .ratelimit import RateLimiter, get_rate_limiter
+
+logger = logging.getLogger("potterlabs.routing")
+
+T = TypeVar("T")
+
+
+class ProviderRouter:
+    """Picks providers for a capability, best first, and calls them with fallback and hedging.
+
+    Candidates come from the catalog snapshot's capability index. Each is
+    scored (lower is better) from its live latency and error rate (moving
+    averages kept by the health monitor, falling back to the catalog's
+    `latency_ms_estimate`), its `cost_per_unit` and the rate-limit budget it
+    has left. Latency is normalized against the slowest candidate. Costs in
+    different `billing_unit`s can not be compared, so cost is min-max
+    normalized among candidates billed in the same unit (0 cheapest, 1
+    priciest; an unknown cost counts as 1). Providers whose circuit is open
+    are skipped. Every
+    input is an in-memory read, so a decision is a single pass over the
+    candidates.
+    """
+
+    def __init__(
+        self,
+        catalog: ProviderCatalog,
+        health: HealthMonitor,
+        limiter: RateLimiter | None = None,
+        latency_weight: float = 1.0,
+        error_weight: float = 2.0,
+        cost_weight: float = 0.5,
+        budget_weight: float = 1.0,
+        default_latency_ms: float = 1000.0,
+    ):
+        self._catalog = catalog
+        self._health = health
+        self._limiter = limiter
+        self._weights = (latency_weight, error_weight, cost_weight, budget_weight)
+        self._default_latency_ms = default_latency_ms
+        self._static: Tuple[CatalogSnapshot | None, Dict[str, Tuple[float, float | None, str | None]]] = (None, {})
+
+    def _static_for(self, snapshot: CatalogSnapshot) -> Dict[str, Tuple[float, float | None, str | None]]:
+        """provider id -> (latency estimate ms, cost per unit, billing unit), rebuilt when the catalog snapshot changes."""
+        built_for, static = self._static
+        if built_for is not snapshot:
+            static = {p.id: (float(p.latency_ms_estimate or self._default_latency_ms), p.cost_per_unit, p.billing_unit) for p in snapshot.providers}
+            self._static = (snapshot, static)
+        return static
+
+    def scores(self, capability: str) -> List[Tuple[str, float]]:
+        """`(provider id, score)` for every usable provider of `capability`, best first."""
+        snapshot = self._catalog.snapshot
+        static = self._static_for(snapshot)
+        health, limiter = self._health, self._limiter
+        rows = []
+        slowest = 0.0
+        costs: Dict[str | None, Tuple[float, float]] = {}  # billing unit -> (cheapest, priciest)
+        for pid in snapshot.providers_by_capability.get(capability, ()):
+            if health.is_open(pid):
+                continue
+            estimate, cost, unit = static[pid]
+            latency, errors = health.stats(pid)
+            if latency is None:
+                latency = estimate
+            budget = limiter.budget(pid) if limiter is not None else 1.0
+            rows.append((pid, latency, errors, cost, unit, budget))
+            slowest = max(slowest, latency)
+            if cost is not None:
+                cheapest, priciest = costs.get(unit, (cost, cost))
+                costs[unit] = (min(cheapest, cost), max(priciest, cost))
+
+        w_latency, w_errors, w_cost, w_budget = self._weights
+        slowest = slowest or 1.0
+        scored = []
+        for pid, latency, errors, cost, unit, budget in rows:
+            if cost is None:
+                relative_cost = 1.0
+            else:
+                cheapest, priciest = costs[unit]
+                relative_cost = (cost - cheapest) / (priciest - cheapest) if priciest > cheapest else 0.0
+            scored.append((pid, w_latency * latency / slowest + w_errors * errors + w_cost * relative_cost + w_budget * (1.0 - budget)))
+        scored.sort(key=lambda row: row[1])
+        return scored
+
+    def rank(self, capability: str) -> List[str]:
+        return [pid for pid, _ in self.scores(capability)]
+
+    async def call(
+        self,
+        capability: str,
+        fn: Callable[[str], Awaitable[T]],
+        hedge_after: float | None = None,
+        max_attempts: int | None = None,
+    ) -> T:
+        """`await fn(provider_id)` on the best provider, moving down the ranking when a call fails.
+
+        With `hedge_after`, a call still running after that many seconds gets
+        raced against the next candidate, and the first success wins; use it
+        for latency-critical calls, since hedging spends extra upstream
+        requests. Outcomes are recorded with the health monitor, so they feed
+        later decisions and the circuit breakers. Raises
+        `NoProviderAvailableException` when every candidate failed.
+        """
+        candidates = iter(self.rank(capability)[:max_attempts])
+        pending: Dict[asyncio.Future, Tuple[str, float]] = {}
+        errors: List[str] = []
+
+        def launch() -> None:
+            for pid in candidates:
+                if self._health.admit(pid):  # a half-open provider takes one trial call at a time
+                    pending[asyncio.ensure_future(fn(pid))] = (pid, time.perf_counter())
+                    return
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                for task in done:
+                    pid, started = pending.pop(task)
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    error = task.exception()
+                    if error is None:
+                        self._health.record(pid, True, latency_ms)
+                        return task.result()
+                    self._health.record(pid, False, latency_ms)
+                    logger.warning("%s call to provider %s failed: %r", capability, pid, error)
+                    errors.append(f"{pid}: {error!r}")
+                    launch()
+        finally:
+            for task in pending:  # hedges that lost the race
+                task.cancel()
+        raise NoProviderAvailableException(capability, errors)
+
+
+@lru_cache
+def get_provider_router() -> ProviderRouter:
+    settings = get_settings()
+    return ProviderRouter(
+        get_provider_catalog(),
+        get_health_monitor(),
+        get_rate_limiter(),
+        latency_weight=settings.ROUTING_LATENCY_WEIGHT,
+        error_weight=settings.ROUTING_ERROR_WEIGHT,
+        cost_weight=settings.ROUTING_COST_WEIGHT,
+        budget_weight=settings.ROUTING_BUDGET_WEIGHT,
+        default_latency_ms=settings.ROUTING_DEFAULT_LATENCY_MS,
+    )
@@ -0,0 +1,207 @@
+"""Fake upstream providers for load tests and incident reproduction without network access.
+
+One ASGI app answers for every provider in the catalog, under `/<provider id>/...`:
+`GET /<id>/health` and `POST /<id>/<capability>` (any path, really). Each provider
+has a profile: a latency distribution, an error rate, its own rate limit (429 with
+Retry-After) and a payload size. Latency, errors and sizes are drawn from an RNG
+seeded by `(seed, provider, request number)`, so the n-th request to a provider
+behaves the same on every run with the same seed, however requests interleave.
+The rate limit runs on a virtual clock per provider, which each request advances
+by its simulated latency (as if the provider served its requests back to back),
+so whether the n-th request is limited is reproducible too. Health checks answer
+within `health_latency_ms`, so slow generation latencies do not stall probes.
+`incidents` replay a tail-latency or error spike over a range of request numbers.
+
+In-process: `Simulator.transport()` plugs into any `httpx.AsyncClient`
+(the app does this itself with SIMULATOR_ENABLED). Over a local socket:
+
+    python -m benchmarks.simulator [--port 4011] [--seed 7] [--profiles sim.json] [--time-scale 0.1]
+
+A profiles file maps provider ids to overrides of the catalog-derived defaults, e.g.
+`{"openrouter": {"latency": {"dist": "pareto", "ms": 300, "alpha": 1.5}, "error_rate": 0.02,
+"incidents": [{"from_request": 500, "to_request": 600, "latency_multiplier": 20}]}}`.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
+
+import httpx
+from pydantic import BaseModel, Field
+from starlette.types import Receive, Scope, Send
+
+from ..config import get_settings
+from ..utils.common import dumps
+from .catalog import CatalogSnapshot, get_provider_catalog
+
+# Typical response size by provider category when a profile does not set one.
+DEFAULT_PAYLOAD_BYTES: Dict[str, int] = {"text": 2_048, "voice": 256_000, "image": 512_000, "music": 1_000_000, "video": 1_000_000}
+
+
+class Latency(BaseModel):
+    """`ms` is the constant value, the normal mean, the lognormal median or the pareto minimum."""
+
+    dist: str = Field("lognormal", pattern=r"^(constant|normal|lognormal|pareto)$")
+    ms: float = 500.0
+    spread: float = 0.5  # normal: stddev as a fraction of `ms`; lognormal: sigma of the log
+    alpha: float = 2.5  # pareto shape; lower means a heavier tail
+
+    def sample(self, rng: random.Random) -> float:
+        if self.dist == "constant":
+            return self.ms
+        if self.dist == "normal":
+            return max(0.0, rng.gauss(self.ms, self.ms * self.spread))
+        if self.dist == "lognormal":
+            return self.ms * math.exp(rng.gauss(0.0, self.spread))
+        return self.ms * rng.paretovariate(self.alpha)
+
+
+class Incident(BaseModel):
+    """Applies to requests `from_request` through `to_request` (1-based, per provider)."""
+
+    from_request: int
+    to_request: int
+    latency_multiplier: float = 1.0
+    error_rate: float | None = None
+
+
+class Profile(BaseModel):
+    latency: Latency = Latency()
+    error_rate: float = 0.01
+    error_status: int = 503
+    rate_limit_per_min: int | None = None
+    burst: int | None = None
+    payload_bytes: int = 2_048
+    payload_spread: float = 0.25  # sizes vary uniformly by +/- this fraction
+    health_latency_ms: float = 50.0  # cap on the latency of `GET /<id>/health`
+    incidents: List[Incident] = []
+
+
+class Outcome(NamedTuple):
+    latency_ms: float
+    status: int
+    size: int
+
+
+class Simulator:
+    """The fake providers; an ASGI app. See the module docstring."""
+
+    def __init__(self, profiles: Dict[str, Profile], seed: int = 0, time_scale: float = 1.0):
+        self.profiles = profiles
+        self.seed = seed
+        self.time_scale = time_scale
+        self._requests: Dict[str, int] = {}
+        self._clocks: Dict[str, float] = {}  # provider -> virtual seconds
+        self._buckets: Dict[str, List[float]] = {}  # provider -> [tokens, updated]
+
+    @classmethod
+    def from_catalog(cls, snapshot: CatalogSnapshot, overrides: Dict[str, Dict[str, Any]] | None = None, seed: int = 0, time_scale: float = 1.0) -> "Simulator":
+        """One profile per catalog provider: its latency estimate, quota and category's payload size, then `overrides`."""
+        overrides = overrides or {}
+        profiles: Dict[str, Profile] = {}
+        for p in snapshot.providers:
+            base: Dict[str, Any] = {
+                "latency": {"ms": float(p.latency_ms_estimate or 500)},
+                "payload_bytes": DEFAULT_PAYLOAD_BYTES.get(p.category, 2_048),
+            }
+            if p.quota is not None:
+                base.update(rate_limit_per_min=p.quota.rate_limit_per_min, burst=p.quota.burst)
+            override = overrides.get(p.id, {})
+            if "latency" in override:
+                base["latency"] = {**base["latency"], **override["latency"]}
+            profiles[p.id] = Profile(**{**base, **{k: v for k, v in override.items() if k != "latency"}})
+        return cls(profiles, seed, time_scale)
+
+    def outcome(self, provider_id: str, n: int) -> Outcome:
+        """What the `n`-th request (1-based) to `provider_id` does, ignoring the rate limit; pure."""
+        profile = self.profiles[provider_id]
+        rng = random.Random(f"{self.seed}:{provider_id}:{n}")
+        latency = profile.latency.sample(rng)
+        error_rate = profile.error_rate
+        for incident in profile.incidents:
+            if incident.from_request <= n <= incident.to_request:
+                latency *= incident.latency_multiplier
+                if incident.error_rate is not None:
+                    error_rate = incident.error_rate
+        status = profile.error_status if rng.random() < error_rate else 200
+        size = max(0, int(profile.payload_bytes * (1 + rng.uniform(-profile.payload_spread, profile.payload_spread))))
+        return Outcome(latency, status, size)
+
+    def _retry_after(self, provider_id: str, profile: Profile, now: float) -> int:
+        """0 when the provider's own limit admits a request at virtual time `now`, else seconds to wait."""
+        if not profile.rate_limit_per_min:
+            return 0
+        rate = profile.rate_limit_per_min / 60.0
+        capacity = float(profile.burst or profile.rate_limit_per_min)
+        bucket = self._buckets.setdefault(provider_id, [capacity, now])
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return max(1, math.ceil((1 - bucket[0]) / rate))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        provider_id = scope["path"].strip("/").split("/", 1)[0]
+        profile = self.profiles.get(provider_id)
+        if profile is None:
+            await self._send(send, 404, dumps({"error": "not_found", "message": f"No simulated provider '{provider_id}'"}))
+            return
+        n = self._requests[provider_id] = self._requests.get(provider_id, 0) + 1
+        outcome = self.outcome(provider_id, n)
+        latency_ms = min(outcome.latency_ms, profile.health_latency_ms) if scope["method"] == "GET" else outcome.latency_ms
+        now = self._clocks.get(provider_id, 0.0)
+        self._clocks[provider_id] = now + latency_ms / 1000
+        retry_after = self._retry_after(provider_id, profile, now)
+        if retry_after:
+            await self._send(send, 429, dumps({"error": "rate_limited"}), [(b"retry-after", str(retry_after).encode())])
+            return
+        await asyncio.sleep(latency_ms / 1000 * self.time_scale)
+        headers = [(b"x-simulated-latency-ms", b"%.1f" % latency_ms), (b"x-simulated-request", str(n).encode())]
+        if outcome.status != 200:
+            await self._send(send, outcome.status, dumps({"error": "simulated_failure", "request": n}), headers)
+        elif scope["method"] == "GET":
+            await self._send(send, 200, b'{"ok":true}', headers)
+        else:
+            await self._send(send, 200, bytes(outcome.size), headers, b"application/octet-stream")
+
+    @staticmethod
+    async def _send(send: Send, status: int, body: bytes, headers: List = (), content_type: bytes = b"application/json") -> None:
+        headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *headers]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def transport(self) -> httpx.AsyncBaseTransport:
+        """An httpx transport that answers every request in-process, whatever the host."""
+        return httpx.ASGITransport(app=self)
+
+
+def load_overrides(path: Path | None) -> Dict[str, Dict[str, Any]]:
+    if path is None:
+        return {}
+    with Path(path).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache
+def get_simulator() -> Simulator | None:
+    """The in-process simulator when SIMULATOR_ENABLED, else None."""
+    settings = get_settings()
+    if not settings.SIMULATOR_ENABLED:
+        return None
+    return Simulator.from_catalog(
+        get_provider_catalog().snapshot,
+        load_overrides(settings.SIMULATOR_PROFILES_FILE),
+        seed=settings.SIMULATOR_SEED,
+        time_scale=settings.SIMULATOR_TIME_SCALE,
+    )
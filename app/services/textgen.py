@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Protocol, Tuple
+
+import httpx
+
+from ..config import get_settings
+from ..exceptions import NoProviderAvailableException
+from .health import HealthMonitor, get_health_monitor
+from .routing import ProviderRouter, get_provider_router
+
+logger = logging.getLogger("potterlabs.textgen")
+
+SCRIPT_PROMPT = (
+    "Rewrite the input below as a narration script for a short video. Keep its facts and order, "
+    "write plain sentences without markup, and separate sections with one blank line.\n\nINPUT:\n"
+)
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TextGenBackend(Protocol):
+    """Streams a completion for a prompt as text deltas."""
+
+    def stream(self, prompt: str) -> AsyncIterator[str]: ...
+
+
+class FakeTextGenBackend(TextGenBackend):
+    """Echoes the input part of the prompt back a word at a time, `delay` seconds apart; for tests and local runs."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        text = prompt.split("INPUT:\n", 1)[-1]
+        for token in re.findall(r"\S+\s*", text):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield token
+
+
+class OpenRouterBackend(TextGenBackend):
+    """OpenAI-style streaming chat completions (`stream: true`, server-sent events), as served by OpenRouter."""
+
+    def __init__(self, base_url: str, api_key: str | None, model: str, timeout: float = 60.0, transport: httpx.AsyncBaseTransport | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.transport = transport
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        body = {"model": self.model, "stream": True, "messages": [{"role": "user", "content": prompt}]}
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        async with httpx.AsyncClient(transport=self.transport, timeout=self.timeout) as client:
+            async with client.stream("POST", f"{self.base_url}/chat/completions", json=body, headers=headers) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue  # blank separators and ": keep-alive" comments
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        return
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+
+
+class TextGenerator:
+    """Streams completions from the best available text-gen provider that has a backend.
+
+    Providers are tried in the router's order until one produces its first
+    delta; after that the stream is committed to that provider, so a failure
+    mid-stream ends the stream rather than restarting it elsewhere. The time
+    to first delta is what gets recorded with the health monitor, and a
+    failure mid-stream is recorded too.
+    """
+
+    def __init__(self, backends: Dict[str, TextGenBackend], router: ProviderRouter, health: HealthMonitor):
+        self.backends = backends
+        self._router = router
+        self._health = health
+
+    async def open(self, prompt: str) -> Tuple[str, AsyncIterator[str]]:
+        """`(provider id, deltas)` from the first provider that starts streaming; raises NoProviderAvailableException."""
+        errors: List[str] = []
+        for pid in self._router.rank("text-gen"):
+            backend = self.backends.get(pid)
+            if backend is None:
+                continue
+            deltas = backend.stream(prompt).__aiter__()
+            started = time.perf_counter()
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = ""
+            except Exception as exc:  # noqa: BLE001 - any upstream failure moves on to the next provider
+                self._health.record(pid, False, (time.perf_counter() - started) * 1000)
+                logger.warning("text-gen stream from provider %s failed to start: %r", pid, exc)
+                errors.append(f"{pid}: {exc!r}")
+                continue
+            self._health.record(pid, True, (time.perf_counter() - started) * 1000)
+            return pid, self._follow(pid, first, deltas)
+        raise NoProviderAvailableException("text-gen", errors)
+
+    async def _follow(self, pid: str, first: str, rest: AsyncIterator[str]) -> AsyncIterator[str]:
+        if first:
+            yield first
+        started = time.perf_counter()
+        try:
+            async for delta in rest:
+                yield delta
+                started = time.perf_counter()
+        except Exception:
+            self._health.record(pid, False, (time.perf_counter() - started) * 1000)
+            raise
+
+
+def _split(text: str, segment: str) -> List[str]:
+    if segment == "none":
+        return [text]
+    parts = _PARAGRAPH.split(text)
+    if segment == "sentence":
+        parts = [s for p in parts for s in _SENTENCE.split(p)]
+    return parts
+
+
+async def stream_sections(deltas: AsyncIterator[str], segment: str = "section", normalize: bool = True) -> AsyncIterator[Tuple[str, str]]:
+    """Groups streamed text into script sections: yields `("delta", text)` as text arrives, `("section", text)` as each section completes.
+
+    A section is complete once the text after it has started; the last one when the stream ends.
+    """
+    buffer = ""
+    async for delta in deltas:
+        yield "delta", delta
+        buffer += delta
+        parts = _split(buffer, segment)
+        for part in parts[:-1]:
+            if part.strip():
+                yield "section", _clean(part, normalize)
+        buffer = parts[-1]
+    if buffer.strip():
+        yield "section", _clean(buffer, normalize)
+
+
+def _clean(text: str, normalize: bool) -> str:
+    return _WHITESPACE.sub(" ", text).strip() if normalize else text.strip("\n")
+
+
+def script_prompt(script_input: Dict[str, Any]) -> str:
+    if script_input.get("type") == "json":
+        source = json.dumps(script_input.get("json") or {}, ensure_ascii=False, indent=2)
+    else:
+        source = script_input.get("text") or ""
+    return SCRIPT_PROMPT + source
+
+
+@lru_cache
+def get_text_generator() -> TextGenerator:
+    settings = get_settings()
+    if settings.TEXTGEN_BACKEND == "openrouter":
+        backend: TextGenBackend = OpenRouterBackend(settings.OPENROUTER_BASE_URL, settings.OPENROUTER_API_KEY, settings.TEXTGEN_MODEL, settings.TEXTGEN_TIMEOUT_SEC)
+    elif settings.TEXTGEN_BACKEND == "fake":
+        backend = FakeTextGenBackend(settings.TEXTGEN_FAKE_DELAY_SEC)
+    else:
+        raise ValueError(f"Unknown TEXTGEN_BACKEND '{settings.TEXTGEN_BACKEND}' (expected 'openrouter' or 'fake')")
+    return TextGenerator({"openrouter": backend}, get_provider_router(), get_health_monitor())
@@ -0,0 +1,425 @@
+"""Slideshow video timelines, planned with NumPy.
+
+A plan places each slide on the narration's timeline, then describes the
+video frame by frame at the requested fps: which slide is on screen, how far
+it has crossfaded into the next one, and the gain of the background music
+under the voiceover. Every per-frame quantity is computed with whole-array
+operations (no Python loop over frames), so a 10-minute 60 fps video, 36,000
+frames, plans in milliseconds. The renderer loads the arrays straight from the
+plan's `.npz`.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import re
+import wave
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from .assets import AssetStore, get_asset_store
+from .jobs import Job, JobEngine, get_job_engine
+from .resources import ResourceStore, get_resource_store
+
+logger = logging.getLogger("potterlabs.timeline")
+
+# SlideshowVideoCreate `options` defaults, as in the schema.
+DEFAULT_OPTIONS: Dict[str, Any] = {
+    "transition": "crossfade",
+    "transition_sec": 0.5,
+    "fps": 30,
+    "captions": {"mode": "burn-in"},
+    "ducking": {"enabled": True, "threshold_db": -12.0, "attack_ms": 120, "release_ms": 300},
+}
+# Bounds on a plan, as in the SlideshowVideoCreate schema for fps; with them a plan's per-frame arrays stay bounded.
+MAX_FPS = 120
+MAX_DURATION_SEC = 4 * 3600.0
+# How far the music drops while the voice is above the ducking threshold.
+DUCKING_DEPTH_DB = -15.0
+# Slide length when neither the voiceover nor the slideshow says how long slides last.
+DEFAULT_SLIDE_SEC = 4.0
+# Levels below this are treated as silence (about the floor of 16-bit audio).
+_SILENCE_DB = -100.0
+
+# Sample types of PCM WAV by sample width in bytes (8-bit PCM is unsigned).
+_PCM_TYPES = {1: np.dtype("u1"), 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+_ASSET_CONTENT_URL = re.compile(r"/v1/assets/(ast_[0-9a-f]+)/content$")
+
+
+class TimelinePlan(NamedTuple):
+    """A slideshow video, frame by frame.
+
+    `slide[f]` is the slide on screen at frame `f` (the outgoing one during a
+    crossfade) and `mix[f]` the weight of slide `slide[f] + 1` blended over it,
+    0 outside transitions. `music_gain[f]` is the linear gain of the music.
+    """
+
+    fps: int
+    slide_start: np.ndarray  # float64 seconds, per slide
+    slide_duration: np.ndarray  # float64 seconds, per slide
+    slide: np.ndarray  # uint16 (uint32 beyond 65,535 slides), per frame
+    mix: np.ndarray  # float32, per frame
+    music_gain: np.ndarray  # float32, per frame
+
+    @property
+    def frames(self) -> int:
+        return len(self.slide)
+
+    @property
+    def duration_sec(self) -> float:
+        return self.frames / self.fps
+
+    def to_npz(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, fps=np.int32(self.fps), **{k: getattr(self, k) for k in self._fields if k != "fps"})
+        return buffer.getvalue()
+
+
+def segment_starts(marker_times: Sequence[float], duration_sec: float) -> np.ndarray:
+    """Start of each voiceover segment (one per marker), clipped to the narration and kept in order."""
+    starts = np.clip(np.asarray(marker_times, dtype=np.float64), 0.0, duration_sec)
+    return np.maximum.accumulate(starts) if len(starts) else starts
+
+
+def align_slides(slide_segments: Sequence[int], starts: np.ndarray, duration_sec: float) -> Tuple[np.ndarray, np.ndarray]:
+    """`(start, duration)` of each slide when slides follow the voiceover segments they illustrate.
+
+    `slide_segments[i]` is the segment slide `i` belongs to, or -1 when unknown;
+    an unknown slide stays with the slide before it. Consecutive slides of a
+    segment share its time equally. A segment no slide illustrates is covered
+    by the slides before it, so together the slides always span the whole
+    narration. Without any known segment, slides split it evenly.
+    """
+    seg = np.asarray(slide_segments, dtype=np.int64)
+    n = len(seg)
+    if n == 0:
+        return np.zeros(0), np.zeros(0)
+    known = (seg >= 0) & (seg < len(starts))
+    if not known.any():
+        per = duration_sec / n
+        return np.arange(n) * per, np.full(n, per)
+    # Forward-fill unknowns (leading ones join the first known segment); slides cannot go back in time.
+    last_known = np.maximum.accumulate(np.where(known, np.arange(n), -1))
+    seg = np.where(last_known >= 0, seg[np.maximum(last_known, 0)], seg[known][0])
+    seg = np.maximum.accumulate(seg)
+
+    group_first = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+    group_start = starts[seg[group_first]]
+    group_start[0] = 0.0
+    group_end = np.append(group_start[1:], duration_sec)
+    counts = np.diff(np.append(group_first, n))
+    group = np.repeat(np.arange(len(group_first)), counts)
+    per = (group_end - group_start) / counts
+    rank = np.arange(n) - group_first[group]
+    return group_start[group] + rank * per[group], per[group]
+
+
+def frame_timeline(slide_start: np.ndarray, slide_duration: np.ndarray, fps: int, transition: str = "crossfade", transition_sec: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame `(slide, mix)` at `fps`, sampling each frame at its midpoint.
+
+    A crossfade is centred on the cut between two slides, so each slide keeps
+    its on-screen time; it is shortened where a slide is too short to hold
+    both its crossfades in full.
+    """
+    n_slides = len(slide_start)
+    slide_end = slide_start + slide_duration
+    n_frames = int(np.ceil(slide_end[-1] * fps - 1e-9)) if n_slides else 0
+    t = (np.arange(n_frames) + 0.5) / fps
+    current = np.minimum(np.searchsorted(slide_end[:-1], t, side="right"), max(n_slides - 1, 0))
+    index_type = np.uint16 if n_slides <= 0xFFFF else np.uint32
+    if transition != "crossfade" or transition_sec <= 0 or n_slides < 2:
+        return current.astype(index_type), np.zeros(n_frames, dtype=np.float32)
+
+    # half[k]: half-width of the crossfade from slide k to k + 1.
+    half = np.minimum(transition_sec / 2, np.minimum(slide_duration[:-1], slide_duration[1:]) / 2)
+    since = t - slide_start[current]  # time since the cut into the current slide
+    until = slide_end[current] - t  # time left until the cut out of it
+    half_in = half[np.maximum(current - 1, 0)]
+    half_out = half[np.minimum(current, n_slides - 2)]
+    fading_in = (current > 0) & (since < half_in)
+    fading_out = (current < n_slides - 1) & (until < half_out) & ~fading_in
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mix = np.where(fading_in, 0.5 + since / (2 * half_in), np.where(fading_out, 0.5 - until / (2 * half_out), 0.0))
+    slide = np.where(fading_in, current - 1, current)
+    return slide.astype(index_type), mix.astype(np.float32)
+
+
+def rms_db(chunks: Iterable[np.ndarray], sample_rate: int, fps: int, n_frames: int) -> np.ndarray:
+    """RMS level (dBFS, samples in [-1, 1]) of the audio under each video frame; silence past its end.
+
+    `chunks` are consecutive runs of mono samples; energy is accumulated per
+    frame one chunk at a time, so memory is bounded by the largest chunk.
+    """
+    energy = np.zeros(n_frames)
+    counts = np.zeros(n_frames, dtype=np.int64)
+    offset = 0
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        # Sample i falls under video frame floor(i * fps / sample_rate); split the chunk where frames change.
+        first = offset * fps // sample_rate
+        last = min((offset + len(chunk) - 1) * fps // sample_rate, n_frames - 1)
+        if first >= n_frames:
+            break
+        frame_starts = -(-np.arange(first + 1, last + 2, dtype=np.int64) * sample_rate // fps) - offset
+        edges = np.minimum(np.r_[0, frame_starts], len(chunk))
+        energy[first:last + 1] += np.add.reduceat(np.square(chunk[:edges[-1]], dtype=np.float64), edges[:-1])
+        counts[first:last + 1] += np.diff(edges)
+        offset += len(chunk)
+    level = np.full(n_frames, _SILENCE_DB, dtype=np.float32)
+    filled = counts > 0
+    rms = np.sqrt(energy[filled] / counts[filled])
+    level[filled] = 20 * np.log10(np.maximum(rms, 10 ** (_SILENCE_DB / 20)))
+    return level
+
+
+def ducking_gain(voice_db: np.ndarray, fps: int, threshold_db: float, attack_ms: float, release_ms: float, depth_db: float = DUCKING_DEPTH_DB) -> np.ndarray:
+    """Linear music gain per frame: `depth_db` down wherever the voice is above `threshold_db`.
+
+    The music ramps down over `attack_ms` before the voice crosses the
+    threshold (the whole voice track is known ahead of rendering, so the duck
+    can look ahead) and back up over `release_ms` after it drops below. Ramps
+    are linear in dB and computed from each frame's distance to the nearest
+    loud frame, which keeps the whole envelope vectorized.
+    """
+    loud = voice_db > threshold_db
+    n = len(loud)
+    if not loud.any():
+        return np.ones(n, dtype=np.float32)
+    index = np.arange(n)
+    previous_loud = np.maximum.accumulate(np.where(loud, index, -n - 1))
+    next_loud = np.minimum.accumulate(np.where(loud, index, 2 * n + 1)[::-1])[::-1]
+    release = max(release_ms * fps / 1000, 1e-9)
+    attack = max(attack_ms * fps / 1000, 1e-9)
+    duck = np.maximum(np.clip(1 - (index - previous_loud) / release, 0, 1), np.clip(1 - (next_loud - index) / attack, 0, 1))
+    return (10 ** (depth_db * duck / 20)).astype(np.float32)
+
+
+def webvtt(slide_start: np.ndarray, slide_duration: np.ndarray, captions: Sequence[str | None]) -> str:
+    """A WebVTT sidecar with one cue per captioned slide."""
+
+    def stamp(seconds: float) -> str:
+        ms = int(round(seconds * 1000))
+        return f"{ms // 3_600_000:02d}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+    cues = [
+        f"{stamp(start)} --> {stamp(start + duration)}\n{caption}"
+        for start, duration, caption in zip(slide_start.tolist(), slide_duration.tolist(), captions)
+        if caption
+    ]
+    return "WEBVTT\n\n" + "\n\n".join(cues) + ("\n" if cues else "")
+
+
+def _options(options: Dict[str, Any] | None) -> Dict[str, Any]:
+    """`options` over the defaults; raises ValueError for an fps outside 1..MAX_FPS."""
+    options = options or {}
+    merged = {**DEFAULT_OPTIONS, **options}
+    for nested in ("captions", "ducking"):
+        merged[nested] = {**DEFAULT_OPTIONS[nested], **(options.get(nested) or {})}
+    if not 1 <= merged["fps"] <= MAX_FPS:
+        raise ValueError(f"fps must be between 1 and {MAX_FPS}, not {merged['fps']}")
+    return merged
+
+
+def slideshow_slides(create: Dict[str, Any], beats: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The slides of a SlideshowCreate body over its `beats` (BeatItems).
+
+    Each beat gets `per_beat` slides captioned per `caption_strategy` and
+    showing the `prefer_asset_ids` in turn, each `per_slide_sec` long; the
+    planner retimes them to the voiceover when there is one.
+    """
+    images = create.get("image_strategy") or {}
+    captions = create.get("caption_strategy") or {}
+    source, max_chars = captions.get("source", "beat_summary"), captions.get("max_chars", 120)
+    per_slide = float((create.get("timing_strategy") or {}).get("per_slide_sec") or DEFAULT_SLIDE_SEC)
+    assets = images.get("prefer_asset_ids") or []
+    slides: List[Dict[str, Any]] = []
+    for beat in beats:
+        if source == "none":
+            caption = None
+        elif source == "beat_title":
+            caption = beat.get("title")
+        else:  # beat_summary, and section_excerpt until sections carry text
+            caption = beat.get("summary") or beat.get("title")
+        for _ in range(max(1, images.get("per_beat", 1))):
+            asset_id = assets[len(slides) % len(assets)] if assets else None
+            slides.append({
+                "id": f"sl_{len(slides) + 1}",
+                "beat_id": beat.get("id"),
+                "section_id": beat.get("section_id"),
+                "image": {"asset_id": asset_id, "url": f"/v1/assets/{asset_id}/content" if asset_id else None},
+                "caption": caption[:max_chars] if caption else None,
+                "start_sec": round(len(slides) * per_slide, 3),
+                "duration_sec": per_slide,
+            })
+    return slides
+
+
+def plan_timeline(
+    slide_start: np.ndarray,
+    slide_duration: np.ndarray,
+    options: Dict[str, Any] | None = None,
+    voice: Tuple[Iterable[np.ndarray], int] | None = None,
+    voice_duration_sec: float | None = None,
+    voice_db: np.ndarray | None = None,
+) -> TimelinePlan:
+    """The frame plan for slides placed at `slide_start`/`slide_duration`, with SlideshowVideoCreate `options`.
+
+    `voice` is the narration as `(chunks of mono samples in [-1, 1], sample rate)`,
+    or `voice_db` its per-frame levels at the same fps, as from `voice_levels`.
+    Without either, the voice counts as loud for its first `voice_duration_sec`
+    seconds (the whole video if unknown), so the music ducks under all of it.
+    """
+    options = _options(options)
+    fps = int(options["fps"])
+    if len(slide_start) and slide_start[-1] + slide_duration[-1] > MAX_DURATION_SEC:
+        raise ValueError(f"Video would last {slide_start[-1] + slide_duration[-1]:.0f} s, over the {MAX_DURATION_SEC:.0f} s limit")
+    slide, mix = frame_timeline(slide_start, slide_duration, fps, options["transition"], float(options["transition_sec"]))
+    ducking = options["ducking"]
+    if not ducking["enabled"]:
+        gain = np.ones(len(slide), dtype=np.float32)
+    else:
+        if voice_db is not None:
+            levels = np.full(len(slide), _SILENCE_DB, dtype=np.float32)
+            levels[:len(voice_db)] = voice_db[:len(slide)]
+            voice_db = levels
+        elif voice is not None:
+            voice_db = rms_db(voice[0], voice[1], fps, len(slide))
+        else:
+            spoken = len(slide) if voice_duration_sec is None else int(np.ceil(voice_duration_sec * fps))
+            voice_db = np.where(np.arange(len(slide)) < spoken, 0.0, _SILENCE_DB)
+        gain = ducking_gain(voice_db, fps, float(ducking["threshold_db"]), float(ducking["attack_ms"]), float(ducking["release_ms"]))
+    return TimelinePlan(fps, slide_start, slide_duration, slide, mix, gain)
+
+
+def wav_format(path: Path) -> Tuple[int, float]:
+    """Sample rate and duration of a PCM WAV file, checking that `wav_chunks` can decode it."""
+    with wave.open(str(path), "rb") as w:
+        if w.getsampwidth() not in _PCM_TYPES:
+            raise ValueError(f"Unsupported WAV sample width: {w.getsampwidth() * 8} bits")
+        return w.getframerate(), w.getnframes() / w.getframerate()
+
+
+def wav_chunks(path: Path, chunk_frames: int = 1 << 16) -> Iterator[np.ndarray]:
+    """Mono float32 samples of an 8/16/32-bit PCM WAV file, `chunk_frames` at a time."""
+    with wave.open(str(path), "rb") as w:
+        dtype, channels = _PCM_TYPES[w.getsampwidth()], w.getnchannels()
+        while raw := w.readframes(chunk_frames):
+            samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+            samples = (samples - 128) / 128 if dtype.kind == "u" else samples / np.iinfo(dtype).max
+            yield samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples
+
+
+def voice_levels(source: Path, target: Path, fps: int) -> None:
+    """Writes the per-frame levels of WAV `source` at `fps` to `target` as raw float32; an asset rendition builder."""
+    rate, duration = wav_format(source)
+    rms_db(wav_chunks(source), rate, fps, int(np.ceil(duration * fps))).tofile(target)
+
+
+class SlideshowVideoPlanner:
+    """`slideshow-videos` job executor: plans the video's timeline from the slideshow and its voiceover.
+
+    Slides are timed, in order of preference: by the voiceover's section
+    markers (for slides that carry a `section_id`), spread over the
+    voiceover's duration, or by their own `duration_sec`. The plan's arrays
+    are stored as an `.npz` asset, plus a WebVTT asset for sidecar captions.
+    The voiceover's audio is read for ducking when its artifact is a WAV
+    asset of this API; otherwise the music ducks for the voiceover's length.
+    Its levels are kept as a rendition of the asset per fps, so videos that
+    reuse a voiceover do not decode it again. The job fails when the
+    slideshow does not exist or has no slides, or its options are out of
+    bounds.
+    """
+
+    def __init__(self, resources: ResourceStore, jobs: JobEngine, assets: AssetStore):
+        self._resources = resources
+        self._jobs = jobs
+        self._assets = assets
+
+    async def run_job(self, job: Job) -> Dict[str, Any]:
+        payload = job.payload
+        slideshow_id = payload["slideshow_id"]
+        body = self._resources.get("slideshows", slideshow_id)
+        if body is None:
+            raise LookupError(f"Slideshow '{slideshow_id}' not found")
+        slides: List[Dict[str, Any]] = json.loads(body).get("slides") or []
+        if not slides:
+            raise ValueError(f"Slideshow '{slideshow_id}' has no slides to plan")
+        _options(payload.get("options"))  # out-of-range options fail the job before any audio is read
+        voiceover = self._jobs.get(payload["voiceover_id"], "voiceovers")
+        result = voiceover.result if voiceover is not None else {}
+        artifact = result.get("artifact") or {}
+        voice = await self._voice(artifact.get("url"))
+        voice_duration = artifact.get("duration_sec") or (voice[1] if voice is not None else None)
+        options = payload.get("options") or {}
+        voice_db = None
+        if voice is not None and _options(options)["ducking"]["enabled"]:
+            fps = int(_options(options)["fps"])
+            levels = await self._assets.rendition(voice[0], f"levels-{fps}fps", partial(voice_levels, fps=fps))
+            voice_db = await asyncio.to_thread(np.fromfile, levels, np.float32)
+
+        def plan() -> Tuple[TimelinePlan, str | None]:
+            start, duration = self._slide_times(slides, result.get("markers") or [], voice_duration)
+            timeline = plan_timeline(start, duration, options, voice_duration_sec=voice_duration, voice_db=voice_db)
+            sidecar = webvtt(start, duration, [s.get("caption") for s in slides]) if _options(options)["captions"]["mode"] == "sidecar" else None
+            return timeline, sidecar
+
+        timeline, sidecar = await asyncio.to_thread(plan)
+        view: Dict[str, Any] = {
+            "tracks": {"voiceover": {"id": payload["voiceover_id"], "start_sec": 0.0}},
+            "timeline": {
+                "url": await self._store(f"{job.id}.timeline.npz", "application/octet-stream", timeline.to_npz()),
+                "fps": timeline.fps,
+                "frames": timeline.frames,
+                "duration_sec": round(timeline.duration_sec, 3),
+                "slides": len(slides),
+            },
+            "links": {"self": f"/v1/slideshow-videos/{job.id}", "clips": None},
+        }
+        if payload.get("music_id"):
+            view["tracks"]["music"] = {"id": payload["music_id"], "start_sec": 0.0}
+        if sidecar is not None:
+            view["timeline"]["captions_url"] = await self._store(f"{job.id}.captions.vtt", "text/vtt", sidecar.encode("utf-8"))
+        return view
+
+    @staticmethod
+    def _slide_times(slides: List[Dict[str, Any]], markers: List[Dict[str, Any]], voice_duration: float | None) -> Tuple[np.ndarray, np.ndarray]:
+        if voice_duration:
+            segment_of = {m.get("section_id"): i for i, m in enumerate(markers)}
+            starts = segment_starts([m.get("time_sec", 0.0) for m in markers], voice_duration)
+            return align_slides([segment_of.get(s.get("section_id"), -1) for s in slides], starts, voice_duration)
+        duration = np.array([s.get("duration_sec") or DEFAULT_SLIDE_SEC for s in slides], dtype=np.float64)
+        return np.concatenate(([0.0], np.cumsum(duration)[:-1])), duration
+
+    async def _voice(self, url: str | None) -> Tuple[str, float] | None:
+        """Asset id and duration of the voiceover audio, when it is a readable WAV asset."""
+        match = _ASSET_CONTENT_URL.search(url or "")
+        asset = self._assets.get(match.group(1)) if match else None
+        if asset is None or asset.get("status") != "ready" or asset.get("mime") not in ("audio/wav", "audio/x-wav", "audio/wave"):
+            return None
+        path = self._assets.content_path(asset["id"])
+        try:
+            return asset["id"], (await asyncio.to_thread(wav_format, path))[1]
+        except (wave.Error, ValueError, EOFError):
+            logger.warning("Voiceover audio %s is not readable PCM WAV; ducking for its duration instead", asset["id"], exc_info=True)
+            return None
+
+    async def _store(self, filename: str, mime: str, data: bytes) -> str:
+        asset = self._assets.create(filename, mime, len(data))
+
+        async def chunks():
+            yield data
+
+        await self._assets.ingest(asset["id"], chunks())
+        return f"/v1/assets/{asset['id']}/content"
+
+
+@lru_cache
+def get_slideshow_video_planner() -> SlideshowVideoPlanner:
+    return SlideshowVideoPlanner(get_resource_store(), get_job_engine(), get_asset_store())
@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Collection, Dict, List, NamedTuple, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..config import get_settings
+from ..utils.common import dumps
+from ..utils.sqlite import Database
+
+logger = logging.getLogger("potterlabs.webhooks")
+
+SIGNATURE_HEADER = "Potterlabs-Signature"
+DELIVERY_HEADER = "Potterlabs-Delivery"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+def _not_in(column: str, values: Collection[str]) -> str:
+    return f" AND {column} NOT IN ({','.join('?' * len(values))})" if values else ""
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """`t=<unix>,v1=<hex HMAC-SHA256 of "<unix>.<body>">`; receivers recompute and compare."""
+    digest = hmac.new(secret.encode("utf-8"), b"%d." % timestamp + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+class Delivery(NamedTuple):
+    id: int
+    url: str
+    secret: str
+    event: bytes
+    attempts: int
+
+
+class WebhookStore:
+    """Pending deliveries on disk, so retries survive a restart.
+
+    Several workers can share one file. A worker claims due rows atomically,
+    marking them `sending` under its own `claimed_by` with a lease of
+    `claim_ttl` seconds, and only its own claims are settled by `delivered`
+    and `failed`. Rows left `sending` by a worker that died are claimed
+    again once their lease runs out; live workers' sends are never taken.
+    Claims can pass over busy receiver hosts, so their rows stay `pending`
+    rather than sit claimed behind the host's in-flight sends.
+    """
+
+    def __init__(self, path: Path | str, claim_ttl: float = 120.0):
+        self._lock = threading.Lock()
+        self._conn = Database(
+            path,
+            (
+                "CREATE TABLE IF NOT EXISTS webhook_deliveries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, secret TEXT NOT NULL, event BLOB NOT NULL,"
+                " state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL, last_error TEXT, claimed_by TEXT, lease_until REAL, host TEXT)",
+                "CREATE INDEX IF NOT EXISTS webhook_due ON webhook_deliveries (state, next_attempt_at)",
+            ),
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(webhook_deliveries)")}
+        for column, kind in (("claimed_by", "TEXT"), ("lease_until", "REAL"), ("host", "TEXT")):  # tables from before leases
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE webhook_deliveries ADD COLUMN {column} {kind}")
+        if "host" not in columns:
+            urls = [row[0] for row in self._conn.execute("SELECT DISTINCT url FROM webhook_deliveries")]
+            self._conn.executemany("UPDATE webhook_deliveries SET host = ? WHERE url = ?", [(_host(url), url) for url in urls])
+        self._claim_ttl = claim_ttl
+        self._owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+    def add(self, url: str, secret: str, event: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO webhook_deliveries (url, secret, event, next_attempt_at, host) VALUES (?, ?, ?, ?, ?)",
+                (url, secret, event, time.time(), _host(url)),
+            )
+
+    def claim_due(self, limit: int, skip_hosts: Collection[str] = ()) -> List[Delivery]:
+        """Claims up to `limit` due deliveries, and sends whose lease expired, for this store; none to `skip_hosts`."""
+        skip = _not_in("host", skip_hosts)
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "UPDATE webhook_deliveries SET state = 'sending', claimed_by = ?, lease_until = ? WHERE id IN ("
+                    " SELECT id FROM webhook_deliveries WHERE ((state = 'pending' AND next_attempt_at <= ?)"
+                    f" OR (state = 'sending' AND COALESCE(lease_until, 0) <= ?)){skip} ORDER BY next_attempt_at LIMIT ?"
+                    ") RETURNING id, url, secret, event, attempts",
+                    (self._owner, now + self._claim_ttl, now, now, *skip_hosts, limit),
+                ).fetchall()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        rows.sort()
+        return [Delivery(id, url, secret, bytes(event), attempts) for id, url, secret, event, attempts in rows]
+
+    def renew(self, ids: List[int]) -> List[int]:
+        """Extends this store's claim on `ids` by another `claim_ttl`; returns the ids it still holds."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"UPDATE webhook_deliveries SET lease_until = ? WHERE id IN ({','.join('?' * len(ids))}) AND claimed_by = ?"
+                " AND state = 'sending' RETURNING id",
+                (time.time() + self._claim_ttl, *ids, self._owner),
+            ).fetchall()
+        held = {row[0] for row in rows}
+        return [i for i in ids if i in held]
+
+    def next_due_in(self, skip_hosts: Collection[str] = ()) -> float | None:
+        with self._lock:
+            (due,) = self._conn.execute(
+                "SELECT MIN(CASE state WHEN 'pending' THEN next_attempt_at ELSE COALESCE(lease_until, 0) END)"
+                f" FROM webhook_deliveries WHERE state IN ('pending', 'sending'){_not_in('host', skip_hosts)}",
+                tuple(skip_hosts),
+            ).fetchone()
+        return None if due is None else max(0.0, due - time.time())
+
+    def delivered(self, ids: List[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM webhook_deliveries WHERE id = ? AND claimed_by = ?", [(i, self._owner) for i in ids])
+
+    def failed(self, ids: List[int], error: str, retry_in: float | None) -> None:
+        with self._lock:
+            if retry_in is None:
+                self._conn.executemany(
+                    "UPDATE webhook_deliveries SET state = 'dead', attempts = attempts + 1, last_error = ?, claimed_by = NULL"
+                    " WHERE id = ? AND claimed_by = ?",
+                    [(error, i, self._owner) for i in ids],
+                )
+            else:
+                self._conn.executemany(
+                    "UPDATE webhook_deliveries SET state = 'pending', attempts = attempts + 1, last_error = ?,"
+                    " next_attempt_at = ?, claimed_by = NULL, lease_until = NULL WHERE id = ? AND claimed_by = ?",
+                    [(error, time.time() + retry_in, i, self._owner) for i in ids],
+                )
+
+    def release(self, ids: List[int]) -> None:
+        """Hands this store's claim on `ids` back untried, leaving them due."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE webhook_deliveries SET state = 'pending', claimed_by = NULL, lease_until = NULL WHERE id = ? AND claimed_by = ?",
+                [(i, self._owner) for i in ids],
+            )
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM webhook_deliveries GROUP BY state").fetchall())
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class WebhookDispatcher:
+    """Delivers signed webhook events over one pooled `httpx.AsyncClient`.
+
+    - Dispatch is continuous: each send runs on its own, and claims are
+      refilled as sends finish, up to `max_inflight` at once. A host with
+      `max_per_host` sends in flight gets no more claims until one settles,
+      so a slow or dead receiver only holds up its own deliveries.
+    - Failures (network errors, non-2xx) are retried with capped, jittered
+      exponential backoff. After `max_attempts` a delivery is parked as
+      `dead` in the store.
+    - With `batch_max > 1`, events due for the same URL and secret within
+      `batch_window` seconds go out as one `{"events": [...]}` POST.
+    """
+
+    def __init__(
+        self,
+        store: WebhookStore,
+        max_per_host: int = 8,
+        max_attempts: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 600.0,
+        batch_max: int = 1,
+        batch_window: float = 0.2,
+        timeout: float = 10.0,
+        max_inflight: int = 500,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.store = store
+        self._max_per_host = max_per_host
+        self._max_attempts = max_attempts
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._batch_max = max(1, batch_max)
+        self._batch_window = batch_window
+        self._timeout = timeout
+        self._max_inflight = max(1, max_inflight)
+        self._transport = transport
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._wake: asyncio.Event | None = None
+        self._runner: asyncio.Task | None = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: set[asyncio.Task] = set()
+        self._busy: Dict[str, int] = {}  # host -> sends in flight
+
+    def enqueue(self, url: str, secret: str, event: Dict[str, Any]) -> None:
+        self.store.add(url, secret, dumps(event))
+        try:
+            self._ensure_started()
+        except RuntimeError:
+            return  # no running loop; picked up when the dispatcher starts
+        assert self._wake is not None
+        self._wake.set()
+
+    def record_job(self, job: Any) -> None:
+        """Job engine listener: a `job.<status>` event to the job's webhook once it finishes."""
+        webhook = job.payload.get("webhook") if isinstance(job.payload, dict) else None
+        if not job.finished or not isinstance(webhook, dict) or not webhook.get("url"):
+            return
+        event = {"id": f"evt_{secrets.token_hex(8)}", "type": f"job.{job.status}", "created_at": _now(), "data": job.view()}
+        self.enqueue(webhook["url"], webhook.get("secret") or "", event)
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, *self._inflight, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = self._client = self._wake = self._runner = None
+        self._hosts.clear()
+        self._inflight.clear()
+        self._busy.clear()
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._client = httpx.AsyncClient(
+            timeout=self._timeout,
+            transport=self._transport,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=256),
+        )
+        self._wake = asyncio.Event()
+        self._hosts = {}
+        self._inflight = set()
+        self._busy = {}
+        self._runner = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            delay = None if len(self._inflight) >= self._max_inflight else self.store.next_due_in(self._busy_hosts())
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            if self._batch_max > 1 and self._batch_window > 0:
+                await asyncio.sleep(self._batch_window)
+            try:
+                self._fill(self._max_inflight - len(self._inflight))
+            except Exception:  # noqa: BLE001 - keep the dispatcher alive; rows stay on disk
+                logger.exception("Webhook dispatch pass failed")
+                await asyncio.sleep(1.0)
+
+    async def dispatch_due(self, limit: int = 500) -> None:
+        """Send what is due, up to `max_per_host` sends per host; returns once those sends have finished."""
+        self._ensure_started()
+        tasks = self._fill(limit)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _busy_hosts(self) -> List[str]:
+        return [host for host, sending in self._busy.items() if sending >= self._max_per_host]
+
+    def _fill(self, limit: int) -> List[asyncio.Task]:
+        """Claims up to `limit` due deliveries for hosts with free slots and starts their sends without waiting on them."""
+        if limit <= 0:
+            return []
+        due = self.store.claim_due(limit, self._busy_hosts())
+        groups: Dict[Tuple[str, str], List[Delivery]] = {}
+        for delivery in due:
+            groups.setdefault((delivery.url, delivery.secret), []).append(delivery)
+        tasks, surplus = [], []
+        for group in groups.values():
+            host = _host(group[0].url)
+            for i in range(0, len(group), self._batch_max):
+                batch = group[i:i + self._batch_max]
+                if self._busy.get(host, 0) >= self._max_per_host:
+                    surplus.extend(d.id for d in batch)  # the host filled up within this claim
+                    continue
+                task = asyncio.ensure_future(self._send(batch))
+                self._busy[host] = self._busy.get(host, 0) + 1
+                self._inflight.add(task)
+                task.add_done_callback(lambda task, host=host: self._settled(task, host))
+                tasks.append(task)
+        if surplus:
+            self.store.release(surplus)
+        return tasks
+
+    def _settled(self, task: asyncio.Task, host: str) -> None:
+        self._inflight.discard(task)
+        if host in self._busy:
+            self._busy[host] -= 1
+            if not self._busy[host]:
+                del self._busy[host]
+        if self._wake is not None:
+            self._wake.set()  # a slot is free; claim more
+
+    async def _send(self, batch: List[Delivery]) -> None:
+        assert self._client is not None
+        url, secret = batch[0].url, batch[0].secret
+        if self._batch_max > 1:
+            body = b'{"events":[' + b",".join(d.event for d in batch) + b"]}"
+        else:
+            body = batch[0].event
+        headers = {
+            "Content-Type": "application/json",
+            DELIVERY_HEADER: ",".join(str(d.id) for d in batch),
+        }
+        if secret:
+            headers[SIGNATURE_HEADER] = sign(secret, int(time.time()), body)
+
+        host = _host(url)
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self._max_per_host)
+        ids = [d.id for d in batch]
+        try:
+            async with semaphore:
+                # The claim may have aged while waiting for the host; renew it, and skip the send if it was taken over.
+                if len(self.store.renew(ids)) < len(ids):
+                    return
+                response = await self._client.post(url, content=body, headers=headers)
+            if 200 <= response.status_code < 300:
+                self.store.delivered(ids)
+                return
+            error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as exc:
+            error = f"{exc.__class__.__name__}: {exc}"
+
+        attempts = max(d.attempts for d in batch) + 1
+        if attempts >= self._max_attempts:
+            logger.warning("Webhook to %s failed permanently after %d attempts: %s", url, attempts, error)
+            self.store.failed(ids, error, None)
+        else:
+            backoff = min(self._backoff_max, self._backoff_base * (2 ** (attempts - 1)))
+            self.store.failed(ids, error, backoff * random.uniform(0.5, 1.0))
+
+
+@lru_cache
+def get_webhook_dispatcher() -> WebhookDispatcher:
+    settings = get_settings()
+    return WebhookDispatcher(
+        WebhookStore(settings.WEBHOOKS_SQLITE_PATH, claim_ttl=settings.WEBHOOK_CLAIM_TTL_SEC),
+        max_per_host=settings.WEBHOOK_MAX_PER_HOST,
+        max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+        backoff_base=settings.WEBHOOK_BACKOFF_BASE_SEC,
+        backoff_max=settings.WEBHOOK_BACKOFF_MAX_SEC,
+        batch_max=settings.WEBHOOK_BATCH_MAX,
+        batch_window=settings.WEBHOOK_BATCH_WINDOW_SEC,
+        timeout=settings.WEBHOOK_TIMEOUT_SEC,
+    )
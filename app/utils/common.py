@@ -1,8 +1,28 @@
 from __future__ import annotations
 
 import json
+import os
+import re
+import time
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
+from starlette.types import Receive, Scope, Send
+
+from . import stages
+
+try:  # Optional; FastAPI's standard extras ship it.
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+_EXAMPLE_SUFFIX = ".response.json"
+
+NDJSON = "application/x-ndjson"
 
 
 def _read_json(path: Path) -> Any:
@@ -11,7 +31,183 @@ def _read_json(path: Path) -> Any:
 
 
 def _maybe_example(name: str, examples_path: Path) -> Dict[str, Any] | None:
-    p = examples_path / f"{name}.response.json"
+    p = examples_path / f"{name}{_EXAMPLE_SUFFIX}"
     if p.exists():
         return _read_json(p)
     return None
+
+
+def load_examples(example_dirs: Iterable[Path]) -> Dict[str, Any]:
+    """Read every `<name>.response.json` under `example_dirs`, keyed by `<name>`."""
+    examples: Dict[str, Any] = {}
+    with stages.stage("example_io"):
+        for directory in example_dirs:
+            for path in sorted(directory.glob(f"*{_EXAMPLE_SUFFIX}")):
+                name = path.name[: -len(_EXAMPLE_SUFFIX)]
+                if name in examples:
+                    raise ValueError(f"Example '{name}' defined more than once ({path})")
+                examples[name] = _read_json(path)
+    return examples
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON bytes, via orjson when it is installed; timed as "serialize" while a stage recorder is active."""
+    record = stages.recorder()
+    if record is None:
+        return _dumps(value)
+    started = time.perf_counter()
+    try:
+        return _dumps(value)
+    finally:
+        record("serialize", time.perf_counter() - started)
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def process_alive(pid: int) -> bool:
+    """Whether process `pid` exists on this host (True for processes we may not signal)."""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def json_response_class(name: str) -> type[JSONResponse]:
+    """The app's default response class for routes that return plain data: "orjson" or "std"."""
+    if name == "orjson":
+        return ORJSONResponse if orjson is not None else JSONResponse
+    if name == "std":
+        return JSONResponse
+    raise ValueError(f"Unknown JSON_RESPONSE_CLASS '{name}' (expected 'orjson' or 'std')")
+
+
+def raw_json_response(body: bytes, status_code: int = 200) -> Response:
+    """Send already-encoded JSON as-is, skipping FastAPI's encoder."""
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match (RFC 9110 13.1.2).
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def conditional_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """Send pre-encoded JSON with an ETag, or a bodyless 304 if the client already has it."""
+    headers = {"ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _byte_range(header: str, size: int) -> Tuple[int, int] | None:
+    """The inclusive `(start, end)` of a single-range `Range` header, `(size, -1)` when unsatisfiable, None to send the whole file."""
+    match = _RANGE.match(header.strip())
+    if match is None:  # malformed or multiple ranges: a full response is allowed (RFC 9110 14.2)
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        suffix = int(last)
+        return (max(0, size - suffix), size - 1) if suffix and size else (size, -1)
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    return (start, end) if start < size else (size, -1)
+
+
+class RangeFileResponse(FileResponse):
+    """206 with bytes `start`..`end` (inclusive) of the file.
+
+    Sent with the `http.response.zerocopysend` extension (sendfile) when the
+    server offers it, else read and sent in `chunk_size` pieces. Uvicorn
+    offers no such extension, so there it always streams; see `file_response`.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], start: int, end: int, stat_result: os.stat_result, **kwargs: Any):
+        self.start = start
+        self.end = end
+        super().__init__(path, status_code=status.HTTP_206_PARTIAL_CONTENT, stat_result=stat_result, **kwargs)
+        self.headers["content-range"] = f"bytes {start}-{end}/{stat_result.st_size}"
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        super().set_stat_headers(stat_result)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": self.start, "count": remaining, "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as f:
+                await f.seek(self.start)
+                while remaining:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    remaining = remaining - len(chunk) if chunk else 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining)})
+        if self.background is not None:
+            await self.background()
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    etag: str,
+    filename: str | None = None,
+    offload: Tuple[str, str] | None = None,
+) -> Response:
+    """Serve a file without reading it into memory, honoring a single `Range` (and `If-Range`).
+
+    Whole files go through FileResponse, which hands the path to the server
+    (`http.response.pathsend`) when it can send it itself. Uvicorn can not,
+    so for zero-copy sends behind a proxy pass `offload`, a `(header, value)`
+    such as `("X-Accel-Redirect", "/internal/...")` or `("X-Sendfile", path)`:
+    the response then carries only headers, and the proxy sends the file
+    and handles ranges.
+    """
+    headers = {"accept-ranges": "bytes", "etag": etag}
+    if offload is not None:
+        if filename is not None:
+            quoted = quote(filename)
+            headers["content-disposition"] = f"inline; filename*=utf-8''{quoted}" if quoted != filename else f'inline; filename="{filename}"'
+        return Response(headers={**headers, offload[0]: offload[1]}, media_type=media_type)
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    kwargs: Dict[str, Any] = {"headers": headers, "media_type": media_type, "filename": filename, "content_disposition_type": "inline"}
+    header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = _byte_range(header, size) if header and (if_range is None or if_range == etag) else None
+    if byte_range is None:
+        return FileResponse(path, stat_result=stat_result, **kwargs)
+    start, end = byte_range
+    if end < start:
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"content-range": f"bytes */{size}", **headers})
+    return RangeFileResponse(path, start, end, stat_result, **kwargs)
@@ -0,0 +1,178 @@
+"""Startup inputs parsed once, cacheable across cold starts, and kept fork-friendly.
+
+Everything the app reads from disk at startup (slideshow JSON schemas, story
+OpenAPI components, `*.response.json` examples, the provider catalog files) is
+gathered into one `StartupSnapshot`. The first start parses the sources and,
+once the schema registry has accepted them, writes the parsed data to
+STARTUP_CACHE_FILE with `marshal`; later starts whose sources are unchanged
+(same paths, sizes and mtimes) load that file instead of parsing YAML and JSON,
+and skip re-checking schemas that were already checked.
+
+For multi-worker servers that import the app before forking (gunicorn
+`--preload`), `freeze_for_fork()` moves every object built so far into the
+garbage collector's permanent generation, so collections in the workers do not
+write to (and un-share) the parent's pages.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import logging
+import marshal
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import yaml
+
+from ..config import Settings, get_settings
+from .common import dumps, load_examples
+
+logger = logging.getLogger("potterlabs.startup")
+
+# Bump when the cached layout changes; marshal's own format is only stable within a Python version.
+_CACHE_FORMAT = 1
+_CACHE_TAG = f"potterlabs-startup/{_CACHE_FORMAT}/{sys.version_info[0]}.{sys.version_info[1]}"
+
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def load_components(schemas_dir: Path, openapi_files: Iterable[Path] = ()) -> Dict[str, Any]:
+    """Slideshow `*.json` schemas plus the `components.schemas` of each OpenAPI file, in one namespace."""
+    components: Dict[str, Any] = {}
+    for path in sorted(schemas_dir.glob("*.json")):
+        with path.open("r", encoding="utf-8") as f:
+            components[path.stem] = json.load(f)
+    for openapi_path in openapi_files:
+        with openapi_path.open("r", encoding="utf-8") as f:
+            spec = yaml.load(f, Loader=_YAML_LOADER) or {}
+        for name, schema in spec.get("components", {}).get("schemas", {}).items():
+            if name in components:
+                raise ValueError(f"Schema '{name}' defined more than once ({openapi_path})")
+            components[name] = schema
+    return components
+
+
+def source_files(settings: Settings) -> List[Path]:
+    files = sorted(settings.SLIDESHOW_SCHEMAS_PATH.glob("*.json"))
+    files.append(settings.STORY_OPENAPI_FILE)
+    for directory in (settings.SLIDESHOW_EXAMPLES_PATH, settings.STORY_EXAMPLES_PATH):
+        files.extend(sorted(directory.glob("*.response.json")))
+    files.append(settings.PROVIDERS_EXAMPLES_PATH / "providers.json")
+    files.append(settings.PROVIDERS_EXAMPLES_PATH / "capabilities.json")
+    return files
+
+
+def source_signature(files: Iterable[Path]) -> Signature:
+    return tuple((str(path), s.st_mtime_ns, s.st_size) for path, s in ((p, p.stat()) for p in files))
+
+
+class StartupSnapshot:
+    """The parsed startup inputs. `from_cache` says whether they came from the cache file rather than the sources."""
+
+    __slots__ = ("components", "examples", "providers", "capabilities", "signature", "from_cache")
+
+    def __init__(
+        self,
+        components: Dict[str, Any],
+        examples: Dict[str, bytes],
+        providers: List[Dict[str, Any]],
+        capabilities: List[Dict[str, Any]],
+        signature: Signature,
+        from_cache: bool = False,
+    ):
+        self.components = components
+        self.examples = examples
+        self.providers = providers
+        self.capabilities = capabilities
+        self.signature = signature
+        self.from_cache = from_cache
+
+    @classmethod
+    def build(cls, settings: Settings, signature: Signature) -> "StartupSnapshot":
+        components = load_components(settings.SLIDESHOW_SCHEMAS_PATH, [settings.STORY_OPENAPI_FILE])
+        examples = {name: dumps(data) for name, data in load_examples([settings.SLIDESHOW_EXAMPLES_PATH, settings.STORY_EXAMPLES_PATH]).items()}
+        catalog = []
+        for name in ("providers.json", "capabilities.json"):
+            with (settings.PROVIDERS_EXAMPLES_PATH / name).open("r", encoding="utf-8") as f:
+                catalog.append(json.load(f))
+        return cls(components, examples, catalog[0], catalog[1], signature)
+
+    @classmethod
+    def load(cls, path: Path, signature: Signature) -> "StartupSnapshot | None":
+        """The cached snapshot at `path` if it was written for exactly these sources, else None."""
+        try:
+            with path.open("rb") as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, tuple) or len(data) != 6 or data[0] != _CACHE_TAG or data[1] != signature:
+            return None
+        _, _, components, examples, providers, capabilities = data
+        return cls(components, examples, providers, capabilities, signature, from_cache=True)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            marshal.dump((_CACHE_TAG, self.signature, self.components, self.examples, self.providers, self.capabilities), f)
+        os.replace(tmp, path)
+
+
+@lru_cache
+def get_startup_snapshot() -> StartupSnapshot:
+    settings = get_settings()
+    signature = source_signature(source_files(settings))
+    if settings.STARTUP_CACHE_ENABLED:
+        snapshot = StartupSnapshot.load(settings.STARTUP_CACHE_FILE, signature)
+        if snapshot is not None:
+            return snapshot
+    return StartupSnapshot.build(settings, signature)
+
+
+def save_startup_cache(settings: Settings, snapshot: StartupSnapshot) -> None:
+    """Write a freshly parsed snapshot to STARTUP_CACHE_FILE; call once everything built from it has been validated."""
+    if not settings.STARTUP_CACHE_ENABLED or snapshot.from_cache:
+        return
+    try:
+        snapshot.save(settings.STARTUP_CACHE_FILE)
+    except OSError:
+        logger.warning("Could not write startup cache %s", settings.STARTUP_CACHE_FILE, exc_info=True)
+
+
+def freeze_for_fork() -> None:
+    """Collect garbage, then exempt every surviving object from future collections (see the module docstring)."""
+    gc.collect()
+    gc.freeze()
+
+
+class StartupTimer:
+    """Wall time of named startup phases, for the startup report."""
+
+    def __init__(self, started: float | None = None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, name: str, since: float, until: float | None = None) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + (time.perf_counter() if until is None else until) - since
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, started)
+
+    def report(self) -> Dict[str, Any]:
+        """`{"total_ms": ..., "phases_ms": {phase: ms}}`; total runs from `started` to now."""
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+        }
@@ -0,0 +1,68 @@
+"""SQLite connections for the app's stores that survive a fork.
+
+SQLite forbids using a connection in a process forked from the one that
+opened it. Stores hold a `Database` instead of a bare connection: it opens
+its connection again, with its schema, the first time it is used in a forked
+child. The inherited connection is left alone rather than closed, so nothing
+is checkpointed or unlocked on the parent's behalf. Servers can therefore
+build the app once and fork their workers from it (gunicorn `--preload`).
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Iterable, List, Sequence
+
+_forks = 0  # bumped in each forked child
+_inherited: List[sqlite3.Connection] = []  # the parent's connections, kept from being closed by GC in a child
+
+
+def _after_fork_in_child() -> None:
+    global _forks
+    _forks += 1
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class Database:
+    """One store's connection: autocommit, WAL, `synchronous=NORMAL`, shared by threads under the store's lock.
+
+    `schema` statements (`CREATE ... IF NOT EXISTS`) run on every open, so a
+    reopened `:memory:` database has its tables too.
+    """
+
+    __slots__ = ("path", "_schema", "_conn", "_forks")
+
+    def __init__(self, path: Path | str, schema: Sequence[str] = ()):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._schema = tuple(schema)
+        self._open()
+
+    def _open(self) -> None:
+        self._conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self._schema:
+            self._conn.execute(statement)
+        self._forks = _forks
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._forks != _forks:
+            _inherited.append(self._conn)
+            self._open()
+        return self._conn
+
+    def execute(self, sql: str, parameters: Sequence[Any] = ()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        return self.connection.executemany(sql, seq_of_parameters)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,53 @@
+"""Named timing stages, reported to whichever services care.
+
+Code at any layer wraps work in `stage(name)`. Process-wide observers (the
+metrics registry's stage histogram) see every stage; a per-request recorder
+(the request's profile, while it is being profiled) also sees the stages of
+its own request. Keeping the hooks here lets utils time their work without
+importing the services that consume the timings.
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, Iterator, List
+
+Observer = Callable[[str, float], None]  # (stage name, seconds)
+
+_observers: List[Observer] = []
+_RECORDER: ContextVar[Observer | None] = ContextVar("potterlabs_stage_recorder", default=None)
+
+
+def add_observer(observer: Observer) -> None:
+    """Call `observer(name, seconds)` after every stage, in every context."""
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def record_into(recorder: Observer) -> Token:
+    """Also send the current context's stages to `recorder`, until `stop_recording(token)`."""
+    return _RECORDER.set(recorder)
+
+
+def stop_recording(token: Token) -> None:
+    _RECORDER.reset(token)
+
+
+def recorder() -> Observer | None:
+    """The current context's recorder, for timings only worth taking while someone records them."""
+    return _RECORDER.get()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for observer in _observers:
+            observer(name, elapsed)
+        record = _RECORDER.get()
+        if record is not None:
+            record(name, elapsed)
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime, timezone
-from typing import Any, Dict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Mapping
+
+from . import stages
+from .common import dumps, load_examples
+from .snapshot import get_startup_snapshot
+from .validation import SchemaRegistry, get_schema_registry
 
 
 def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def generate_stub(schema: Dict[str, Any]) -> Any:
+def generate_stub(schema: Dict[str, Any], now: Callable[[], str] = _now) -> Any:
     t = schema.get("type")
 
     if "enum" in schema and isinstance(schema["enum"], list) and schema["enum"]:
@@ -20,7 +28,7 @@ def generate_stub(schema: Dict[str, Any]) -> Any:
         result: Dict[str, Any] = {}
         for name, sub in props.items():
             if name in required:
-                result[name] = generate_stub(sub)
+                result[name] = generate_stub(sub, now)
         return result
 
     if t == "array":
@@ -30,7 +38,7 @@ def generate_stub(schema: Dict[str, Any]) -> Any:
     if t == "string":
         fmt = schema.get("format")
         if fmt == "date-time":
-            return _now()
+            return now()
         return schema.get("example") or "string"
 
     if t == "integer":
@@ -45,8 +53,121 @@ def generate_stub(schema: Dict[str, Any]) -> Any:
     # oneOf/anyOf: pick first schema to stub
     for key in ("oneOf", "anyOf", "allOf"):
         if key in schema and isinstance(schema[key], list) and schema[key]:
-            return generate_stub(schema[key][0])
+            return generate_stub(schema[key][0], now)
 
     # Fallback
     return {}
 
+
+# Slot markers survive json.dumps as `"\u0000slot:<name>\u0000"`, which no real
+# stub value can produce, so the encoded template can be split on them.
+_NOW_SLOT = "now"
+_SLOT_RE = re.compile(rb'"\\u0000slot:(\w+)\\u0000"')
+
+
+def _slot(name: str) -> str:
+    return f"\x00slot:{name}\x00"
+
+
+def _encode(value: Any) -> bytes:
+    return dumps(value)
+
+
+class StubSpec:
+    """Which schema to stub, which top-level fields vary per request, and static defaults.
+
+    Slots always overwrite the stubbed value; defaults only fill fields the
+    stub left out (the old `setdefault` behaviour). Specs are meant to be
+    module-level constants: the engine memoizes templates by spec identity,
+    and `StubEngine.warm()` prebuilds one for every spec declared so far.
+    """
+
+    __slots__ = ("schema_name", "slots", "defaults")
+
+    def __init__(self, schema_name: str, slots: Iterable[str] = (), defaults: Mapping[str, Any] | None = None):
+        self.schema_name = schema_name
+        self.slots = tuple(slots)
+        self.defaults = dict(defaults or {})
+        _DECLARED_SPECS.append(self)
+
+
+_DECLARED_SPECS: list[StubSpec] = []
+
+
+class StubTemplate:
+    """A stub serialized once to bytes, with holes for per-request values.
+
+    `date-time` fields become a `now` slot filled with the current time on
+    every render; the remaining slots are filled from keyword arguments.
+    """
+
+    __slots__ = ("_chunks", "_slots")
+
+    def __init__(self, data: Any):
+        parts = _SLOT_RE.split(_encode(data))
+        self._chunks: list[bytes] = parts[0::2]
+        self._slots: list[str] = [p.decode("ascii") for p in parts[1::2]]
+
+    @classmethod
+    def from_spec(cls, spec: StubSpec, registry: SchemaRegistry) -> "StubTemplate":
+        data = generate_stub(registry.schema(spec.schema_name), now=lambda: _slot(_NOW_SLOT))
+        if isinstance(data, dict):
+            for field in spec.slots:
+                data[field] = _slot(field)
+            for field, value in spec.defaults.items():
+                data.setdefault(field, value)
+        return cls(data)
+
+    def render(self, **values: Any) -> bytes:
+        if not self._slots:
+            return self._chunks[0]
+        now = _encode(_now()) if _NOW_SLOT in self._slots else b""
+        out = [self._chunks[0]]
+        for name, tail in zip(self._slots, self._chunks[1:]):
+            out.append(now if name == _NOW_SLOT else _encode(values[name]))
+            out.append(tail)
+        return b"".join(out)
+
+
+class StubEngine:
+    """Memoized stub templates plus in-memory `*.response.json` examples."""
+
+    def __init__(self, registry: SchemaRegistry, examples: Mapping[str, bytes] | None = None):
+        self._registry = registry
+        self._examples: Dict[str, bytes] = dict(examples or {})
+        self._templates: Dict[StubSpec, StubTemplate] = {}
+
+    @classmethod
+    def from_paths(cls, registry: SchemaRegistry, example_dirs: Iterable[Path]) -> "StubEngine":
+        examples = {name: _encode(data) for name, data in load_examples(example_dirs).items()}
+        return cls(registry, examples)
+
+    def warm(self) -> int:
+        """Build the template of every declared spec now (before workers fork); returns how many there are."""
+        for spec in _DECLARED_SPECS:
+            self.template(spec)
+        return len(self._templates)
+
+    def example(self, name: str) -> bytes | None:
+        return self._examples.get(name)
+
+    def template(self, spec: StubSpec) -> StubTemplate:
+        template = self._templates.get(spec)
+        if template is None:
+            template = self._templates[spec] = StubTemplate.from_spec(spec, self._registry)
+        return template
+
+    def render(self, spec: StubSpec, **values: Any) -> bytes:
+        with stages.stage("generate_stub"):
+            return self.template(spec).render(**values)
+
+    def example_or_render(self, example_name: str, spec: StubSpec, **values: Any) -> bytes:
+        example = self._examples.get(example_name)
+        if example is not None:
+            return example
+        return self.render(spec, **values)
+
+
+@lru_cache
+def get_stub_engine() -> StubEngine:
+    return StubEngine(get_schema_registry(), get_startup_snapshot().examples)
@@ -1,13 +1,22 @@
 from __future__ import annotations
 
+import copy
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Iterable, Mapping
 
 import yaml
 from fastapi import HTTPException
+from jsonschema import Draft202012Validator
 from jsonschema import validate as jsonschema_validate
-from jsonschema.exceptions import ValidationError
+from jsonschema.exceptions import ValidationError, best_match
+
+from ..config import Settings
+from . import stages
+from .snapshot import get_startup_snapshot, load_components
+
+_REF_PREFIX = "#/components/schemas/"
 
 
 def load_schema(schema_path: Path) -> Any:
@@ -21,9 +30,96 @@ def load_schema_from_openapi(openapi_path: Path, schema_name: str) -> Any:
     return openapi_spec["components"]["schemas"][schema_name]
 
 
+def _resolve_refs(node: Any, components: Mapping[str, Any], stack: tuple[str, ...] = ()) -> Any:
+    """Inline every `#/components/schemas/<Name>` ref found in `node`.
+
+    A ref that points back into the chain currently being expanded is
+    replaced with `{}` (accept anything) rather than recursing forever.
+    """
+    if isinstance(node, list):
+        return [_resolve_refs(item, components, stack) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    ref = node.get("$ref")
+    if isinstance(ref, str) and ref.startswith(_REF_PREFIX):
+        name = ref[len(_REF_PREFIX):]
+        if name not in components:
+            raise KeyError(f"Unresolvable schema reference '{ref}'")
+        if name in stack:
+            return {}
+        resolved = _resolve_refs(components[name], components, stack + (name,))
+        siblings = {k: v for k, v in node.items() if k != "$ref"}
+        if siblings:
+            resolved = {**resolved, **_resolve_refs(siblings, components, stack)}
+        return resolved
+
+    return {k: _resolve_refs(v, components, stack) for k, v in node.items()}
+
+
+class SchemaRegistry:
+    """Schemas parsed once, with refs inlined and validators compiled up front.
+
+    Slideshow JSON Schema files and story OpenAPI components share a single
+    `#/components/schemas/...` namespace, so refs resolve across both.
+    """
+
+    def __init__(self, components: Mapping[str, Any], check: bool = True):
+        """`check=False` skips meta-schema checks, for components that already passed them (the startup cache)."""
+        self._raw: Dict[str, Any] = dict(components)
+        self._resolved: Dict[str, Any] = {
+            name: _resolve_refs(schema, self._raw, (name,)) for name, schema in self._raw.items()
+        }
+        self._validators: Dict[str, Draft202012Validator] = {}
+        for name, schema in self._resolved.items():
+            if check:
+                Draft202012Validator.check_schema(schema)
+            self._validators[name] = Draft202012Validator(schema)
+
+    @classmethod
+    def from_paths(cls, schemas_dir: Path, openapi_files: Iterable[Path] = ()) -> "SchemaRegistry":
+        with stages.stage("schema_load"):
+            return cls(load_components(schemas_dir, openapi_files))
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "SchemaRegistry":
+        return cls.from_paths(settings.SLIDESHOW_SCHEMAS_PATH, [settings.STORY_OPENAPI_FILE])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._resolved
+
+    def names(self) -> list[str]:
+        return sorted(self._resolved)
+
+    def schema(self, name: str) -> Any:
+        """Return a private copy of the resolved schema for `name`."""
+        return copy.deepcopy(self._resolved[name])
+
+    def validator(self, name: str) -> Draft202012Validator:
+        return self._validators[name]
+
+
+@lru_cache
+def get_schema_registry() -> SchemaRegistry:
+    snapshot = get_startup_snapshot()
+    with stages.stage("schema_load"):
+        return SchemaRegistry(snapshot.components, check=not snapshot.from_cache)
+
+
 def validate_body(instance: Any, schema: Any) -> None:
+    """Validate `instance` against a compiled validator or a raw schema dict."""
+    with stages.stage("validate_body"):
+        _validate(instance, schema)
+
+
+def _validate(instance: Any, schema: Any) -> None:
     try:
-        jsonschema_validate(instance=instance, schema=schema)
+        if isinstance(schema, Draft202012Validator):
+            error = best_match(schema.iter_errors(instance))
+            if error is not None:
+                raise error
+        else:
+            jsonschema_validate(instance=instance, schema=schema)
     except ValidationError as exc:
         detail = {
             "error": "unprocessable_entity",
@@ -31,4 +127,4 @@ def validate_body(instance: Any, schema: Any) -> None:
             "path": list(exc.path),
             "schema_path": list(exc.schema_path),
         }
-        raise HTTPException(status_code=422, detail=detail) from exc
\ No newline at end of file
+        raise HTTPException(status_code=422, detail=detail) from exc
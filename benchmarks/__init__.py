@@ -0,0 +1 @@
+"""In-process benchmarks; run a module with `python -m benchmarks.<name>`."""
@@ -0,0 +1,256 @@
+"""Throughput and latency of every API route, driven in-process over ASGI.
+
+Each route gets a scenario built from the app's own route table: GETs hit a
+resource created during setup, PUTs and PATCHes send it a valid body, and
+every POST runs twice, once with a valid body (from the example files where
+one exists) and once with an invalid body that must be rejected with 422.
+
+Usage:
+    python -m benchmarks.routes [--requests 200] [--concurrency 16] [--only /v1/images]
+    python -m benchmarks.routes --save benchmarks/baseline.json
+    python -m benchmarks.routes --baseline benchmarks/baseline.json [--threshold 0.25]
+
+With `--baseline` the run exits non-zero if a route's throughput dropped, or its
+p95 latency grew, by more than `threshold` (a fraction) against the saved run.
+p95 growth under `--min-delta-ms` is ignored so sub-millisecond routes don't trip on jitter.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple
+
+import httpx
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Valid request bodies: the repo's example files, plus inline bodies where there is none.
+_EXAMPLE_FILES: Dict[str, Path] = {
+    "/v1/scripts": REPO_ROOT / "slideshow" / "examples" / "scripts.create.json",
+    "/v1/beats": REPO_ROOT / "slideshow" / "examples" / "beats.create.json",
+    "/v1/images": REPO_ROOT / "slideshow" / "examples" / "images.create.json",
+    "/v1/voiceovers": REPO_ROOT / "slideshow" / "examples" / "voiceovers.create.json",
+    "/v1/background-music": REPO_ROOT / "slideshow" / "examples" / "background-music.create.json",
+    "/v1/slideshows": REPO_ROOT / "slideshow" / "examples" / "slideshows.create.json",
+    "/v1/slideshow-videos": REPO_ROOT / "slideshow" / "examples" / "slideshow-videos.create.json",
+    "/v1/videos": REPO_ROOT / "story" / "examples" / "video-create.json",
+    "/v1/storyboards": REPO_ROOT / "story" / "examples" / "storyboard-create.json",
+    "/v1/stories": REPO_ROOT / "story" / "examples" / "story-create.json",
+}
+_INLINE_BODIES: Dict[str, Any] = {
+    "/v1/voices": {"name": "Narrator", "provider": "elevenlabs", "source_asset_id": "ast_bench"},
+    "/v1/assets": {"mode": "direct_upload", "filename": "bench.png", "mime": "image/png"},
+    "/v1/storyboards/{storyboard_id}": {"beats": ["A knight enters.", "The gate falls."]},
+    "/v1/storyboards/{storyboard_id}/render": {"style": "cinematic"},
+    "/v1/assets/{asset_id}/content": {"bench": "asset content"},
+    "/v1/batch": {"operations": [{"op": "images", "body": {"provider": "genai", "mode": "generate", "prompt": "A lighthouse at dusk"}}]},
+}
+# `{}` misses required fields for every create schema except these, which have none.
+_INVALID_BODIES: Dict[str, Any] = {
+    "/v1/videos": {"provider": 1},
+    "/v1/storyboards": {"beats": "not-an-array"},
+    "/v1/storyboards/{storyboard_id}/render": {"style": 1},
+    "/v1/stories": {"title": 1},
+    "/v1/batch": {"operations": "not-an-array"},
+}
+# Path params that are not "an id of the collection in front of them".
+_PARAM_SOURCES: Dict[str, str] = {
+    "/v1/jobs/{job_id}/logs": "/v1/images",
+}
+# Path params created by a nested POST rather than by the collection in front of them.
+_NESTED_PARAMS: Dict[str, str] = {
+    "render_id": "/v1/storyboards/{storyboard_id}/render",
+}
+
+_PARAM_RE = re.compile(r"\{(\w+)\}")
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: str
+    body: Any
+    expect: int
+
+
+class Result(NamedTuple):
+    name: str
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def _collection(path: str) -> str:
+    """`/v1/images/{image_job_id}` -> `/v1/images`; the route whose POST creates the path's resource."""
+    return _PARAM_SOURCES.get(path) or path[: path.index("/{")]
+
+
+def valid_body(path: str) -> Any:
+    if path in _INLINE_BODIES:
+        return _INLINE_BODIES[path]
+    with _EXAMPLE_FILES[path].open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def api_routes(app: FastAPI) -> List[APIRoute]:
+    return [r for r in app.routes if isinstance(r, APIRoute) and (r.path.startswith("/v1/") or r.path.startswith("/providers"))]
+
+
+async def prepare(client: httpx.AsyncClient, app: FastAPI) -> Dict[str, str]:
+    """Create one resource per collection and return its id, keyed by collection path."""
+    ids: Dict[str, str] = {}
+    providers = (await client.get("/providers")).json()
+    ids["/providers"] = providers[0]["id"]
+    for route in api_routes(app):
+        if "POST" in route.methods and "{" not in route.path:
+            response = await client.post(route.path, json=valid_body(route.path), headers={"Idempotency-Key": uuid.uuid4().hex})
+            response.raise_for_status()
+            ids[route.path] = response.json().get("id") or "bench"
+    for route in api_routes(app):
+        if "PUT" in route.methods:  # uploads, so content GETs have something to serve
+            (await client.put(_resolve(route.path, ids), json=valid_body(route.path))).raise_for_status()
+    for path in _NESTED_PARAMS.values():
+        response = await client.post(_resolve(path, ids), json=valid_body(path), headers={"Idempotency-Key": uuid.uuid4().hex})
+        response.raise_for_status()
+        ids[path] = response.json()["id"]
+    return ids
+
+
+def _resolve(path: str, ids: Dict[str, str]) -> str:
+    return _PARAM_RE.sub(lambda m: ids.get(_NESTED_PARAMS.get(m.group(1)) or _collection(path), "bench"), path)
+
+
+def build_scenarios(app: FastAPI, ids: Dict[str, str]) -> List[Scenario]:
+    scenarios: List[Scenario] = []
+    for route in api_routes(app):
+        path = route.path
+        if "{" in path:
+            path = _resolve(path, ids)
+        for method in sorted(route.methods):
+            if method == "GET":
+                scenarios.append(Scenario(f"GET {route.path}", "GET", path, None, 200))
+            elif method == "POST":
+                scenarios.append(Scenario(f"POST {route.path}", "POST", path, valid_body(route.path), route.status_code or 200))
+                scenarios.append(Scenario(f"POST {route.path} [invalid]", "POST", path, _INVALID_BODIES.get(route.path, {}), 422))
+            elif method in ("PUT", "PATCH"):
+                scenarios.append(Scenario(f"{method} {route.path}", method, path, valid_body(route.path), route.status_code or 200))
+    return scenarios
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> Result:
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+    kwargs = {"json": scenario.body} if scenario.body is not None else {}
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in remaining:
+            # The spec requires a fresh Idempotency-Key per create, so each POST pays for storing its response.
+            headers = {"Idempotency-Key": uuid.uuid4().hex} if scenario.method == "POST" else None
+            started = time.perf_counter()
+            response = await client.request(scenario.method, scenario.path, headers=headers, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != scenario.expect:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return Result(scenario.name, requests, errors, requests / elapsed, cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000)
+
+
+async def run(app: FastAPI, requests: int, concurrency: int, only: str | None = None) -> List[Result]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ids = await prepare(client, app)
+        results = []
+        for scenario in build_scenarios(app, ids):
+            if only and only not in scenario.name:
+                continue
+            await run_scenario(client, scenario, min(requests, 10), 1)  # warm up
+            results.append(await run_scenario(client, scenario, requests, concurrency))
+        return results
+
+
+def regressions(results: List[Result], baseline: Dict[str, Dict[str, float]], threshold: float, min_delta_ms: float = 1.0) -> List[str]:
+    problems = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.rps < base["rps"] * (1 - threshold):
+            problems.append(f"{result.name}: throughput {result.rps:.0f} req/s vs baseline {base['rps']:.0f}")
+        if result.p95_ms > base["p95_ms"] * (1 + threshold) and result.p95_ms - base["p95_ms"] > min_delta_ms:
+            problems.append(f"{result.name}: p95 {result.p95_ms:.2f} ms vs baseline {base['p95_ms']:.2f}")
+    return problems
+
+
+def report(results: List[Result]) -> str:
+    lines = [f"{'route':<52} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"]
+    for r in results:
+        lines.append(f"{r.name:<52} {r.rps:9.0f} {r.p50_ms:8.2f} {r.p95_ms:8.2f} {r.p99_ms:8.2f} {r.errors:6d}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", help="only routes whose name contains this")
+    parser.add_argument("--save", type=Path, help="write results to this JSON baseline")
+    parser.add_argument("--baseline", type=Path, help="compare against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore p95 growth smaller than this")
+    args = parser.parse_args(argv)
+
+    # Keep benchmark state out of var/, and never let the job queue be the bottleneck.
+    os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="potterlabs-bench-"))
+    os.environ.setdefault("JOB_QUEUE_SIZE", "1000000")
+    os.environ.setdefault("SIMULATOR_ENABLED", "true")  # anything that calls a provider stays on this box
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("potterlabs").setLevel(logging.ERROR)
+
+    results = asyncio.run(run(app, args.requests, args.concurrency, args.only))
+    print(report(results))
+
+    status = 0
+    if any(r.errors for r in results):
+        print("\nUnexpected status codes on: " + ", ".join(r.name for r in results if r.errors), file=sys.stderr)
+        status = 1
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["routes"]
+        problems = regressions(results, baseline, args.threshold, args.min_delta_ms)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        status = status or int(bool(problems))
+    if args.save is not None:
+        payload = {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "routes": {r.name: r._asdict() for r in results},
+        }
+        args.save.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Throughput of the four ways a list endpoint can serialize the same provider list.
+
+- `model`: pydantic objects + `response_model` + stdlib `JSONResponse` (validate, jsonable_encoder, json.dumps)
+- `orjson`: plain dicts + `ORJSONResponse` as the default class (jsonable_encoder, orjson)
+- `dumps`: plain dicts encoded per request with `dumps()` and sent with `raw_json_response`
+- `raw`: bytes encoded once up front, sent with `raw_json_response` (no per-request work)
+
+The `orjson` row is why routes encode with `dumps()` themselves: for plain data
+FastAPI's `jsonable_encoder` pass costs far more than the encoder it feeds.
+
+Usage: python -m benchmarks.serialization [--items 500] [--requests 2000] [--concurrency 32]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.services.catalog import Provider, get_provider_catalog
+from app.utils.common import dumps, raw_json_response
+
+
+def build_app(items: int) -> FastAPI:
+    base = get_provider_catalog().snapshot.providers
+    models = [base[n % len(base)].model_copy(update={"id": f"{base[n % len(base)].id}-{n}"}) for n in range(items)]
+    dicts = [m.model_dump(mode="json") for m in models]
+    encoded = dumps(dicts)
+
+    app = FastAPI(default_response_class=JSONResponse)
+
+    @app.get("/model", response_model=List[Provider])
+    async def model():
+        return models
+
+    @app.get("/orjson", response_class=ORJSONResponse)
+    async def orjson_route():
+        return dicts
+
+    @app.get("/dumps")
+    async def dumps_route():
+        return raw_json_response(dumps(dicts))
+
+    @app.get("/raw", response_model=List[Provider])
+    async def raw():
+        return raw_json_response(encoded)
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.get(path)).raise_for_status()  # warm up
+        remaining = iter(range(requests))
+
+        async def worker() -> None:
+            for _ in remaining:
+                (await client.get(path)).raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main(items: int, requests: int, concurrency: int) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app = build_app(items)
+    baseline = None
+    print(f"{items} providers per response, {requests} requests, concurrency {concurrency}")
+    for path in ("/model", "/orjson", "/dumps", "/raw"):
+        rate = await measure(app, path, requests, concurrency)
+        baseline = baseline or rate
+        print(f"{path:<8} {rate:10.1f} req/s  {rate / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.requests, args.concurrency))
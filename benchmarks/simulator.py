@@ -0,0 +1,35 @@
+"""Serve the fake upstream providers (`app.services.simulator`) on a local socket.
+
+Point the API at it with HEALTH_PROBE_URLS (or anything else that takes a provider
+URL) to load-test end to end on one box, or run the API with SIMULATOR_ENABLED to
+use the same simulator in-process.
+
+Usage: python -m benchmarks.simulator [--port 4011] [--seed 7] [--profiles sim.json] [--time-scale 0.1]
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List
+
+import uvicorn
+
+from app.services.catalog import get_provider_catalog
+from app.services.simulator import Simulator, load_overrides
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4011)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profiles", type=Path, help="JSON file of per-provider profile overrides")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiply every simulated latency by this")
+    args = parser.parse_args(argv)
+
+    simulator = Simulator.from_catalog(get_provider_catalog().snapshot, load_overrides(args.profiles), args.seed, args.time_scale)
+    uvicorn.run(simulator, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Cold-start time and memory of the app, each run in a fresh interpreter.
+
+Every run imports `app.main` in a new process and prints its startup report
+(import and init time per phase) and peak RSS. The first run starts without a
+startup cache, so it parses every source file and writes the cache; the rest
+start from the cache, like a freshly scaled-out worker on a warm host.
+
+Usage: python -m benchmarks.startup [--runs 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = (
+    "import json, resource, app.main; "
+    "print(json.dumps({**app.main.app.state.startup_report, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))"
+)
+
+
+def measure(data_dir: Path, extra_env: Dict[str, str] | None = None) -> Dict[str, Any]:
+    env = {**os.environ, "DATA_DIR": str(data_dir), "HEALTH_PROBE_ENABLED": "false", **(extra_env or {})}
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(results: List[Dict[str, Any]]) -> str:
+    phases = list(dict.fromkeys(name for r in results for name in r["phases_ms"]))
+    lines = [f"{'run':<4} {'cache':<5} {'total ms':>9} " + " ".join(f"{p:>9}" for p in phases) + f" {'RSS MB':>7}"]
+    for i, r in enumerate(results, 1):
+        cells = " ".join(f"{r['phases_ms'].get(p, 0.0):9.1f}" for p in phases)
+        lines.append(f"{i:<4} {r['startup_cache']:<5} {r['total_ms']:9.1f} {cells} {r['max_rss_kb'] / 1024:7.1f}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="potterlabs-startup-") as data_dir:
+        results = [measure(Path(data_dir)) for _ in range(max(2, args.runs))]
+    print(report(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+# Keep SQLite files and other runtime state out of the repo's var/ and fresh per run.
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="potterlabs-test-"))
+# Tests drive provider health with fake transports; never probe the real provider URLs.
+os.environ.setdefault("HEALTH_PROBE_ENABLED", "false")
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.exceptions import AssetTooLargeException, AssetUploadInProgressException
+from app.main import create_app
+from app.services.assets import AssetStore
+from app.utils.common import RangeFileResponse
+
+
+def _chunks(data: bytes, size: int = 1000):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_streamed_upload_dedupes_and_serves_ranges():
+    client = TestClient(create_app())
+    data = os.urandom(50_000)
+    ids = []
+    for _ in range(2):
+        created = client.post("/v1/assets", json={"mode": "direct_upload", "filename": "clip.mp4", "mime": "video/mp4"})
+        assert created.status_code == 201 and created.json()["status"] == "pending"
+        ids.append(created.json()["id"])
+        uploaded = client.put(created.json()["url"], content=_chunks(data))
+        assert uploaded.status_code == 200
+    first, second = ids
+    asset = client.get(f"/v1/assets/{second}").json()
+    assert asset["checksum"] == "sha256:" + hashlib.sha256(data).hexdigest()
+    assert asset["size_bytes"] == len(data) and asset["status"] == "ready"
+
+    events = [e for e in client.get("/v1/events", params={"limit": 1000}).json()["events"] if e["type"] == "asset.created"]
+    assert [(e["data"]["id"], e["data"]["deduplicated"]) for e in events[-2:]] == [(first, False), (second, True)]
+
+    assert client.put(f"/v1/assets/{first}/content", content=data).status_code == 200
+    assert client.put(f"/v1/assets/{first}/content", content=b"other").status_code == 409
+
+    full = client.get(f"/v1/assets/{first}/content")
+    assert full.status_code == 200 and full.content == data
+    assert full.headers["accept-ranges"] == "bytes" and full.headers["content-type"] == "video/mp4"
+    part = client.get(f"/v1/assets/{first}/content", headers={"Range": "bytes=100-70099"})
+    assert part.status_code == 206 and part.content == data[100:]
+    assert part.headers["content-range"] == f"bytes 100-{len(data) - 1}/{len(data)}"
+    assert client.get(f"/v1/assets/{first}/content", headers={"Range": "bytes=-10"}).content == data[-10:]
+    stale = client.get(f"/v1/assets/{first}/content", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    missing = client.get(f"/v1/assets/{first}/content", headers={"Range": f"bytes={len(data)}-"})
+    assert missing.status_code == 416 and missing.headers["content-range"] == f"bytes */{len(data)}"
+
+    pending = client.post("/v1/assets", json={"mode": "presigned_init", "filename": "a.png", "mime": "image/png"}).json()["id"]
+    assert client.get(f"/v1/assets/{pending}/content").status_code == 404
+    slideshow = {"beats": {"beats_id": "bt_1"}, "image_strategy": {"mode": "mix", "prefer_asset_ids": [first, pending]}}
+    rejected = client.post("/v1/slideshows", json=slideshow)
+    assert rejected.status_code == 422 and rejected.json()["detail"]["path"] == ["image_strategy", "prefer_asset_ids", 1]
+    slideshow["image_strategy"]["prefer_asset_ids"] = [first, second]
+    assert client.post("/v1/slideshows", json=slideshow).status_code == 201
+
+
+def test_upload_limit_and_rendition_lru(tmp_path):
+    store = AssetStore(tmp_path, max_upload_bytes=10_000, rendition_cache_bytes=2_500, buffer_bytes=4096)
+
+    async def stream(data: bytes):
+        for chunk in _chunks(data):
+            yield chunk
+
+    async def main():
+        too_big = store.create("big.bin", "application/octet-stream")
+        with pytest.raises(AssetTooLargeException):
+            await store.ingest(too_big["id"], stream(bytes(10_001)))
+        assert store.get(too_big["id"])["status"] == "pending"
+        assert list((tmp_path / "tmp").iterdir()) == []
+
+        asset = store.create("a.bin", "application/octet-stream")
+        await store.ingest(asset["id"], stream(os.urandom(5_000)))
+        built = []
+
+        def build(size):
+            def run(source, target):
+                built.append(size)
+                target.write_bytes(source.read_bytes()[:size])
+            return run
+
+        small = await store.rendition(asset["id"], "small", build(1_000))
+        await store.rendition(asset["id"], "medium", build(1_200))
+        await store.rendition(asset["id"], "small", build(1_000))  # hit; now most recently used
+        await store.rendition(asset["id"], "large", build(1_400))  # evicts "medium"
+        assert built == [1_000, 1_200, 1_400]
+        assert small.exists() and small.stat().st_size == 1_000
+        assert sorted(p.name.split(".")[-1] for p in (tmp_path / "renditions").rglob("*.*")) == ["large", "small"]
+
+    asyncio.run(main())
+
+
+def test_concurrent_uploads_of_one_asset_and_expiry(tmp_path):
+    store = AssetStore(tmp_path, stale_after=60.0, pending_ttl=0.0)
+
+    async def main():
+        asset = store.create("a.bin", "application/octet-stream")
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            yield b"first"
+            started.set()
+            await release.wait()
+
+        async def other():
+            yield b"second"
+
+        first = asyncio.ensure_future(store.ingest(asset["id"], slow()))
+        await started.wait()
+        with pytest.raises(AssetUploadInProgressException):
+            await store.ingest(asset["id"], other())
+        release.set()
+        view, _ = await first
+        assert view["checksum"] == "sha256:" + hashlib.sha256(b"first").hexdigest()
+
+        abandoned = store.create("b.bin", "application/octet-stream")
+        part = tmp_path / "tmp" / f"{abandoned['id']}.part"
+        part.write_bytes(b"half")
+        os.utime(part, (0, 0))  # its upload died long ago; a new one takes over
+        view, _ = await store.ingest(abandoned["id"], other())
+        assert view["status"] == "ready"
+        return asset["id"]
+
+    ready = asyncio.run(main())
+    never = store.create("c.bin", "application/octet-stream")
+    (tmp_path / "tmp" / "stray").write_bytes(b"x")
+    os.utime(tmp_path / "tmp" / "stray", (0, 0))
+    assert store.sweep() == 1
+    assert store.get(never["id"]) is None and store.get(ready) is not None
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_downloads_use_sendfile_when_offered_or_a_proxy_header(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(bytes(range(256)))
+    sent = []
+
+    async def main():
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.zerocopysend":
+                message = {**message, "file": message["file"].read()}
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "headers": [], "extensions": {"http.response.zerocopysend": {}}}
+        await RangeFileResponse(path, 10, 19, os.stat(path), media_type="application/octet-stream")(scope, receive, send)
+
+    asyncio.run(main())
+    assert sent[0]["status"] == 206
+    assert sent[1]["type"] == "http.response.zerocopysend" and (sent[1]["offset"], sent[1]["count"]) == (10, 10)
+
+    settings = get_settings()
+    client = TestClient(create_app())
+    created = client.post("/v1/assets", json={"mode": "direct_upload", "filename": "clip.mp4", "mime": "video/mp4"}).json()
+    client.put(created["url"], content=b"0123456789")
+    try:
+        settings.ASSETS_SENDFILE_HEADER = "X-Accel-Redirect"
+        offloaded = client.get(created["url"], headers={"Range": "bytes=0-3"})
+    finally:
+        settings.ASSETS_SENDFILE_HEADER = None
+    checksum = hashlib.sha256(b"0123456789").hexdigest()
+    assert offloaded.status_code == 200 and offloaded.content == b""
+    assert offloaded.headers["x-accel-redirect"] == f"/internal/assets/blobs/{checksum[:2]}/{checksum}"
+    assert offloaded.headers["content-type"] == "video/mp4" and offloaded.headers["etag"] == f'"sha256:{checksum}"'
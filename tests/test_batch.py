@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.middleware.idempotency import MemoryIdempotencyStore
+from app.routers.batch import BatchRunner
+from app.utils.common import dumps
+from app.utils.validation import get_schema_registry
+
+client = TestClient(app)
+
+IMAGE = {"provider": "genai", "mode": "generate", "prompt": "cat"}
+
+
+def test_batch_reports_each_operation():
+    response = client.post(
+        "/v1/batch",
+        json={"operations": [
+            {"op": "images", "body": IMAGE},
+            {"op": "images", "body": {}},
+            {"op": "nope", "body": {}},
+            {"op": "stories", "body": {"title": "t"}},
+        ]},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 2)
+    results = body["results"]
+    assert [r["status"] for r in results] == [202, 422, 422, 202]
+    assert results[0]["body"]["id"].startswith("img_")
+    assert results[1]["error"]["error"] == "unprocessable_entity"
+    assert results[2]["error"]["error"] == "unknown_operation"
+    assert client.get(f"/v1/stories/{results[3]['body']['id']}").status_code == 200
+
+
+def test_per_item_idempotency_key_replays():
+    operation = {"op": "images", "body": IMAGE, "idempotency_key": "batch-key-1"}
+    first = client.post("/v1/batch", json={"operations": [operation, operation]}).json()["results"]
+    again = client.post("/v1/batch", json={"operations": [operation]}).json()["results"]
+    assert first[0]["body"]["id"] == first[1]["body"]["id"] == again[0]["body"]["id"]
+    assert first[1]["replayed"] is True
+
+    reused = {**operation, "body": {**IMAGE, "prompt": "dog"}}
+    result = client.post("/v1/batch", json={"operations": [reused]}).json()["results"][0]
+    assert result["error"]["error"] == "idempotency_key_reused"
+
+
+def test_ndjson_streams_one_result_per_line():
+    lines = [json.dumps({"op": "voiceovers", "body": {"text": "hi", "voice_id": "v1", "provider": "elevenlabs"}}), "{not json", json.dumps({"op": "images", "body": IMAGE})]
+    response = client.post("/v1/batch", content="\n".join(lines) + "\n", headers={"Content-Type": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["error"]["error"] == "invalid_json"
+    assert results[2]["status"] == 202
+
+
+def test_ndjson_line_over_the_limit_ends_the_stream_even_with_its_newline(monkeypatch):
+    monkeypatch.setattr(get_settings(), "BATCH_MAX_LINE_BYTES", 200)
+    small = json.dumps({"op": "images", "body": IMAGE})
+    large = json.dumps({"op": "images", "body": {**IMAGE, "prompt": "x" * 300}})
+    response = client.post("/v1/batch", content="\n".join([small, large, small]) + "\n", headers={"Content-Type": "application/x-ndjson"})
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in results] == [0, 1]
+    assert results[0]["status"] == 202
+    assert (results[1]["status"], results[1]["error"]["error"]) == (413, "line_too_long")
+
+
+def test_oversized_json_batch_is_rejected():
+    response = client.post("/v1/batch", json={"operations": [{"op": "images", "body": IMAGE}] * 1001})
+    assert response.status_code == 413
+
+
+def test_concurrent_batches_with_one_key_submit_once():
+    submitted = []
+
+    class Job:
+        def __init__(self, n):
+            self.n = n
+
+        def encode(self):
+            return dumps({"id": f"img_{self.n}"})
+
+    class Jobs:
+        def submit(self, kind, body):
+            submitted.append(kind)
+            return Job(len(submitted))
+
+    async def throttle(kind, payload):
+        await asyncio.sleep(0.02)  # yields between claiming the key and submitting
+
+    store = MemoryIdempotencyStore(ttl=60, max_entries=10)
+    operation = {"op": "images", "body": IMAGE, "idempotency_key": "concurrent-1"}
+
+    async def batch():
+        return await BatchRunner(get_schema_registry(), Jobs(), store, throttle).run(0, operation)
+
+    async def main():
+        return await asyncio.gather(batch(), batch())
+
+    results = [json.loads(encoded) for _, encoded in asyncio.run(main())]
+    assert submitted == ["images"]
+    assert results[0]["body"] == results[1]["body"] == {"id": "img_1"}
+    assert sorted(r.get("replayed", False) for r in results) == [False, True]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.main import app
+from benchmarks.routes import Result, api_routes, build_scenarios, regressions, run
+
+
+def test_every_route_has_a_scenario_and_passes():
+    results = asyncio.run(run(app, requests=2, concurrency=2))
+    names = {r.name for r in results}
+    for route in api_routes(app):
+        for method in route.methods:
+            assert f"{method} {route.path}" in names
+    assert [r.name for r in results if r.errors] == []
+
+
+def test_invalid_post_bodies_expect_422():
+    invalid = [s for s in build_scenarios(app, {}) if s.name.endswith("[invalid]")]
+    assert invalid and all(s.expect == 422 for s in invalid)
+
+
+def test_regressions_respect_threshold_and_jitter_floor():
+    baseline = {"GET /x": {"rps": 1000.0, "p95_ms": 2.0}}
+    assert regressions([Result("GET /x", 10, 0, 900.0, 1.0, 2.5, 3.0)], baseline, 0.25) == []
+    slow = regressions([Result("GET /x", 10, 0, 500.0, 1.0, 5.0, 6.0)], baseline, 0.25)
+    assert len(slow) == 2
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.slideshow import _event_stream
+from app.services.events import EventLog, get_event_log
+
+
+def test_read_spans_file_and_ring(tmp_path):
+    log = EventLog(tmp_path / "events.sqlite3", capacity=4)
+    for i in range(10):
+        log.append("test", {"i": i})
+    assert [e.seq for e in log.read(0, 3)] == [1, 2, 3]
+    assert [e.seq for e in log.read(3, 100)] == list(range(4, 11))
+    assert json.loads(log.read(6, 1)[0].encoded)["data"] == {"i": 6}
+
+
+def test_numbering_resumes_after_restart(tmp_path):
+    path = tmp_path / "events.sqlite3"
+    log = EventLog(path, capacity=100)
+    log.append("test", {})
+    log.append("test", {})
+    log.close()
+    reopened = EventLog(path, capacity=100)
+    assert reopened.append("test", {}).seq == 3
+    assert [e.seq for e in reopened.read(0, 10)] == [1, 2, 3]
+
+
+def test_workers_sharing_a_file_share_one_sequence(tmp_path):
+    path = tmp_path / "events.sqlite3"
+    first, second = EventLog(path, capacity=3), EventLog(path, capacity=3)
+    seqs = [log.append("test", {"i": i}).seq for i, log in enumerate([first, second, first, second, second, first])]
+    assert seqs == [1, 2, 3, 4, 5, 6]
+    for log in (first, second):
+        assert [json.loads(e.encoded)["data"]["i"] for e in log.read(0, 10)] == [0, 1, 2, 3, 4, 5]
+        assert [e.seq for e in log.read(2, 10)] == [3, 4, 5, 6]
+
+    second.append("test", {"i": 6})
+    assert [e.seq for e in first.read(5, 10)] == [6, 7]  # caught up at the end of its ring
+    assert first.last_seq == 7
+
+
+def test_wait_wakes_on_append():
+    log = EventLog(":memory:")
+
+    async def main():
+        asyncio.get_running_loop().call_later(0.01, log.append, "test", {})
+        started = time.monotonic()
+        assert await log.wait(0, timeout=5)
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) < 1
+
+
+def test_sse_stream_frames_events():
+    log = EventLog(":memory:")
+    log.append("job.queued", {"id": "img_1"})
+
+    async def main():
+        stream = _event_stream(log, 0, 100, heartbeat=0.01)
+        chunks = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        return chunks
+
+    retry, frame, heartbeat = asyncio.run(main())
+    assert retry.startswith(b"retry:")
+    assert frame.startswith(b"id: 1\nevent: job.queued\ndata: {")
+    assert heartbeat == b": keep-alive\n\n"
+
+
+def test_events_endpoint_pages_job_events():
+    with TestClient(app) as client:
+        start = str(get_event_log().last_seq)
+        job = client.post("/v1/images", json={"provider": "genai", "mode": "generate"}).json()
+        body = client.get("/v1/events", params={"cursor": start, "wait": 5}).json()
+        assert body["events"][0]["type"] == "job.queued"
+        assert body["events"][0]["data"]["id"] == job["id"]
+        assert int(body["next_cursor"]) > int(start)
+        assert client.get("/v1/events", params={"cursor": "nope"}).status_code == 400
+
+
+def test_events_sse_answers_200_with_an_event_stream():
+    async def main():
+        started = asyncio.Event()
+        messages = []
+
+        async def receive():
+            if not messages:
+                messages.append(None)
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await started.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                messages.append(message)
+                started.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/v1/events", "raw_path": b"/v1/events", "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"test"), (b"accept", b"text/event-stream")], "client": ("test", 1), "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return messages[1]
+
+    start = asyncio.run(main())
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
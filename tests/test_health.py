@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.exceptions import ProviderUnavailableException
+from app.main import app
+from app.services.catalog import ProviderCatalog
+from app.services.health import CircuitBreaker, HealthMonitor, get_health_monitor
+from app.services.jobs import CallableJobExecutor, get_job_engine
+
+client = TestClient(app)
+
+
+def _monitor(tmp_path, statuses, **kwargs) -> HealthMonitor:
+    providers = [{"id": pid, "name": pid, "category": "text", "url": f"http://{pid}.test/health"} for pid in statuses]
+    (tmp_path / "providers.json").write_text(json.dumps(providers))
+    (tmp_path / "capabilities.json").write_text("[]")
+    catalog = ProviderCatalog(tmp_path / "providers.json", tmp_path / "capabilities.json", reload_interval=-1)
+    fake = httpx.MockTransport(lambda request: httpx.Response(statuses[request.url.host.split(".")[0]]))
+    probe_urls = {pid: f"http://{pid}.test/health" for pid in statuses if pid != "homepage"}
+    return HealthMonitor(catalog, transport=fake, probe_urls=probe_urls, **kwargs)
+
+
+def test_probes_feed_health_and_breakers(tmp_path):
+    statuses = {"up": 200, "down": 503}
+    monitor = _monitor(tmp_path, statuses, failure_threshold=2, cooldown=0.05)
+
+    async def main():
+        for _ in range(2):
+            await monitor.probe_all()
+
+    asyncio.run(main())
+    up = json.loads(monitor.health("up"))
+    assert up["status"] == "available" and up["metrics"]["success_rate_5m"] == 1.0
+    assert isinstance(up["metrics"]["p95_ms"], int)
+    assert json.loads(monitor.health("down"))["status"] == "unavailable"
+    with pytest.raises(ProviderUnavailableException):
+        monitor.check("down")
+
+    time.sleep(0.06)
+    assert json.loads(monitor.health("down"))["status"] == "degraded"  # half-open after the cooldown
+    statuses["down"] = 200
+    asyncio.run(main())
+    monitor.check("down")
+    assert json.loads(monitor.health("down"))["metrics"]["success_rate_5m"] == 0.5
+
+
+def test_only_providers_with_a_probe_url_are_probed_and_only_2xx_is_healthy(tmp_path):
+    statuses = {"homepage": 503, "missing": 404}
+    monitor = _monitor(tmp_path, statuses, failure_threshold=1)
+    asyncio.run(monitor.probe_all())
+    assert json.loads(monitor.health("homepage"))["metrics"] == {}  # catalog `url` only: never probed
+    assert monitor.is_open("missing")
+
+
+def test_half_open_breaker_admits_a_single_trial_call():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10.0)
+    breaker.record(False, 100.0)
+    assert not breaker.admit(105.0)
+    assert breaker.admit(110.0)  # half-open: the trial
+    assert not breaker.admit(110.1) and breaker.blocked_for(110.1) > 0
+    breaker.record(False, 111.0)  # trial failed: open again
+    assert not breaker.admit(112.0)
+    assert breaker.admit(121.0)
+    assert breaker.admit(131.5)  # a trial that never reported back frees the slot after a cooldown
+    breaker.record(True, 132.0)
+    assert breaker.admit(132.0) and breaker.admit(132.0)
+
+
+def test_health_route_and_fail_fast_on_open_circuit():
+    response = client.get("/providers/openrouter/health")
+    assert response.status_code == 200
+    assert response.json()["id"] == "openrouter" and response.json()["status"] == "available"
+    assert client.get("/providers/non-existent-provider/health").status_code == 404
+
+    monitor = get_health_monitor()
+    engine = get_job_engine()
+    stub = engine.executor("voiceovers")
+    body = {"script": {"script_id": "scr_1"}, "voice": {"provider": "elevenlabs", "name": "Emma"}}
+    try:
+        for _ in range(5):
+            monitor.record("elevenlabs", False, 5000.0)
+        assert client.get("/providers/elevenlabs/health").json()["status"] == "unavailable"
+        # Voiceovers are generated by their provider, so an open circuit fails them fast...
+        assert engine.calls_provider("voiceovers")
+        response = client.post("/v1/voiceovers", json=body, headers={"X-API-Key": "health-test"})
+        assert response.status_code == 503
+        assert response.json()["error"] == "provider_unavailable" and int(response.headers["Retry-After"]) >= 1
+
+        async def serve_locally(job):
+            return {}
+
+        # ...while a kind served locally routes around it.
+        engine.register("voiceovers", CallableJobExecutor(serve_locally))
+        assert client.post("/v1/voiceovers", json=body, headers={"X-API-Key": "health-test"}).status_code == 202
+    finally:
+        engine.register("voiceovers", stub)
+        monitor.record("elevenlabs", True, 100.0)
+    assert client.post("/v1/voiceovers", json=body, headers={"X-API-Key": "health-test"}).status_code == 202
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.middleware.idempotency import (
+    IdempotencyMiddleware,
+    MemoryIdempotencyStore,
+    SQLiteIdempotencyStore,
+    StoredResponse,
+    is_final,
+)
+
+client = TestClient(app)
+
+IMAGE = {"provider": "genai", "mode": "generate", "prompt": "cat"}
+
+
+def test_repeated_key_replays_response():
+    headers = {"Idempotency-Key": "idem-replay-1"}
+    first = client.post("/v1/images", json=IMAGE, headers=headers)
+    second = client.post("/v1/images", json=IMAGE, headers=headers)
+    assert second.status_code == first.status_code == 202
+    assert second.content == first.content
+    assert second.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reuse_with_different_body_is_rejected():
+    headers = {"Idempotency-Key": "idem-reuse-1"}
+    client.post("/v1/images", json=IMAGE, headers=headers)
+    response = client.post("/v1/images", json={**IMAGE, "prompt": "dog"}, headers=headers)
+    assert response.status_code == 422
+    assert response.json()["error"] == "idempotency_key_reused"
+
+
+def test_concurrent_requests_are_coalesced():
+    calls = 0
+    inner = FastAPI()
+
+    @inner.post("/work")
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls}
+
+    wrapped = IdempotencyMiddleware(inner, MemoryIdempotencyStore(ttl=60, max_entries=10))
+
+    async def main():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await asyncio.gather(*[ac.post("/work", headers={"Idempotency-Key": "k"}) for _ in range(5)])
+
+    responses = asyncio.run(main())
+    assert calls == 1
+    assert {r.json()["n"] for r in responses} == {1}
+
+
+def test_retry_later_answers_are_not_replayed():
+    answers = [(429, {"Retry-After": "1"}), (409, {}), (503, {}), (202, {}), (404, {})]
+    inner = FastAPI()
+
+    @inner.post("/work")
+    async def work():
+        code, headers = answers.pop(0)
+        return Response(status_code=code, headers=headers)
+
+    wrapped = TestClient(IdempotencyMiddleware(inner, MemoryIdempotencyStore(ttl=60, max_entries=10)))
+    codes = [wrapped.post("/work", headers={"Idempotency-Key": "k"}).status_code for _ in range(5)]
+    assert codes == [429, 409, 503, 202, 202]
+    assert answers == [(404, {})]
+
+    assert [is_final(code) for code in (200, 400, 404, 422, 408, 409, 425, 429, 500)] == [True] * 4 + [False] * 5
+    assert not is_final(400, [(b"Retry-After", b"5")])
+
+
+def test_keyed_bodies_over_the_limit_are_refused_unread():
+    calls = 0
+    inner = FastAPI()
+
+    @inner.post("/work")
+    async def work():
+        nonlocal calls
+        calls += 1
+        return {"n": calls}
+
+    wrapped = IdempotencyMiddleware(inner, MemoryIdempotencyStore(ttl=60, max_entries=10), max_body_bytes=1024)
+
+    async def main():
+        async def chunks():
+            for _ in range(100):
+                yield b"x" * 512
+
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            too_large = await ac.post("/work", content=chunks(), headers={"Idempotency-Key": "big"})
+            small = await ac.post("/work", content=b"x" * 1024, headers={"Idempotency-Key": "small"})
+            return too_large, small
+
+    too_large, small = asyncio.run(main())
+    assert too_large.status_code == 413 and too_large.json()["error"] == "request_too_large"
+    assert small.status_code == 200 and calls == 1
+
+
+def test_memory_store_is_bounded():
+    store = MemoryIdempotencyStore(ttl=60, max_entries=2)
+    for i in range(5):
+        store.complete(str(i), StoredResponse("f", 200, [], b"{}"))
+    assert len(store) == 2
+    assert store.get("0") is None and store.get("4") is not None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = tmp_path / "idem.sqlite3"
+    a = SQLiteIdempotencyStore(path, ttl=60, max_entries=10)
+    b = SQLiteIdempotencyStore(path, ttl=60, max_entries=10)
+    assert a.claim("k", "f")
+    assert not b.claim("k", "f")
+    assert b.get("k") is None
+    a.complete("k", StoredResponse("f", 201, [(b"content-type", b"application/json")], b'{"ok":true}'))
+    assert b.get("k") == StoredResponse("f", 201, [(b"content-type", b"application/json")], b'{"ok":true}')
+    a.close()
+    b.close()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.jobs import CallableJobExecutor, JobEngine, JobStore
+from app.services.joblogs import JobLogHandler, JobLogStore
+
+
+def _messages(lines):
+    # Drop the leading timestamp, keep "<LEVEL> <message>".
+    return [line.split(" ", 1)[1] for line in lines]
+
+
+def test_range_and_tail_reads(tmp_path):
+    store = JobLogStore(tmp_path)
+    for i in range(5):
+        store.write("job_1", f"line {i}")
+    lines, offset = store.read_tail("job_1", 2)
+    assert _messages(lines) == ["INFO line 3", "INFO line 4"]
+    store.write("job_1", "line 5")
+    lines, _ = store.read_range("job_1", offset)
+    assert _messages(lines) == ["INFO line 5"]
+    assert store.read_range("missing", 0) == ([], 0)
+    assert store.path("../etc/passwd") is None
+
+
+def test_follow_streams_until_job_finishes(tmp_path):
+    store = JobLogStore(tmp_path)
+    done = False
+
+    async def main():
+        nonlocal done
+        store.write("job_1", "first")
+        chunks = []
+
+        async def writer():
+            nonlocal done
+            await asyncio.sleep(0.01)
+            store.write("job_1", "second")
+            done = True
+            store.close_job("job_1")
+
+        task = asyncio.create_task(writer())
+        async for chunk in store.follow("job_1", 0, lambda: done, heartbeat=1, sse=False):
+            chunks.append(chunk)
+        await task
+        return b"".join(chunks).decode().splitlines()
+
+    assert _messages(asyncio.run(main())) == ["INFO first", "INFO second"]
+
+
+def test_follow_sees_other_workers_writes_and_reads_in_bounded_chunks(tmp_path):
+    follower, writer = JobLogStore(tmp_path, poll_interval=0.02), JobLogStore(tmp_path)  # two workers, one directory
+    for i in range(2000):
+        writer.write("job_1", f"backlog {i:04d} " + "x" * 64)
+    writer.write("job_1", "long " + "y" * 200_000)
+    done = False
+
+    async def main():
+        nonlocal done
+        chunks = []
+
+        async def write_later():
+            nonlocal done
+            await asyncio.sleep(0.05)
+            writer.write("job_1", "from the other worker")
+            done = True
+
+        task = asyncio.create_task(write_later())
+        started = time.monotonic()
+        async for chunk in follower.follow("job_1", 0, lambda: done, heartbeat=30, sse=False):
+            chunks.append(chunk)
+        await task
+        return chunks, time.monotonic() - started
+
+    chunks, elapsed = asyncio.run(main())
+    lines = b"".join(chunks).decode().splitlines()
+    assert len(lines) == 2002 and _messages(lines)[-1] == "INFO from the other worker"
+    assert max(len(chunk) for chunk in chunks[:-2]) <= 64 << 10  # the long line needs a bigger read of its own
+    assert elapsed < 2  # well inside the heartbeat: the follower polled rather than waited for a local write
+
+
+def test_engine_captures_job_logging(tmp_path):
+    store = JobLogStore(tmp_path)
+    logger = logging.getLogger("potterlabs.test_joblogs")
+    handler = JobLogHandler(store)
+    logger.addHandler(handler)
+
+    async def work(job):
+        logger.warning("rendering %s", job.id)
+        return {}
+
+    async def main():
+        engine = JobEngine(JobStore(":memory:"), executors={"images": CallableJobExecutor(work)})
+        engine.add_listener(store.record_job)
+        job = engine.submit("images", {})
+        for _ in range(100):
+            if job.finished:
+                break
+            await asyncio.sleep(0.01)
+        await engine.stop()
+        return job
+
+    try:
+        job = asyncio.run(main())
+    finally:
+        logger.removeHandler(handler)
+    lines, _ = store.read_tail(job.id, 10)
+    assert _messages(lines) == ["INFO job queued", "INFO job running", f"WARNING rendering {job.id}", "INFO job succeeded"]
+
+
+def test_job_logs_endpoint():
+    with TestClient(app) as client:
+        job = client.post("/v1/images", json={"provider": "genai", "mode": "generate"}).json()
+        deadline = time.monotonic() + 5
+        while client.get(f"/v1/images/{job['id']}").json()["status"] != "succeeded" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        body = client.get(f"/v1/jobs/{job['id']}/logs").json()
+        assert _messages(body["lines"])[-1] == "INFO job succeeded"
+        followed = client.get(f"/v1/jobs/{job['id']}/logs", params={"follow": "true", "since": 0})
+        assert followed.text.count("\n") == len(body["lines"])
+        assert client.get("/v1/jobs/img_missing/logs").status_code == 404
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.exceptions import JobQueueFullException
+from app.main import app
+from app.services.jobs import CallableJobExecutor, Job, JobEngine, JobStore, ProcessPoolJobExecutor
+
+IMAGE = {"provider": "genai", "mode": "generate", "prompt": "cat"}
+
+
+def _double(kind, payload):
+    return {"value": payload["n"] * 2}
+
+
+def test_image_job_lifecycle():
+    with TestClient(app) as client:
+        created = client.post("/v1/images", json=IMAGE)
+        assert created.status_code == 202
+        job = created.json()
+        assert job["id"].startswith("img_")
+        assert job["status"] == "queued"
+
+        deadline = time.monotonic() + 5
+        while True:
+            body = client.get(f"/v1/images/{job['id']}").json()
+            if body["status"] == "succeeded" or time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+        assert body["status"] == "succeeded"
+
+        # A job is only visible under its own resource type.
+        assert client.get(f"/v1/voiceovers/{job['id']}").status_code == 404
+
+
+def test_unknown_job_is_404():
+    with TestClient(app) as client:
+        response = client.get("/v1/videos/vid_missing")
+        assert response.status_code == 404
+        assert response.json()["error"] == "not_found"
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def main():
+        release = asyncio.Event()
+
+        async def block(job):
+            await release.wait()
+            return {}
+
+        engine = JobEngine(JobStore(":memory:"), default_concurrency=1, queue_size=1, executors={"images": CallableJobExecutor(block)})
+        engine.submit("images", {})
+        await asyncio.sleep(0)  # let the single worker pick up the first job
+        engine.submit("images", {})
+        with pytest.raises(JobQueueFullException) as exc:
+            engine.submit("images", {})
+        assert exc.value.retry_after >= 1
+        release.set()
+        await engine.stop()
+
+    asyncio.run(main())
+
+
+def test_executor_failure_marks_job_failed():
+    async def main():
+        async def boom(job):
+            raise RuntimeError("provider exploded")
+
+        engine = JobEngine(JobStore(":memory:"), executors={"images": CallableJobExecutor(boom)})
+        job = engine.submit("images", {})
+        for _ in range(100):
+            if job.finished:
+                break
+            await asyncio.sleep(0.01)
+        await engine.stop()
+        return engine.store.get(job.id)
+
+    stored = asyncio.run(main())
+    assert stored.status == "failed"
+    assert stored.view()["error"] == "provider exploded"
+
+
+def test_process_pool_executor():
+    async def main():
+        engine = JobEngine(JobStore(":memory:"), executors={"images": ProcessPoolJobExecutor(_double, max_workers=1)})
+        job = engine.submit("images", {"n": 21})
+        for _ in range(500):
+            if job.finished:
+                break
+            await asyncio.sleep(0.01)
+        await engine.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "succeeded"
+    assert job.result == {"value": 42}
+
+
+def test_wait_parks_until_the_status_changes():
+    async def main():
+        release = asyncio.Event()
+
+        async def block(job):
+            await release.wait()
+            return {"url": "https://cdn/x.png"}
+
+        engine = JobEngine(JobStore(":memory:"), executors={"images": CallableJobExecutor(block)})
+        job = engine.submit("images", {})
+        await asyncio.sleep(0.01)
+        assert job.status == "running"
+
+        started = time.perf_counter()
+        assert (await engine.wait_for_change(job.id, "images", 0.05)).status == "running"
+        assert time.perf_counter() - started >= 0.05
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        parked = [asyncio.ensure_future(engine.wait_for_change(job.id, "images", 10)) for _ in range(2000)]
+        await asyncio.sleep(0.01)
+        per_waiter = (tracemalloc.get_traced_memory()[0] - before) / len(parked)
+        tracemalloc.stop()
+
+        started = time.perf_counter()
+        release.set()
+        woken = await asyncio.gather(*parked)
+        assert time.perf_counter() - started < 1.0
+        assert {j.status for j in woken} == {"succeeded"}
+        assert engine._waiters == {}
+        assert (await engine.wait_for_change(job.id, "images", 10)).status == "succeeded"
+        await engine.stop()
+        return per_waiter
+
+    assert asyncio.run(main()) < 4096  # bytes per parked waiter, its task included
+
+
+def test_jobs_of_a_dead_worker_are_recovered_on_start(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    script = (
+        "import sys; from app.services.jobs import Job, JobStore; store = JobStore(sys.argv[1]);"
+        " store.insert(Job('img_orphan', 'images', {'n': 1}, status='running'));"
+        " store.insert(Job('vid_orphan', 'videos', {}, status='queued'))"
+    )
+    subprocess.run([sys.executable, "-c", script, str(path)], check=True)  # the worker that accepted them exits
+    store = JobStore(path)
+    store.insert(Job("img_mine", "images", {"n": 2}, status="running"))  # owned by a live process: this one
+
+    async def main():
+        engine = JobEngine(store, executors={"images": CallableJobExecutor(lambda job: asyncio.sleep(0, {"n": job.payload["n"]}))})
+        await engine.start()
+        job = await engine.wait_for_change("img_orphan", "images", 5)
+        if not job.finished:
+            job = await engine.wait_for_change("img_orphan", "images", 5)
+        await engine.stop()
+        return job
+
+    recovered = asyncio.run(main())
+    assert (recovered.status, recovered.result) == ("succeeded", {"n": 1})
+    assert store.get("img_mine").status == "running"
+    assert store.get("vid_orphan").status == "queued"  # no executor here for its kind
+    assert JobStore(path).recover(["images"]) == []
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import json
+
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.utils.common import dumps
 
 client = TestClient(app)
 
@@ -11,3 +14,8 @@ def test_health_check():
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"ok": True}
+
+
+def test_dumps_matches_compact_stdlib_encoding():
+    value = {"id": "scr_1", "text": "café", "slot": "\x00slot:now\x00", "n": [1, 2.5, None, True]}
+    assert dumps(value) == json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
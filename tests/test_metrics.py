@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import HTTP_IN_FLIGHT, HTTP_REQUESTS, MetricsRegistry, SQLiteMetricsStore
+
+client = TestClient(app)
+
+_DEAD_PID = 999_999_999
+
+
+def _value(text: str, prefix: str) -> float:
+    return sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(prefix))
+
+
+def test_metrics_count_routes_by_template_and_stages():
+    before = client.get("/metrics").text
+    client.get("/providers/openrouter")
+    client.post("/v1/scripts", json={})
+    client.get("/no/such/path")
+    text = client.get("/metrics").text
+
+    assert "# TYPE potterlabs_http_requests_total counter" in text
+    series = 'potterlabs_http_requests_total{method="GET",route="/providers/{id}",status="200"}'
+    assert _value(text, series) == _value(before, series) + 1
+    assert _value(text, 'potterlabs_http_requests_total{method="POST",route="/v1/scripts",status="422"}') >= 1
+    assert _value(text, 'potterlabs_http_requests_total{method="GET",route="unmatched",status="404"}') >= 1
+    assert 'potterlabs_stage_duration_seconds_count{stage="validate_body"}' in text
+    assert 'potterlabs_stage_duration_seconds_count{stage="schema_load"}' in text
+    assert 'potterlabs_job_queue_depth{kind="images"}' in text
+
+
+def test_workers_are_summed_and_dead_gauges_dropped(tmp_path):
+    store = SQLiteMetricsStore(tmp_path / "metrics.sqlite3")
+    other = MetricsRegistry()
+    other.inc(HTTP_REQUESTS, (("route", "/x"),), 2)
+    other.add(HTTP_IN_FLIGHT, (), 5)
+    store.publish(_DEAD_PID, other.samples())
+
+    mine = MetricsRegistry(store, flush_interval=0)
+    mine.inc(HTTP_REQUESTS, (("route", "/x"),), 3)
+    mine.add(HTTP_IN_FLIGHT, (), 1)
+    text = mine.render().decode()
+
+    assert 'potterlabs_http_requests_total{route="/x"} 5' in text
+    assert "potterlabs_http_requests_in_flight 1" in text
+    assert os.getpid() != _DEAD_PID
+
+
+def test_background_flusher_publishes_off_the_request_path(tmp_path):
+    store = SQLiteMetricsStore(tmp_path / "metrics.sqlite3")
+    metrics = MetricsRegistry(store, flush_interval=0.01)
+
+    async def main():
+        await metrics.start()
+        metrics.inc(HTTP_REQUESTS, (("route", "/y"),), 4)
+        await asyncio.sleep(0.1)
+        published = [s for s in store.aggregate() if s[3] == (("route", "/y"),)]
+        metrics.inc(HTTP_REQUESTS, (("route", "/y"),), 1)
+        await metrics.stop()  # publishes once more on the way out
+        return published
+
+    assert [s[4] for s in asyncio.run(main())] == [4.0]
+    assert [s[4] for s in store.aggregate() if s[3] == (("route", "/y"),)] == [5.0]
+
+
+def test_exited_workers_are_folded_into_retained_totals(tmp_path):
+    path = tmp_path / "metrics.sqlite3"
+    earlier = MetricsRegistry()
+    earlier.inc(HTTP_REQUESTS, (("route", "/x"),), 2)
+    for pid in (_DEAD_PID, os.getpid()):  # an exited worker, and an earlier process that had this pid
+        SQLiteMetricsStore(path).publish(pid, earlier.samples())
+
+    store = SQLiteMetricsStore(path)
+    mine = MetricsRegistry(store, flush_interval=0)
+    mine.inc(HTTP_REQUESTS, (("route", "/x"),), 1)
+    for _ in range(2):
+        assert 'potterlabs_http_requests_total{route="/x"} 5' in mine.render().decode()
+    assert {s[0] for s in store._conn.execute("SELECT DISTINCT pid FROM metrics")} == {0, os.getpid()}
+
+
+def test_scrapes_take_samples_on_the_loop(tmp_path):
+    metrics = MetricsRegistry(SQLiteMetricsStore(tmp_path / "metrics.sqlite3"), flush_interval=0)
+
+    async def main():
+        async def busy():
+            for n in range(2000):
+                metrics.inc(HTTP_REQUESTS, (("route", f"/{n}"),))
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(busy())
+        texts = [await metrics.render_async() for _ in range(5)]  # new series are added while each scrape runs
+        await task
+        return texts + [await metrics.render_async()]
+
+    texts = asyncio.run(main())
+    assert _value(texts[-1].decode(), "potterlabs_http_requests_total{") == 2000
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+from app.middleware.profiling import ProfilingMiddleware
+from app.routers import admin
+from app.services.profiling import ProfileStore, StackSampler, get_profile_store
+from app.utils import stages
+from app.utils.common import dumps, raw_json_response
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_app(store: ProfileStore, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work(pause: float = 0.0, spin: float = 0.0):
+        await asyncio.sleep(pause)
+        with stages.stage("validate_body"):
+            _spin(spin)
+        return raw_json_response(dumps({"ok": True}))
+
+    @app.get("/stream")
+    async def stream(delay: float = 0.0):
+        await asyncio.sleep(delay)
+
+        async def lines():
+            for _ in range(3):
+                await asyncio.sleep(0.03)
+                yield b"{}\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    app.include_router(admin.router)
+    app.dependency_overrides[get_profile_store] = lambda: store
+    app.add_middleware(ProfilingMiddleware, store=store, sampler=StackSampler(0.002), header="X-Profile", **options)
+    return app
+
+
+def test_header_and_slow_requests_are_captured_with_stacks_and_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "PROFILING_TOKEN", "s3cret")
+    store = ProfileStore(tmp_path, max_entries=10, max_bytes=1 << 20)
+    client = TestClient(_profiled_app(store, slow_after=0.05))
+
+    assert client.get("/work").status_code == 200
+    assert store.list(10) == []  # fast and not asked for
+
+    client.get("/work?spin=0.05", headers={"X-Profile": "s3cret"})
+    client.get("/work?pause=0.06&spin=0.05")
+    slow, requested = store.list(10)
+
+    assert (requested["trigger"], requested["path"], requested["status"]) == ("header", "/work", 200)
+    assert set(requested["stages_ms"]) == {"validate_body", "serialize"}
+    assert requested["stages_ms"]["validate_body"]["total_ms"] >= 50
+    assert requested["sampling"]["started_after_ms"] < 5 and requested["sampling"]["samples"] > 0
+
+    assert slow["trigger"] == "slow" and slow["duration_ms"] >= 110
+    assert slow["sampling"]["started_after_ms"] >= 50
+    detail = client.get(f"/admin/profiles/{slow['id']}", headers={"X-Profile": "s3cret"}).json()
+    assert any("_spin" in s["stack"].rsplit(";", 1)[-1] for s in detail["stacks"])
+
+
+def test_store_keeps_the_newest_captures_and_admin_hides_behind_the_token(tmp_path, monkeypatch):
+    store = ProfileStore(tmp_path, max_entries=3, max_bytes=1 << 20)
+    ids = [f"prof_{i:016x}" for i in range(5)]
+    for profile_id in ids:
+        store.save({"id": profile_id, "trigger": "sample", "stacks": []})
+    assert [c["id"] for c in store.list(10)] == ids[:1:-1]
+    assert store.get(ids[0]) is None and store.get("*") is None
+
+    monkeypatch.setattr(get_settings(), "PROFILING_TOKEN", "s3cret")
+    client = TestClient(_profiled_app(store, token="s3cret"))
+    assert client.get("/admin/profiles").status_code == 404
+    assert client.get("/admin/profiles", headers={"X-Profile": "sécret".encode()}).status_code == 404
+    assert client.get("/work", headers={"X-Profile": "wrong"}).status_code == 200
+    assert len(store.list(10)) == 3
+    listed = client.get("/admin/profiles?limit=2", headers={"X-Profile": "s3cret"}).json()["profiles"]
+    assert [c["id"] for c in listed] == ids[:2:-1] and "stacks" not in listed[0]
+
+
+def test_streams_and_long_polls_are_not_slow_but_slow_handlers_before_a_stream_are(tmp_path):
+    store = ProfileStore(tmp_path, max_entries=10, max_bytes=1 << 20)
+    client = TestClient(_profiled_app(store, slow_after=0.05))
+
+    assert client.get("/stream").status_code == 200  # 90 ms of streaming after a fast start
+    assert client.get("/work?wait=1&pause=0.06").status_code == 200
+    assert store.list(10) == []
+
+    client.get("/stream?delay=0.06")
+    (slow,) = store.list(10)
+    assert (slow["trigger"], slow["path"]) == ("slow", "/stream")
+
+
+def test_admin_routes_need_a_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "PROFILING_TOKEN", None)
+    client = TestClient(_profiled_app(ProfileStore(tmp_path, max_entries=1, max_bytes=1 << 20)))
+    assert client.get("/admin/profiles").status_code == 404
+
+    monkeypatch.setattr(get_settings(), "PROFILING_ENABLED", True)
+    assert not any(getattr(r, "path", "").startswith("/admin") for r in create_app().routes)
+
+
+def test_disabled_profiling_installs_nothing():
+    app = create_app()
+    assert not any(m.cls is ProfilingMiddleware for m in app.user_middleware)
+    assert not any(getattr(r, "path", "").startswith("/admin") for r in app.routes)
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import json
+import os
+
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.catalog import ProviderCatalog
 
 client = TestClient(app)
 
@@ -33,3 +37,31 @@ def test_list_capabilities():
 def test_list_capabilities_provider_not_found():
     response = client.get("/providers/non-existent-provider/capabilities")
     assert response.status_code == 404
+
+
+def test_list_providers_conditional_get():
+    first = client.get("/providers")
+    etag = first.headers["etag"]
+    response = client.get("/providers", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_catalog_reloads_changed_files(tmp_path):
+    providers_file = tmp_path / "providers.json"
+    capabilities_file = tmp_path / "capabilities.json"
+    providers_file.write_text(json.dumps([{"id": "a", "name": "A", "category": "text"}]))
+    capabilities_file.write_text(json.dumps([{"id": "text-gen", "name": "Text", "type": "text"}]))
+    catalog = ProviderCatalog(providers_file, capabilities_file, reload_interval=0)
+    before = catalog.snapshot
+    assert list(before.by_id) == ["a"]
+
+    providers_file.write_text(json.dumps([{"id": "b", "name": "B", "category": "text"}]))
+    os.utime(providers_file, ns=(0, 1))
+    assert list(catalog.snapshot.by_id) == ["b"]
+    assert catalog.snapshot.capabilities_encoded["b"].body.startswith(b'[{"id":"text-gen"')
+
+    providers_file.write_text("not json")
+    os.utime(providers_file, ns=(0, 2))
+    assert list(catalog.snapshot.by_id) == ["b"]
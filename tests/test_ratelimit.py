@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.exceptions import RateLimitedException
+from app.main import app
+from app.services.catalog import ProviderCatalog
+from app.services.ratelimit import RateLimiter, SQLiteBucketStore
+
+client = TestClient(app)
+
+VOICEOVER = {"script": {"script_id": "scr_1"}, "voice": {"provider": "elevenlabs", "name": "Emma"}}
+
+
+def test_one_api_key_is_limited_to_its_share():
+    # elevenlabs allows a burst of 20; one key gets half of it.
+    statuses = [client.post("/v1/voiceovers", json=VOICEOVER, headers={"X-API-Key": "tenant-a"}).status_code for _ in range(11)]
+    assert statuses == [202] * 10 + [429]
+
+    response = client.post("/v1/voiceovers", json=VOICEOVER, headers={"X-API-Key": "tenant-a"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["error"] == "rate_limited" and response.json()["scope"] == "api_key"
+    assert client.post("/v1/voiceovers", json=VOICEOVER, headers={"X-API-Key": "tenant-b"}).status_code == 202
+
+
+def _catalog(tmp_path, per_min: int, burst: int) -> ProviderCatalog:
+    providers_file = tmp_path / "providers.json"
+    capabilities_file = tmp_path / "capabilities.json"
+    providers_file.write_text(json.dumps([{"id": "p", "name": "P", "category": "text", "quota": {"rate_limit_per_min": per_min, "burst": burst}}]))
+    capabilities_file.write_text("[]")
+    return ProviderCatalog(providers_file, capabilities_file, reload_interval=-1)
+
+
+def test_workers_share_one_provider_budget(tmp_path):
+    catalog = _catalog(tmp_path, 6, 10)
+    store = SQLiteBucketStore(tmp_path / "buckets.sqlite3")
+    workers = [RateLimiter(store, catalog, key_share=1.0, lease_fraction=0.3) for _ in range(2)]
+
+    async def main():
+        admitted, scopes = 0, set()
+        for i in range(30):
+            try:
+                await workers[i % 2].check("p", f"key-{i % 3}")
+                admitted += 1
+            except RateLimitedException as exc:
+                scopes.add(exc.scope)
+        await workers[0].check("unlimited", "key-0")  # providers without a quota are never limited
+        return admitted, scopes
+
+    admitted, scopes = asyncio.run(main())
+    assert admitted == 10
+    assert "provider" in scopes
+
+
+def test_expired_leases_give_tokens_back_and_full_buckets_are_evicted(tmp_path):
+    catalog = _catalog(tmp_path, 60, 20)  # 1 token a second
+    store = SQLiteBucketStore(tmp_path / "buckets.sqlite3")
+    first = RateLimiter(store, catalog, key_share=1.0, lease_ttl=0.05, min_lease=8)
+    second = RateLimiter(store, catalog, key_share=1.0, lease_ttl=0.05, min_lease=8)
+
+    async def main():
+        await first.check("p", "tenant")  # leases 8, spends 1
+        time.sleep(0.06)
+        await first.sweep()
+        for _ in range(19):  # 12 left in the bucket, plus the 7 first returned
+            await second.check("p", "tenant")
+
+    asyncio.run(main())
+    assert store.evict() == 0  # both buckets ("p" and the tenant's share of it) are still refilling
+    store.take("fast", (1000.0, 1.0), 1)
+    time.sleep(0.01)
+    assert store.evict() == 1
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services.render import RenderPipeline, RenderWorkers, StageCache
+
+
+class _SlowWorkers(RenderWorkers):
+    """Each provider-backed stage takes 50 ms and notes when it ran."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def _upstream(self, capability: str) -> None:
+        self.calls.append(capability)
+        await asyncio.sleep(0.05)
+
+
+def test_rerender_after_caption_edit_reruns_only_affected_stages(tmp_path):
+    workers = _SlowWorkers()
+    pipeline = RenderPipeline(StageCache(tmp_path / "cache.sqlite3"), workers, {"image": 8})
+    storyboard = {"id": "sb_1", "script": "A knight enters. The gate falls. Dawn breaks.", "scenes": ["knight", "gate", "dawn"]}
+
+    started = time.perf_counter()
+    first = asyncio.run(pipeline.render(storyboard, "cinematic"))
+    # images, voiceover and music overlap, then video: about two stage latencies, not six.
+    assert time.perf_counter() - started < 0.25
+    assert sorted(workers.calls) == ["image-gen"] * 3 + ["music-gen"] + ["tts"] * 3 + ["video-gen"]
+    assert all(stage["cached"] == 0 for stage in first["stages"].values())
+
+    workers.calls.clear()
+    second = asyncio.run(pipeline.render({**storyboard, "scenes": ["knight", "bridge", "dawn"]}, "cinematic"))
+    assert sorted(workers.calls) == ["image-gen", "video-gen"]
+    assert (second["stages"]["image"]["ran"], second["stages"]["image"]["cached"]) == (1, 2)
+    assert second["stages"]["voiceover"]["cached"] == 3 and second["stages"]["music"]["cached"] == 1
+    assert second["stages"]["slideshow"]["ran"] == 1
+    assert second["video_url"] != first["video_url"]
+
+    workers.calls.clear()
+    assert asyncio.run(pipeline.render(storyboard, "cinematic"))["video_url"] == first["video_url"]
+    assert workers.calls == []
+
+
+def _render(client: TestClient, storyboard_id: str) -> dict:
+    render_id = client.post(f"/v1/storyboards/{storyboard_id}/render", json={"style": "cinematic"}).json()["id"]
+    for _ in range(100):
+        body = client.get(f"/v1/storyboards/{storyboard_id}/renders/{render_id}").json()
+        if body["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.02)
+    assert body["status"] == "succeeded", body
+    return body
+
+
+def test_editing_one_beat_reruns_only_that_beat():
+    with TestClient(create_app()) as client:
+        assert client.get("/v1/storyboards/sb_missing").status_code == 404
+        assert client.patch("/v1/storyboards/sb_missing", json={"beats": ["x"]}).status_code == 404
+        sb = client.post("/v1/storyboards", json={"beats": ["The owl wakes.", "The moon rises.", "The wolf howls."]}).json()
+        _render(client, sb["id"])
+
+        edited = client.patch(f"/v1/storyboards/{sb['id']}", json={"beats": ["The owl wakes.", "The sun sets.", "The wolf howls."]})
+        assert edited.status_code == 200 and edited.json()["scenes"][1] == "The sun sets."
+        assert client.get(f"/v1/storyboards/{sb['id']}").json() == edited.json()
+        stages = _render(client, sb["id"])["stages"]
+        ran = {name: (stage["ran"], stage["cached"]) for name, stage in stages.items()}
+        assert ran == {
+            "script": (0, 1),
+            "beats": (1, 0),
+            "image": (1, 2),
+            "voiceover": (1, 2),
+            "music": (0, 1),
+            "slideshow": (1, 0),
+            "video": (1, 0),
+        }
+
+
+def test_render_endpoint_runs_a_job():
+    with TestClient(create_app()) as client:
+        storyboard = client.post("/v1/storyboards", json={"script": "A knight enters the castle. The gate falls."})
+        assert storyboard.status_code == 201
+        sb = storyboard.json()
+        assert sb["scenes"] == ["A knight enters the castle.", "The gate falls."]
+        assert client.get(f"/v1/storyboards/{sb['id']}").json() == sb
+
+        assert client.post("/v1/storyboards/sb_missing/render", json={"style": "cinematic"}).status_code == 404
+        job = client.post(f"/v1/storyboards/{sb['id']}/render", json={"style": "cinematic"})
+        assert job.status_code == 202
+        render_id = job.json()["id"]
+        assert render_id.startswith("sbr_")
+
+        for _ in range(100):
+            body = client.get(f"/v1/storyboards/{sb['id']}/renders/{render_id}").json()
+            if body["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.02)
+        assert body["status"] == "succeeded", body
+        assert body["video_url"].endswith(".mp4")
+        assert client.get(f"/v1/storyboards/other/renders/{render_id}").status_code == 404
+
+
+def test_cache_hits_do_not_write_until_their_use_time_is_stale(tmp_path):
+    cache = StageCache(tmp_path / "cache.sqlite3")
+    cache.put("k", {"v": 1})
+    conn = cache._conn.connection
+    writes = conn.total_changes
+    assert cache.get("k") == {"v": 1} and conn.total_changes == writes
+
+    conn.execute("UPDATE stage_cache SET used_at = used_at - ?", (StageCache._TOUCH_AFTER,))
+    writes = conn.total_changes
+    assert cache.get("k") == {"v": 1} and conn.total_changes == writes + 1
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app
+from app.services.resources import SQLiteResourceStore, get_resource_store
+
+client = TestClient(app)
+
+VOICE = {"name": "Narrator", "provider": "elevenlabs", "source_asset_id": "ast_1"}
+
+
+def _fill(store, count):
+    for n in range(count):
+        status = "failed" if n % 3 == 0 else "succeeded"
+        body = json.dumps({"id": f"r{n:03d}", "status": status}).encode()
+        store.put("things", f"r{n:03d}", body, status, created_at=f"2024-01-01T00:00:{n % 10:02d}Z")
+
+
+def test_keyset_pages_cover_everything_once():
+    store = SQLiteResourceStore(":memory:")
+    _fill(store, 25)
+    seen, cursor = [], None
+    while True:
+        page = store.list("things", 7, cursor)
+        seen.extend(json.loads(item)["id"] for item in page.items)
+        if page.next is None:
+            break
+        cursor = page.next
+    assert sorted(seen) == [f"r{n:03d}" for n in range(25)]
+    assert len(set(seen)) == 25
+
+
+def test_status_filter_and_updates_keep_position():
+    store = SQLiteResourceStore(":memory:")
+    _fill(store, 9)
+    failed = [json.loads(item)["id"] for item in store.list("things", 50, status="failed").items]
+    assert sorted(failed) == ["r000", "r003", "r006"]
+
+    order = [json.loads(item)["id"] for item in store.list("things", 50).items]
+    store.put("things", "r004", b'{"id":"r004","status":"failed"}', "failed")
+    assert [json.loads(item)["id"] for item in store.list("things", 50).items] == order
+    assert store.get("things", "r004") == b'{"id":"r004","status":"failed"}'
+
+
+def test_created_resources_are_listed_and_fetchable():
+    created = [client.post("/v1/voices", json=VOICE).json() for _ in range(3)]
+    assert all(v["provider"] == "elevenlabs" and v["name"] == "Narrator" for v in created)
+
+    first = client.get("/v1/voices", params={"limit": 2})
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    rest = client.get("/v1/voices", params={"limit": 200, "cursor": first.headers["x-next-cursor"]}).json()
+    listed = {v["id"] for v in first.json() + rest}
+    assert {v["id"] for v in created} <= listed
+
+    script = client.post("/v1/scripts", json={"input": {"type": "text", "text": "hi"}}).json()
+    assert client.get(f"/v1/scripts/{script['id']}").json() == script
+    page = client.get("/v1/scripts", params={"limit": 1}).json()
+    assert page["items"] == [script]
+
+
+def test_submitted_jobs_are_listed():
+    with TestClient(app) as lifespan_client:
+        job = lifespan_client.post("/v1/images", json={"provider": "genai", "mode": "generate", "prompt": "cat"}).json()
+        ids = {item["id"] for item in lifespan_client.get("/v1/images", params={"limit": 200}).json()["items"]}
+        assert job["id"] in ids
+
+
+def test_invalid_cursor_is_400():
+    response = client.get("/v1/images", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json()["detail"]["error"] == "invalid_cursor"
+
+
+def test_large_pages_stream_in_batches_as_json_or_ndjson():
+    store = get_resource_store()
+    padding = "x" * (get_settings().RESOURCES_STREAM_MIN_BYTES // 40)
+    for n in range(60):
+        store.put("slideshows", f"ss_big{n:03d}", json.dumps({"id": f"ss_big{n:03d}", "padding": padding}).encode(), created_at=f"2999-01-01T00:00:{n:02d}Z")
+    expected = [f"ss_big{n:03d}" for n in range(59, 9, -1)]
+
+    streamed = client.get("/v1/slideshows", params={"limit": 50}, headers={"Accept-Encoding": "identity"})
+    assert "content-length" not in streamed.headers
+    page = streamed.json()
+    assert [item["id"] for item in page["items"]] == expected
+    assert page["next"] == store.list("slideshows", 50).next
+
+    lines = client.get("/v1/slideshows", params={"limit": 50}, headers={"Accept": "application/x-ndjson"})
+    assert lines.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in lines.text.splitlines()] == expected
+    assert lines.headers["x-next-cursor"] == page["next"]
+
+    small = client.get("/v1/slideshows", params={"limit": 3}, headers={"Accept-Encoding": "identity"})
+    assert int(small.headers["content-length"]) == len(small.content) and small.json()["next"] == store.list("slideshows", 3).next
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Tuple
+
+import pytest
+
+from app.exceptions import NoProviderAvailableException
+from app.services.catalog import ProviderCatalog
+from app.services.health import HealthMonitor
+from app.services.routing import ProviderRouter
+
+
+def _router(tmp_path, providers) -> Tuple[ProviderRouter, HealthMonitor]:
+    (tmp_path / "providers.json").write_text(json.dumps([{"name": p["id"], "category": "text", **p} for p in providers]))
+    (tmp_path / "capabilities.json").write_text(json.dumps([{"id": "text-gen", "name": "Text", "type": "text"}]))
+    catalog = ProviderCatalog(tmp_path / "providers.json", tmp_path / "capabilities.json", reload_interval=-1)
+    health = HealthMonitor(catalog, failure_threshold=3)
+    return ProviderRouter(catalog, health), health
+
+
+def test_rank_weighs_latency_cost_and_errors(tmp_path):
+    router, health = _router(tmp_path, [
+        {"id": "slow", "latency_ms_estimate": 3000, "cost_per_unit": 1.0},
+        {"id": "fast", "latency_ms_estimate": 300, "cost_per_unit": 1.0},
+        {"id": "cheap", "latency_ms_estimate": 300, "cost_per_unit": 0.1},
+        {"id": "off", "status": "inactive"},
+    ])
+    assert router.rank("text-gen") == ["cheap", "fast", "slow"]
+
+    health.record("cheap", False, 300.0)
+    health.record("cheap", False, 300.0)
+    assert router.rank("text-gen")[0] == "fast"
+    health.record("cheap", False, 300.0)  # breaker opens
+    assert "cheap" not in router.rank("text-gen")
+    assert router.rank("image-gen") == []
+
+
+def test_cost_is_only_compared_within_a_billing_unit(tmp_path):
+    router, _ = _router(tmp_path, [
+        {"id": "chars", "latency_ms_estimate": 300, "billing_unit": "characters", "cost_per_unit": 3e-4},
+        {"id": "tokens", "latency_ms_estimate": 300, "billing_unit": "tokens", "cost_per_unit": 2e-6},
+        {"id": "pricier-tokens", "latency_ms_estimate": 300, "billing_unit": "tokens", "cost_per_unit": 4e-6},
+        {"id": "unpriced", "latency_ms_estimate": 300},
+    ])
+    scores = dict(router.scores("text-gen"))
+    assert scores["chars"] == scores["tokens"] < scores["pricier-tokens"] == scores["unpriced"]
+
+
+def test_call_falls_back_then_hedges(tmp_path):
+    router, health = _router(tmp_path, [{"id": "a", "latency_ms_estimate": 100}, {"id": "b", "latency_ms_estimate": 200}])
+    calls = []
+
+    async def flaky(pid):
+        calls.append(pid)
+        if pid == "a":
+            raise RuntimeError("upstream 500")
+        return pid
+
+    async def slow_leader(pid):
+        await asyncio.sleep(5 if pid == "a" else 0.01)
+        return pid
+
+    async def failing(pid):
+        raise RuntimeError("down")
+
+    assert asyncio.run(router.call("text-gen", flaky)) == "b"
+    assert calls == ["a", "b"]
+    assert health.stats("a")[1] > 0
+
+    health.record("a", True, 1.0)
+    health.record("a", True, 1.0)
+    started = time.perf_counter()
+    assert asyncio.run(router.call("text-gen", slow_leader, hedge_after=0.05)) == "b"
+    assert time.perf_counter() - started < 1.0
+
+    with pytest.raises(NoProviderAvailableException) as exc:
+        asyncio.run(router.call("text-gen", failing))
+    assert len(exc.value.errors) == 2
+
+
+def test_ranks_hundreds_of_providers_by_score(tmp_path):
+    router, health = _router(tmp_path, [{"id": f"p{i}", "latency_ms_estimate": 100 + i, "cost_per_unit": 1 + i % 7} for i in range(300)])
+    for i in range(0, 300, 3):
+        health.record(f"p{i}", i % 2 == 0, 50.0 + i)
+
+    scores = router.scores("text-gen")
+    assert len(scores) == 300
+    assert [score for _, score in scores] == sorted(score for _, score in scores)
+    assert router.rank("text-gen") == [pid for pid, _ in scores]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+
+from app.services.catalog import get_provider_catalog
+from app.services.health import HealthMonitor
+from app.services.simulator import Incident, Latency, Profile, Simulator
+
+
+def test_outcomes_are_reproducible_by_seed_and_incidents_apply():
+    profile = Profile(latency=Latency(dist="pareto", ms=100, alpha=1.5), error_rate=0.1, incidents=[Incident(from_request=50, to_request=59, latency_multiplier=30, error_rate=1.0)])
+    runs = [[Simulator({"p": profile}, seed=seed).outcome("p", n) for n in range(1, 101)] for seed in (7, 7, 8)]
+    assert runs[0] == runs[1]
+    assert runs[0] != runs[2]
+    incident = runs[0][49:59]
+    assert all(o.status == 503 and o.latency_ms >= 3000 for o in incident)
+    assert any(o.status == 200 for o in runs[0][:49])
+
+
+def test_serves_payloads_and_rate_limits_over_httpx():
+    simulator = Simulator({"tts": Profile(latency=Latency(dist="constant", ms=5), error_rate=0.0, rate_limit_per_min=60, burst=2, payload_bytes=1000)}, time_scale=0.1)
+
+    async def main():
+        async with httpx.AsyncClient(transport=simulator.transport(), base_url="http://sim") as client:
+            return [await client.post("/tts/speak") for _ in range(3)] + [await client.get("/nope/health")]
+
+    ok, _, limited, missing = asyncio.run(main())
+    assert ok.status_code == 200 and 750 <= len(ok.content) <= 1250
+    assert ok.headers["x-simulated-latency-ms"] == "5.0"
+    assert limited.status_code == 429 and int(limited.headers["retry-after"]) >= 1
+    assert missing.status_code == 404
+
+
+def test_health_monitor_against_simulated_providers():
+    catalog = get_provider_catalog()
+    simulator = Simulator.from_catalog(catalog.snapshot, {"pika": {"error_rate": 1.0}, "runway": {"error_rate": 0.0}}, time_scale=0.0)
+    urls = {p.id: f"http://simulator/{p.id}/health" for p in catalog.snapshot.providers}
+    monitor = HealthMonitor(catalog, probe_urls=urls, failure_threshold=3, transport=simulator.transport())
+
+    async def main():
+        for _ in range(3):
+            await monitor.probe_all()
+        await monitor.stop()
+
+    asyncio.run(main())
+    assert json.loads(monitor.health("pika"))["status"] == "unavailable"
+    assert json.loads(monitor.health("runway"))["status"] == "available"
+
+
+def test_rate_limits_are_reproducible_and_probes_are_not_slowed_by_generation_latency():
+    profile = Profile(latency=Latency(dist="lognormal", ms=400), error_rate=0.0, rate_limit_per_min=60, burst=3, health_latency_ms=20)
+
+    async def run(pause: float):
+        simulator = Simulator({"p": profile}, seed=3, time_scale=0.0)
+        async with httpx.AsyncClient(transport=simulator.transport(), base_url="http://sim") as client:
+            statuses = []
+            for _ in range(12):
+                statuses.append((await client.post("/p/speak")).status_code)
+                await asyncio.sleep(pause)  # real pacing must not matter
+            probe = await client.get("/p/health")
+        return statuses, float(probe.headers["x-simulated-latency-ms"])
+
+    (fast, probe_ms), (slow, _) = asyncio.run(run(0.0)), asyncio.run(run(0.01))
+    assert fast == slow and 429 in fast and 200 in fast
+    assert probe_ms <= 20
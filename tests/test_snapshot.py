@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from app.config import get_settings
+from app.services.resources import SQLiteResourceStore
+from app.utils.snapshot import StartupSnapshot, source_files, source_signature
+from app.utils.stubgen import StubEngine
+from app.utils.validation import SchemaRegistry
+from benchmarks.startup import measure
+
+
+def test_cache_round_trips_and_is_tied_to_its_sources(tmp_path):
+    settings = get_settings()
+    signature = source_signature(source_files(settings))
+    built = StartupSnapshot.build(settings, signature)
+    path = tmp_path / "startup-cache.marshal"
+    built.save(path)
+
+    cached = StartupSnapshot.load(path, signature)
+    assert cached is not None and cached.from_cache and not built.from_cache
+    assert (cached.components, cached.examples, cached.providers, cached.capabilities) == (built.components, built.examples, built.providers, built.capabilities)
+
+    stale = signature[:-1] + ((signature[-1][0], signature[-1][1] + 1, signature[-1][2]),)
+    assert StartupSnapshot.load(path, stale) is None
+    path.write_bytes(b"\x00garbage")
+    assert StartupSnapshot.load(path, signature) is None
+
+    registry = SchemaRegistry(cached.components, check=False)
+    assert not registry.validator("ScriptCreate").is_valid({})
+    assert StubEngine(registry, cached.examples).warm() > 0
+
+
+def test_second_cold_start_skips_parsing(tmp_path):
+    first, second = measure(tmp_path), measure(tmp_path)
+    assert (first["startup_cache"], second["startup_cache"]) == ("miss", "hit")
+    assert {"imports", "snapshot", "schemas", "stubs", "catalog", "services"} <= set(second["phases_ms"])
+    assert second["phases_ms"]["schemas"] < first["phases_ms"]["schemas"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_stores_open_their_own_connection_in_a_forked_worker(tmp_path):
+    store = SQLiteResourceStore(tmp_path / "resources.sqlite3")
+    store.put("voices", "voice_parent", b"{}")
+    inherited = store._conn.connection
+
+    pid = os.fork()
+    if pid == 0:  # the worker: write through the store it inherited, then leave without cleanup
+        ok = store._conn.connection is not inherited and store.get("voices", "voice_parent") == b"{}"
+        store.put("voices", "voice_child", b"{}")
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert store._conn.connection is inherited
+    assert store.get("voices", "voice_child") == b"{}"
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.stubgen import StubEngine, StubSpec, StubTemplate, get_stub_engine
+from app.utils.validation import get_schema_registry
+
+client = TestClient(app)
+
+
+def test_template_patches_slots_and_timestamps():
+    template = StubTemplate({"id": "\x00slot:id\x00", "created_at": "\x00slot:now\x00", "tag": "x"})
+    data = json.loads(template.render(id='weird "id"'))
+    assert data["id"] == 'weird "id"'
+    assert data["created_at"].endswith("+00:00")
+    assert data["tag"] == "x"
+
+
+def test_engine_memoizes_templates_per_spec():
+    engine = get_stub_engine()
+    spec = StubSpec("Script", slots=("id", "status"))
+    assert engine.template(spec) is engine.template(spec)
+
+
+def test_engine_prefers_examples():
+    spec = StubSpec("ImageJob")
+    engine = StubEngine(get_schema_registry(), {"images.create": b'{"id":"img_1"}'})
+    assert engine.example_or_render("images.create", spec) == b'{"id":"img_1"}'
+    assert engine.example_or_render("missing", spec) == b"{}"
+
+
+def test_get_script_uses_path_id():
+    response = client.get("/v1/scripts/scr_42")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == "scr_42"
+    assert body["status"] == "succeeded"
+    assert body["sections"] == []
+
+
+def test_get_asset_overrides_required_id():
+    response = client.get("/v1/assets/ast_7")
+    assert response.status_code == 200
+    assert response.json()["id"] == "ast_7"
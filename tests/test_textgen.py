@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.routers.slideshow import _script_stream
+from app.services.catalog import ProviderCatalog
+from app.services.health import HealthMonitor
+from app.services.resources import SQLiteResourceStore
+from app.services.routing import ProviderRouter
+from app.services.textgen import FakeTextGenBackend, OpenRouterBackend, TextGenBackend, TextGenerator, stream_sections
+
+
+def _events(body: str):
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        yield fields["event"], json.loads(fields["data"])
+
+
+def test_streamed_script_forwards_sections_and_persists_the_script():
+    client = TestClient(create_app())
+    text = "Welcome to the harbor.\n\nBoats   leave at dawn.\n\nThey return by dusk."
+    response = client.post("/v1/scripts?stream=true", json={"input": {"type": "text", "text": text}})
+    assert response.status_code == 201
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = list(_events(response.text))
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "script"
+    assert kinds.index("section") < max(i for i, kind in enumerate(kinds) if kind == "delta")  # sections arrive mid-stream
+    sections = [data["text"] for kind, data in events if kind == "section"]
+    assert sections == ["Welcome to the harbor.", "Boats leave at dawn.", "They return by dusk."]
+
+    script = events[-1][1]
+    assert script["status"] == "succeeded" and [s["id"] for s in script["sections"]] == ["sec_1", "sec_2", "sec_3"]
+    assert client.get(f"/v1/scripts/{script['id']}").json() == script
+
+    accept = client.post("/v1/scripts", json={"input": {"type": "text", "text": "One."}, "options": {"segment": "none"}}, headers={"Accept": "text/event-stream"})
+    assert list(_events(accept.text))[-1][1]["sections"] == [{"id": "sec_1", "text": "One."}]
+
+
+def test_sentence_sections_split_across_deltas():
+    async def deltas():
+        for piece in ["First sen", "tence. Sec", "ond one!", " Third"]:
+            yield piece
+
+    async def main():
+        return [text async for kind, text in stream_sections(deltas(), "sentence") if kind == "section"]
+
+    assert asyncio.run(main()) == ["First sentence.", "Second one!", "Third"]
+
+
+def test_openrouter_stream_and_fallback_before_first_delta(tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        chunks = [{"choices": [{"delta": {"content": word}}]} for word in ("Hello ", "world")]
+        body = ": keep-alive\n\n" + "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    (tmp_path / "providers.json").write_text(json.dumps([
+        {"id": "broken", "name": "Broken", "category": "text", "latency_ms_estimate": 100},
+        {"id": "openrouter", "name": "OpenRouter", "category": "text", "latency_ms_estimate": 800},
+    ]))
+    (tmp_path / "capabilities.json").write_text(json.dumps([{"id": "text-gen", "name": "Text", "type": "text"}]))
+    catalog = ProviderCatalog(tmp_path / "providers.json", tmp_path / "capabilities.json", reload_interval=-1)
+    health = HealthMonitor(catalog)
+
+    class Broken(TextGenBackend):
+        async def stream(self, prompt):
+            raise RuntimeError("upstream 502")
+            yield
+
+    backends = {"broken": Broken(), "openrouter": OpenRouterBackend("https://openrouter.test/api/v1", "key", "m", transport=httpx.MockTransport(handler))}
+    generator = TextGenerator(backends, ProviderRouter(catalog, health), health)
+
+    async def main():
+        provider, deltas = await generator.open("prompt")
+        return provider, [d async for d in deltas]
+
+    assert asyncio.run(main()) == ("openrouter", ["Hello ", "world"])
+    assert health.stats("broken")[1] > 0
+
+    generator.backends = {"openrouter": FakeTextGenBackend()}
+    assert asyncio.run(main()) == ("openrouter", ["prompt"])
+
+
+def test_streamed_script_is_saved_when_the_client_leaves_and_mid_stream_failures_count(tmp_path):
+    (tmp_path / "providers.json").write_text(json.dumps([{"id": "openrouter", "name": "OpenRouter", "category": "text"}]))
+    (tmp_path / "capabilities.json").write_text(json.dumps([{"id": "text-gen", "name": "Text", "type": "text"}]))
+    catalog = ProviderCatalog(tmp_path / "providers.json", tmp_path / "capabilities.json", reload_interval=-1)
+    health = HealthMonitor(catalog)
+
+    class Flaky(TextGenBackend):
+        async def stream(self, prompt):
+            yield "One.\n\n"
+            yield "Two.\n\n"
+            raise RuntimeError("connection reset")
+
+    generator = TextGenerator({"openrouter": Flaky()}, ProviderRouter(catalog, health), health)
+    store = SQLiteResourceStore(":memory:")
+
+    async def leave_after_first_section():
+        provider, deltas = await generator.open("prompt")
+        events = _script_stream("scr_left", provider, deltas, {}, store)
+        async for event in events:
+            if event.startswith(b"event: section"):
+                break
+        await events.aclose()
+
+    async def read_all():
+        provider, deltas = await generator.open("prompt")
+        return [event async for event in _script_stream("scr_failed", provider, deltas, {}, store)]
+
+    asyncio.run(leave_after_first_section())
+    left = json.loads(store.get("scripts", "scr_left"))
+    assert (left["status"], [s["text"] for s in left["sections"]]) == ("failed", ["One."])
+    assert health.stats("openrouter")[1] == 0
+
+    events = asyncio.run(read_all())
+    assert events[-2].startswith(b"event: error")
+    assert json.loads(store.get("scripts", "scr_failed"))["status"] == "failed"
+    assert health.stats("openrouter")[1] > 0
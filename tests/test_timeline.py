@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import io
+import time
+import wave
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services.assets import get_asset_store
+from app.services.jobs import get_job_engine
+from app.services.resources import get_resource_store
+from app.utils.common import dumps
+from app.services.timeline import MAX_DURATION_SEC, align_slides, ducking_gain, frame_timeline, plan_timeline, rms_db, segment_starts, wav_chunks, wav_format
+
+
+def test_slides_follow_voiceover_segments_and_crossfade_across_cuts():
+    starts = segment_starts([0.0, 4.0, 6.0], 10.0)
+    # Two slides share the first segment, the third segment has no slide of its own.
+    start, duration = align_slides([0, -1, 1], starts, 10.0)
+    assert start.tolist() == [0.0, 2.0, 4.0] and duration.tolist() == [2.0, 2.0, 6.0]
+
+    slide, mix = frame_timeline(start, duration, fps=10, transition="crossfade", transition_sec=1.0)
+    assert len(slide) == 100 and slide.dtype == np.uint16 and mix.dtype == np.float32
+    # Frames 15..24 straddle the 2 s cut: slide 0 fades into slide 1, 0.05 .. 0.95.
+    assert slide[14:25].tolist() == [0] * 11 and mix[14] == 0
+    np.testing.assert_allclose(mix[15:25], np.arange(10) / 10 + 0.05, atol=1e-6)
+    assert slide[25] == 1 and mix[25] == 0
+    assert slide[-1] == 2 and not mix[60:].any()
+
+    slide, mix = frame_timeline(start, duration, fps=10, transition="cut")
+    assert slide[19:21].tolist() == [0, 1] and not mix.any()
+
+
+def test_music_ducks_ahead_of_speech_and_recovers_after_release():
+    fps = 100
+    voice_db = np.full(300, -60.0)
+    voice_db[100:200] = -6.0
+    gain = ducking_gain(voice_db, fps, threshold_db=-12, attack_ms=100, release_ms=500, depth_db=-20)
+    assert gain[0] == 1 and gain[89] == 1
+    assert 0.1 < gain[95] < 1 and gain[100:200].max() == np.float32(0.1)
+    assert 0.1 < gain[220] < gain[240] < gain[248] < 1 and (gain[250:] == 1).all()  # released within 0.5 s
+
+    assert (ducking_gain(np.full(50, -30.0), fps, -12, 120, 300) == 1).all()
+
+
+def test_ten_minutes_at_60_fps_plans_in_milliseconds():
+    rate = 24000
+    samples = np.zeros(600 * rate, dtype=np.float32)
+    samples[60 * rate:120 * rate] = 0.5 * np.sin(np.arange(60 * rate) * 0.05)
+    start, duration = align_slides(np.arange(120) // 2, segment_starts(np.arange(60) * 10.0, 600.0), 600.0)
+    options = {"fps": 60, "ducking": {"threshold_db": -12}}
+
+    plan_timeline(start, duration, options, ([samples], rate))
+    began = time.perf_counter()
+    plan = plan_timeline(start, duration, options, (np.array_split(samples, 200), rate))
+    assert time.perf_counter() - began < 0.5
+    assert plan.frames == 36_000 and int(plan.slide[-1]) == 119
+    assert plan.music_gain[:3500].min() == 1 and plan.music_gain[4000:7000].max() < 0.2
+
+    arrays = np.load(io.BytesIO(plan.to_npz()))
+    assert int(arrays["fps"]) == 60 and np.array_equal(arrays["slide"], plan.slide)
+
+
+def test_plans_reject_out_of_range_fps_and_lengths():
+    start, duration = np.array([0.0]), np.array([2.0])
+    for fps in (0, 121):
+        with pytest.raises(ValueError, match="fps"):
+            plan_timeline(start, duration, {"fps": fps})
+    with pytest.raises(ValueError, match="limit"):
+        plan_timeline(start, np.array([MAX_DURATION_SEC + 1]))
+
+
+def test_voice_levels_stream_from_wav_chunk_by_chunk(tmp_path):
+    path = tmp_path / "vo.wav"
+    signal = (np.sin(np.arange(8000 * 3) * 0.1) * np.linspace(0, 1, 8000 * 3) * 16000).astype("<i2")
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2), w.setsampwidth(2), w.setframerate(8000)
+        w.writeframes(np.repeat(signal, 2).tobytes())
+    assert wav_format(path) == (8000, 3.0)
+
+    whole = rms_db([signal.astype(np.float32) / 32767], 8000, 30, 100)
+    streamed = rms_db(wav_chunks(path, chunk_frames=1000), 8000, 30, 100)
+    np.testing.assert_allclose(streamed, whole, atol=1e-3)
+    assert whole[10] < whole[80] and (whole[90:] == -100).all()  # silence past the audio
+    np.testing.assert_allclose(rms_db(wav_chunks(path, chunk_frames=1000), 8000, 30, 45), whole[:45], atol=1e-3)
+
+
+def test_slideshow_video_job_stores_a_timeline_from_the_voiceover_audio():
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1), w.setsampwidth(2), w.setframerate(8000)
+        w.writeframes((np.sin(np.arange(8000 * 6) * 0.1) * 16000).astype("<i2").tobytes())
+
+    with TestClient(create_app()) as client:
+        audio = client.post("/v1/assets", json={"mode": "direct_upload", "filename": "vo.wav", "mime": "audio/wav"}).json()
+        client.put(f"/v1/assets/{audio['id']}/content", content=buffer.getvalue())
+        voiceover = client.post("/v1/voiceovers", json={"script": {"script_id": "scr_1"}, "voice": {"voice_id": "vx_emma"}})
+        assert client.get(f"/v1/voiceovers/{voiceover.json()['id']}", params={"wait": 5}).json()["status"] == "succeeded"
+        job = get_job_engine().get(voiceover.json()["id"], "voiceovers")
+        job.result = {
+            "artifact": {"url": audio["url"], "mime": "audio/wav", "duration_sec": 6.0},
+            "markers": [{"section_id": "intro", "time_sec": 0.0}, {"section_id": "body", "time_sec": 2.0}],
+        }
+        slides = [
+            {"id": "sl_1", "section_id": "intro", "caption": "Hello"},
+            {"id": "sl_2", "section_id": "body", "caption": "World"},
+            {"id": "sl_3", "caption": None},
+        ]
+        get_resource_store().put("slideshows", "ss_timeline", dumps({"id": "ss_timeline", "slides": slides}))
+
+        created = client.post("/v1/slideshow-videos", json={"voiceover_id": job.id, "slideshow_id": "ss_timeline", "options": {"fps": 24, "captions": {"mode": "sidecar"}}})
+        video = client.get(f"/v1/slideshow-videos/{created.json()['id']}", params={"wait": 5}).json()
+        assert video["status"] == "succeeded", video
+        timeline = video["timeline"]
+        assert (timeline["fps"], timeline["frames"], timeline["slides"]) == (24, 144, 3)
+        arrays = np.load(io.BytesIO(client.get(timeline["url"]).content))
+        assert arrays["slide"][0] == 0 and arrays["slide"][-1] == 2 and arrays["music_gain"].max() < 1
+        assert "00:00:02.000 --> 00:00:04.000\nWorld" in client.get(timeline["captions_url"]).text
+        checksum = client.get(f"/v1/assets/{audio['id']}").json()["checksum"].removeprefix("sha256:")
+        assert (get_asset_store().root / "renditions" / checksum[:2] / f"{checksum}.levels-24fps").stat().st_size == 144 * 4
+
+
+def test_slideshows_created_through_the_api_are_planned_and_bad_requests_fail():
+    beats = [{"id": "b1", "title": "Harbor", "summary": "Boats leave the harbor at dawn"}, {"id": "b2", "title": "Dusk", "summary": "They return"}]
+    with TestClient(create_app()) as client:
+        slideshow = client.post("/v1/slideshows", json={
+            "beats": {"items": beats},
+            "image_strategy": {"mode": "generate", "per_beat": 2},
+            "caption_strategy": {"source": "beat_summary", "max_chars": 10},
+            "timing_strategy": {"mode": "fixed", "per_slide_sec": 1.5},
+        })
+        assert slideshow.status_code == 201
+        slides = slideshow.json()["slides"]
+        assert [(s["beat_id"], s["caption"], s["start_sec"]) for s in slides] == [
+            ("b1", "Boats leav", 0.0), ("b1", "Boats leav", 1.5), ("b2", "They retur", 3.0), ("b2", "They retur", 4.5),
+        ]
+        assert client.get(f"/v1/slideshows/{slideshow.json()['id']}").json() == slideshow.json()
+        voiceover = client.post("/v1/voiceovers", json={"script": {"script_id": "scr_1"}, "voice": {"voice_id": "vx_emma"}}).json()
+        assert client.get(f"/v1/voiceovers/{voiceover['id']}", params={"wait": 5}).json()["status"] == "succeeded"
+        get_job_engine().get(voiceover["id"], "voiceovers").result = {}  # no narration: slides keep their own timing
+
+        def video(slideshow_id, **options):
+            created = client.post("/v1/slideshow-videos", json={"voiceover_id": voiceover["id"], "slideshow_id": slideshow_id, "options": options})
+            if created.status_code != 202:
+                return created
+            return client.get(f"/v1/slideshow-videos/{created.json()['id']}", params={"wait": 5}).json()
+
+        planned = video(slideshow.json()["id"], fps=10)
+        assert planned["status"] == "succeeded", planned
+        assert (planned["timeline"]["frames"], planned["timeline"]["slides"]) == (60, 4)
+
+        missing = video("ss_missing")
+        assert (missing["status"], missing["error"]) == ("failed", "Slideshow 'ss_missing' not found")
+        assert video(slideshow.json()["id"], fps=0).status_code == 422
+        assert video(slideshow.json()["id"], fps=1000).status_code == 422
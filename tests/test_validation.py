@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.validation import SchemaRegistry, get_schema_registry, validate_body
+
+client = TestClient(app)
+
+
+def test_registry_resolves_refs_across_files():
+    registry = get_schema_registry()
+    image_job = registry.schema("ImageJob")
+    artifact = image_job["properties"]["items"]["items"]["properties"]["artifact"]
+    assert "$ref" not in artifact
+    assert artifact["required"] == ["url", "mime"]
+    assert "VideoCreateRequest" in registry
+
+
+def test_registry_breaks_ref_cycles():
+    registry = SchemaRegistry({
+        "Node": {"type": "object", "properties": {"child": {"$ref": "#/components/schemas/Node"}}},
+    })
+    validate_body({"child": {"child": {}}}, registry.validator("Node"))
+
+
+def test_validate_body_with_compiled_validator():
+    validator = get_schema_registry().validator("ImageCreate")
+    with pytest.raises(HTTPException) as exc:
+        validate_body({"provider": "genai", "mode": "paint"}, validator)
+    assert exc.value.status_code == 422
+    assert exc.value.detail["path"] == ["mode"]
+
+
+def test_slideshow_post_validates_body():
+    response = client.post("/v1/images", json={"provider": "genai", "mode": "generate", "prompt": "cat"})
+    assert response.status_code == 202
+    response = client.post("/v1/images", json={"provider": "genai"})
+    assert response.status_code == 422
+
+
+def test_story_post_validates_body():
+    response = client.post("/v1/videos", json={"inputs": {"prompt": "A cat flying in space"}})
+    assert response.status_code == 202
+    response = client.post("/v1/videos", json={"inputs": {}})
+    assert response.status_code == 422
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from typing import List
+
+import httpx
+
+from app.services.jobs import Job
+from app.services.webhooks import SIGNATURE_HEADER, WebhookDispatcher, WebhookStore
+
+
+class Receiver:
+    """Local stand-in receiver: records requests and answers with scripted status codes."""
+
+    def __init__(self, statuses: List[int] | None = None):
+        self.statuses = list(statuses or [])
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(self.statuses.pop(0) if self.statuses else 200)
+
+
+def _dispatcher(receiver: Receiver, **kwargs) -> WebhookDispatcher:
+    kwargs.setdefault("backoff_base", 0.0)
+    return WebhookDispatcher(WebhookStore(":memory:"), transport=httpx.MockTransport(receiver), **kwargs)
+
+
+def test_delivery_is_signed():
+    receiver = Receiver()
+
+    async def main():
+        dispatcher = _dispatcher(receiver)
+        dispatcher.enqueue("http://hooks.test/a", "s3cret", {"type": "job.succeeded"})
+        await dispatcher.dispatch_due()
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    (request,) = receiver.requests
+    assert json.loads(request.content) == {"type": "job.succeeded"}
+    parts = dict(p.split("=", 1) for p in request.headers[SIGNATURE_HEADER].split(","))
+    expected = hmac.new(b"s3cret", parts["t"].encode() + b"." + request.content, hashlib.sha256).hexdigest()
+    assert parts["v1"] == expected
+
+
+def test_failures_are_retried_then_parked():
+    receiver = Receiver([500, 503])
+
+    async def settle(dispatcher, expected):
+        for _ in range(200):
+            if dispatcher.store.counts() == expected:
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError(dispatcher.store.counts())
+
+    async def main():
+        dispatcher = _dispatcher(receiver, max_attempts=5)
+        dispatcher.enqueue("http://hooks.test/a", "", {"n": 1})
+        await settle(dispatcher, {})
+
+        receiver.statuses = [500] * 5
+        dispatcher.enqueue("http://hooks.test/a", "", {"n": 2})
+        await settle(dispatcher, {"dead": 1})
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert len(receiver.requests) == 8
+
+
+def test_pending_deliveries_survive_restart(tmp_path):
+    path = tmp_path / "webhooks.sqlite3"
+    WebhookStore(path).add("http://hooks.test/a", "", b'{"n":1}')
+    receiver = Receiver()
+
+    async def main():
+        dispatcher = WebhookDispatcher(WebhookStore(path), transport=httpx.MockTransport(receiver))
+        await dispatcher.dispatch_due()
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert [r.content for r in receiver.requests] == [b'{"n":1}']
+
+
+def test_workers_sharing_a_file_never_claim_the_same_delivery(tmp_path):
+    path = tmp_path / "webhooks.sqlite3"
+    first, second = WebhookStore(path, claim_ttl=60.0), WebhookStore(path, claim_ttl=60.0)
+    for n in range(10):
+        first.add("http://hooks.test/a", "", b'{"n":%d}' % n)
+    mine = first.claim_due(6)
+    assert len(mine) == 6
+    WebhookStore(path)  # a worker starting up leaves live sends alone
+    theirs = second.claim_due(10)
+    assert len(theirs) == 4 and not {d.id for d in mine} & {d.id for d in theirs}
+    assert second.counts() == {"sending": 10}
+
+
+def test_sends_of_a_dead_worker_are_reclaimed_after_their_lease(tmp_path):
+    path = tmp_path / "webhooks.sqlite3"
+    dead, live = WebhookStore(path, claim_ttl=0.01), WebhookStore(path, claim_ttl=60.0)
+    dead.add("http://hooks.test/a", "", b'{"n":1}')
+    (claimed,) = dead.claim_due(10)
+    assert live.claim_due(10) == []
+    time.sleep(0.02)
+    assert [d.id for d in live.claim_due(10)] == [claimed.id]
+    dead.delivered([claimed.id])  # too late: the row is no longer its claim
+    assert live.counts() == {"sending": 1}
+
+
+def test_events_to_same_endpoint_are_batched():
+    receiver = Receiver()
+
+    async def main():
+        dispatcher = _dispatcher(receiver, batch_max=10)
+        for n in range(3):
+            dispatcher.enqueue("http://hooks.test/a", "k", {"n": n})
+        dispatcher.enqueue("http://hooks.test/b", "k", {"n": 9})
+        await dispatcher.dispatch_due()
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    bodies = sorted((r.url.path, json.loads(r.content)["events"]) for r in receiver.requests)
+    assert bodies == [("/a", [{"n": 0}, {"n": 1}, {"n": 2}]), ("/b", [{"n": 9}])]
+
+
+def test_a_hanging_host_does_not_hold_up_other_hosts():
+    delivered: List[str] = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "slow.test":
+                await release.wait()
+            delivered.append(request.url.host)
+            return httpx.Response(200)
+
+        dispatcher = WebhookDispatcher(WebhookStore(":memory:"), max_per_host=2, transport=httpx.MockTransport(handler))
+        for n in range(5):
+            dispatcher.enqueue("http://slow.test/hook", "", {"n": n})
+        await asyncio.sleep(0.05)
+        dispatcher.enqueue("http://fast.test/hook", "", {"n": 9})
+        for _ in range(100):
+            if delivered:
+                break
+            await asyncio.sleep(0.01)
+        assert delivered == ["fast.test"]
+        assert dispatcher.store.counts() == {"pending": 3, "sending": 2}  # the slow host's backlog is left unclaimed
+
+        release.set()
+        for _ in range(200):
+            if not dispatcher.store.counts():
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    assert delivered.count("slow.test") == 5
+
+
+def test_finished_job_with_webhook_is_delivered():
+    receiver = Receiver()
+
+    async def main():
+        dispatcher = _dispatcher(receiver)
+        job = Job("vo_1", "voiceovers", {"text": "hi", "webhook": {"url": "http://hooks.test/vo", "secret": "k"}})
+        dispatcher.record_job(job)  # queued: nothing to send yet
+        job.status = "succeeded"
+        dispatcher.record_job(job)
+        for _ in range(100):
+            if receiver.requests:
+                break
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    (request,) = receiver.requests
+    event = json.loads(request.content)
+    assert event["type"] == "job.succeeded"
+    assert event["data"]["id"] == "vo_1"